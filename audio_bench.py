@@ -0,0 +1,360 @@
+import os
+import sys
+import json
+import math
+import time
+import wave
+import array
+import random
+import shutil
+import tempfile
+import platform
+import argparse
+import itertools
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+from audio_core import group_files_by_number, organize_files, find_audio_folders, list_audio_files
+from audio_jobs import run_jobs, run_merge_job, run_loop_job, discard_results
+from audio_engine import render_loop, MemorySink
+from audio_pcm_cache import configure_decoded_cache, decode_audio
+from audio_probe import file_info, PROBE_WORKERS
+from audio_cache import MetadataCache
+from audio_decode import spawn_stats, take_spawn_stats, merge_spawn_stats
+
+# วัดความเร็วของงานหลัก (organize / preview / merge / loop) โดยไม่ใช้ GUI
+# สร้างไฟล์เสียงสังเคราะห์ (tone + noise) ในโฟลเดอร์ชั่วคราว วัดเวลาตามชุดพารามิเตอร์ แล้วบันทึกผลเป็น JSON
+# เทียบกับผลที่บันทึกไว้ก่อน (--baseline) เพื่อดูว่าการแก้ไขทำให้เร็วขึ้นหรือช้าลง
+#
+# ตัวอย่าง:
+#   python audio_bench.py --output baseline.json
+#   python audio_bench.py --baseline baseline.json --output after.json
+#   python audio_bench.py --bench merge --files 20,200 --seconds 5 --crossfade 0,3 --workers 1,4
+#
+# ชุด pipeline (รวมแล้วลูปต่อแบบ process) ตรวจสถิติการถอดรหัสด้วย ถ้านับไม่ตรงกับจำนวนไฟล์จะหยุดพร้อมข้อผิดพลาด
+
+BENCHES = ('organize', 'preview', 'merge', 'loop', 'pipeline')
+FRAME_RATE = 44100
+CHANNELS = 2
+SAMPLE_WIDTH = 2
+TONE_VARIANTS = 8  # จำนวนเสียงที่ต่างกัน (ไฟล์ที่เหลือใช้เสียงซ้ำ สร้างไฟล์จำนวนมากได้เร็ว)
+
+
+def synth_pcm(seconds, variant=0):
+    """PCM 16 บิต stereo ของเสียง tone + noise ความยาว seconds"""
+    frames = int(FRAME_RATE * seconds)
+    frequency = 220.0 * (1 + variant % TONE_VARIANTS)
+    if NUMPY_AVAILABLE:
+        rng = np.random.default_rng(variant)
+        t = np.arange(frames) / FRAME_RATE
+        signal = 0.5 * np.sin(2 * np.pi * frequency * t) + 0.1 * rng.standard_normal(frames)
+        samples = np.clip(signal * 32767, -32768, 32767).astype('<i2')
+        return np.repeat(samples[:, None], CHANNELS, axis=1).tobytes()
+    rng = random.Random(variant)
+    step = 2 * math.pi * frequency / FRAME_RATE
+    samples = array.array('h')
+    for i in range(frames):
+        value = int((0.5 * math.sin(step * i) + 0.1 * rng.gauss(0, 1)) * 32767)
+        value = max(-32768, min(32767, value))
+        samples.extend([value] * CHANNELS)
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def write_wav(path, pcm):
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(CHANNELS)
+        f.setsampwidth(SAMPLE_WIDTH)
+        f.setframerate(FRAME_RATE)
+        f.writeframes(pcm)
+
+
+class Dataset:
+    """ไฟล์เสียงสังเคราะห์ในโฟลเดอร์ชั่วคราว สร้างครั้งเดียวต่อชุดพารามิเตอร์"""
+    def __init__(self, root):
+        self.root = Path(root)
+        self._pcm = {}
+        self._folders = {}
+
+    def pcm(self, seconds, variant):
+        key = (seconds, variant % TONE_VARIANTS)
+        if key not in self._pcm:
+            self._pcm[key] = synth_pcm(seconds, variant)
+        return self._pcm[key]
+
+    def folders(self, folder_count, files, seconds):
+        """โฟลเดอร์หลักที่มีโฟลเดอร์ย่อย folder_count โฟลเดอร์ แต่ละโฟลเดอร์มี files ไฟล์"""
+        key = (folder_count, files, seconds)
+        if key not in self._folders:
+            parent = self.root / f"folders_{folder_count}x{files}_{seconds}s"
+            for folder in range(1, folder_count + 1):
+                folder_path = parent / str(folder)
+                folder_path.mkdir(parents=True)
+                for index in range(1, files + 1):
+                    write_wav(folder_path / f"track {index}.wav", self.pcm(seconds, index))
+            self._folders[key] = parent
+        return self._folders[key]
+
+    def flat_files(self, files, groups):
+        """โฟลเดอร์ใหม่ที่มีไฟล์เล็กๆ files ไฟล์ ลงท้ายด้วยเลขกลุ่ม (สำหรับ organize ซึ่งย้ายไฟล์อย่างเดียว)"""
+        folder = Path(tempfile.mkdtemp(prefix="organize_", dir=str(self.root)))
+        pcm = self.pcm(0.01, 0)
+        for index in range(files):
+            write_wav(folder / f"clip_{index}_{index % groups + 1}.wav", pcm)
+        return sorted(str(path) for path in folder.iterdir())
+
+
+def measure(func, repeat, setup=None):
+    """เวลา (วินาที) ของ func ทุกรอบ (setup ไม่ถูกนับเวลา ค่าที่คืนจาก setup ส่งให้ func)"""
+    runs = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        started = time.perf_counter()
+        func(argument) if setup else func()
+        runs.append(time.perf_counter() - started)
+    return runs
+
+
+def bench_organize(dataset, args):
+    journal_dir = tempfile.mkdtemp(prefix="journal_", dir=str(dataset.root))
+    for files in args.files:
+        def organize(file_paths):
+            groups, _ = group_files_by_number(file_paths)
+            organize_files(file_paths, groups, journal_dir=journal_dir)
+
+        runs = measure(organize, args.repeat, lambda: dataset.flat_files(files, args.groups))
+        yield {'files': files, 'groups': args.groups}, runs
+
+
+def bench_preview(dataset, args):
+    for files, workers in itertools.product(args.files, args.workers):
+        parent = dataset.folders(args.folders, files, min(args.seconds))
+
+        def preview(cache):
+            # เหมือนหน้าตัวอย่าง: หาโฟลเดอร์ อ่านรายชื่อไฟล์ และอ่านข้อมูลไฟล์จาก header
+            paths = [os.path.join(folder, name)
+                     for folder in find_audio_folders(parent, 1)
+                     for name in list_audio_files(folder)]
+            with ThreadPoolExecutor(max_workers=workers or PROBE_WORKERS) as executor:
+                list(executor.map(lambda path: file_info(path, cache), paths))
+
+        def fresh_cache():
+            fd, db_path = tempfile.mkstemp(suffix=".sqlite3", dir=str(dataset.root))
+            os.close(fd)
+            return MetadataCache(db_path)
+
+        yield {'folders': args.folders, 'files': files, 'workers': workers, 'cache': 'cold'}, \
+            measure(preview, args.repeat, fresh_cache)
+        warm = fresh_cache()
+        preview(warm)
+        yield {'folders': args.folders, 'files': files, 'workers': workers, 'cache': 'warm'}, \
+            measure(lambda: preview(warm), args.repeat)
+
+
+def bench_merge(dataset, args):
+    for files, seconds, crossfade, workers in itertools.product(
+            args.files, args.seconds, args.crossfade, args.workers):
+        parent = dataset.folders(args.folders, files, seconds)
+        crossfade_ms = int(crossfade * 1000)
+        jobs = [
+            {
+                'folder_name': Path(folder).name,
+                'folder_path': folder,
+                'files': list_audio_files(folder),
+                'crossfade_ms': crossfade_ms,
+                'output_format': 'wav',
+                'work_dir': None
+            }
+            for folder in find_audio_folders(parent, 1)
+        ]
+
+        def merge():
+            for _, result, error in run_jobs(run_merge_job, jobs, 'thread', workers):
+                if error:
+                    raise error
+
+        params = {'folders': args.folders, 'files': files, 'seconds': seconds,
+                  'crossfade_ms': crossfade_ms, 'workers': workers}
+        yield params, measure(merge, args.repeat)
+
+
+def bench_loop(dataset, args):
+    for seconds, crossfade, loops in itertools.product(args.seconds, args.crossfade, args.loops):
+        parent = dataset.folders(1, 1, seconds)
+        audio = decode_audio(parent / "1" / "track 1.wav")
+        crossfade_ms = int(crossfade * 1000)
+        runs = measure(lambda: render_loop(audio, loops, crossfade_ms, MemorySink()), args.repeat)
+        yield {'seconds': seconds, 'crossfade_ms': crossfade_ms, 'loops': loops}, runs
+
+
+def bench_pipeline(dataset, args):
+    for files, workers in itertools.product(args.files, args.workers):
+        parent = dataset.folders(args.folders, files, min(args.seconds))
+        work_dir = tempfile.mkdtemp(prefix="pipeline_", dir=str(dataset.root))
+        crossfade_ms = int(min(args.crossfade) * 1000)
+        loops = max(args.loops)
+        jobs = [
+            {
+                'folder_name': Path(folder).name,
+                'folder_path': folder,
+                'files': list_audio_files(folder),
+                'crossfade_ms': crossfade_ms,
+                'output_format': 'wav',
+                'work_dir': work_dir
+            }
+            for folder in find_audio_folders(parent, 1)
+        ]
+
+        def pipeline():
+            # เหมือน run_pipeline: ผลรวมเป็นไฟล์ PCM แล้วส่งต่อให้ลูปโดยไม่ถอดรหัสใหม่
+            take_spawn_stats()
+            results = []
+            try:
+                for stage_jobs, worker in ((jobs, run_merge_job), (None, run_loop_job)):
+                    if stage_jobs is None:
+                        stage_jobs = [{'file_name': result['name'], 'source': result, 'loop_count': loops,
+                                       'crossfade_ms': crossfade_ms, 'output_format': 'wav',
+                                       'work_dir': work_dir}
+                                      for result in results]
+                    for _, result, error in run_jobs(worker, stage_jobs, 'process', workers):
+                        if error:
+                            raise error
+                        merge_spawn_stats(result.pop('spawn_stats', None))
+                        results.append(result)
+            finally:
+                discard_results(results)
+
+            # worker ที่ fork มาต้องไม่ส่งสถิติของโปรเซสหลักกลับมาซ้ำ
+            decoded = spawn_stats()['in_process']
+            expected = args.folders * files
+            if decoded != expected:
+                raise RuntimeError(f"สถิติการถอดรหัสไม่ตรง: นับได้ {decoded} ไฟล์ ถอดรหัสจริง {expected} ไฟล์")
+
+        params = {'folders': args.folders, 'files': files, 'crossfade_ms': crossfade_ms,
+                  'loops': loops, 'workers': workers}
+        yield params, measure(pipeline, args.repeat)
+
+
+BENCH_FUNCTIONS = {
+    'organize': bench_organize,
+    'preview': bench_preview,
+    'merge': bench_merge,
+    'loop': bench_loop,
+    'pipeline': bench_pipeline
+}
+
+
+def result_key(result):
+    return result['bench'] + ' ' + ' '.join(f"{key}={value}" for key, value in sorted(result['params'].items()))
+
+
+def run_benchmarks(args, report=print):
+    """รันทุกชุดพารามิเตอร์ คืนค่า dict ผลลัพธ์ (บันทึกเป็น JSON ได้)"""
+    # ปิดแคชเสียงที่ถอดรหัสแล้ว ให้ทุกรอบวัดการถอดรหัสจริง
+    configure_decoded_cache(0)
+    root = tempfile.mkdtemp(prefix="mixpro_bench_")
+    results = []
+    try:
+        dataset = Dataset(root)
+        for bench in args.bench:
+            for params, runs in BENCH_FUNCTIONS[bench](dataset, args):
+                runs = sorted(runs)
+                result = {
+                    'bench': bench,
+                    'params': params,
+                    'best': runs[0],
+                    'median': runs[len(runs) // 2],
+                    'runs': runs
+                }
+                results.append(result)
+                report(f"{result_key(result)}: {result['best'] * 1000:.1f} ms (median {result['median'] * 1000:.1f} ms)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': NUMPY_AVAILABLE,
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat
+        },
+        'results': results
+    }
+
+
+def compare(current, baseline, threshold, report=print):
+    """เทียบผลกับ baseline (ใช้ค่า best) คืนค่าจำนวนรายการที่ช้าลงเกิน threshold"""
+    previous = {result_key(result): result for result in baseline.get('results', [])}
+    regressions = 0
+    for result in current['results']:
+        key = result_key(result)
+        old = previous.get(key)
+        if old is None or not old['best']:
+            report(f"{key}: ไม่มีใน baseline")
+            continue
+        ratio = result['best'] / old['best']
+        marker = ""
+        if ratio > 1 + threshold:
+            marker = "  ← ช้าลง"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            marker = "  ← เร็วขึ้น"
+        report(f"{key}: {old['best'] * 1000:.1f} → {result['best'] * 1000:.1f} ms (x{ratio:.2f}){marker}")
+    return regressions
+
+
+def number_list(cast):
+    def parse(text):
+        return [cast(value) for value in text.split(',') if value.strip()]
+    return parse
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Audio File Manager benchmarks (headless)")
+    parser.add_argument('--bench', type=lambda text: [name for name in text.split(',') if name],
+                        default=list(BENCHES), help="ชุดที่ต้องการวัด: " + ",".join(BENCHES))
+    parser.add_argument('--files', type=number_list(int), default=[10, 50], help="จำนวนไฟล์ต่อโฟลเดอร์")
+    parser.add_argument('--folders', type=int, default=4, help="จำนวนโฟลเดอร์ (merge / preview)")
+    parser.add_argument('--groups', type=int, default=10, help="จำนวนกลุ่มตัวเลข (organize)")
+    parser.add_argument('--seconds', type=number_list(float), default=[2.0], help="ความยาวไฟล์ (วินาที)")
+    parser.add_argument('--crossfade', type=number_list(float), default=[0.0, 1.0], help="คอสเฟด (วินาที)")
+    parser.add_argument('--loops', type=number_list(int), default=[3], help="จำนวนลูป")
+    parser.add_argument('--workers', type=number_list(int), default=[1, 4], help="จำนวน worker")
+    parser.add_argument('--repeat', type=int, default=3, help="จำนวนรอบต่อชุดพารามิเตอร์ (ใช้ค่าที่เร็วที่สุด)")
+    parser.add_argument('--output', help="บันทึกผลเป็นไฟล์ JSON")
+    parser.add_argument('--baseline', help="ไฟล์ JSON ผลครั้งก่อนสำหรับเทียบ")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="สัดส่วนที่ถือว่าช้าลง/เร็วขึ้นเมื่อเทียบ baseline (0.15 = 15%%)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    unknown = [name for name in args.bench if name not in BENCHES]
+    if unknown:
+        print(f"ไม่รู้จักชุดวัด: {', '.join(unknown)}")
+        return 2
+
+    current = run_benchmarks(args)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print("\nเทียบกับ baseline:")
+        if compare(current, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+
+# แคชข้อมูลไฟล์เสียง (ระยะเวลา, sample rate, channels, codec) ลงดิสก์ ใช้ร่วมกันข้าม session
+# คีย์คือ path + ขนาดไฟล์ + mtime ถ้าไฟล์เปลี่ยนแคชจะไม่ถูกใช้
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # ขนาดฐานข้อมูลบนดิสก์ (ประมาณหลายแสนไฟล์)
+
+
+def default_cache_dir():
+    """โฟลเดอร์แคชของผู้ใช้ตามระบบปฏิบัติการ"""
+    if sys.platform.startswith('win'):
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'mixpro')
+
+
+class MetadataCache:
+    """แคช metadata ของไฟล์เสียงใน SQLite จำกัดขนาดฐานข้อมูลเป็นไบต์ ลบรายการที่ไม่ได้ใช้นานที่สุดก่อน"""
+    def __init__(self, db_path=None, max_bytes=DEFAULT_MAX_BYTES):
+        if db_path is None:
+            cache_dir = default_cache_dir()
+            os.makedirs(cache_dir, exist_ok=True)
+            db_path = os.path.join(cache_dir, 'metadata.sqlite3')
+        self.db_path = str(db_path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        # autocommit + WAL เพื่อไม่ต้อง fsync ทุกครั้งที่เขียน
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                duration REAL,
+                sample_rate INTEGER,
+                channels INTEGER,
+                codec TEXT,
+                last_used REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS files_last_used ON files (last_used)')
+        self._evict()
+
+    def get(self, file_path, st=None):
+        """คืนค่า metadata ที่แคชไว้ (None ถ้าไม่มีหรือไฟล์เปลี่ยนไปแล้ว)"""
+        file_path = str(file_path)
+        try:
+            st = st or os.stat(file_path)
+        except OSError:
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT size, mtime, duration, sample_rate, channels, codec FROM files WHERE path = ?',
+                (file_path,)
+            ).fetchone()
+            if row is None or row[0] != st.st_size or row[1] != st.st_mtime:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute('UPDATE files SET last_used = ? WHERE path = ?', (time.time(), file_path))
+
+        return {
+            'duration': row[2],
+            'sample_rate': row[3],
+            'channels': row[4],
+            'codec': row[5]
+        }
+
+    def put(self, file_path, info, st=None):
+        """บันทึก metadata ของไฟล์"""
+        file_path = str(file_path)
+        try:
+            st = st or os.stat(file_path)
+        except OSError:
+            return
+
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO files '
+                '(path, size, mtime, duration, sample_rate, channels, codec, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (file_path, st.st_size, st.st_mtime, info.get('duration'), info.get('sample_rate'),
+                 info.get('channels'), info.get('codec'), time.time())
+            )
+            # ตรวจขนาดแคชเป็นระยะ ไม่ต้องนับทุกครั้งที่เพิ่ม
+            self._puts += 1
+            if self._puts % 1000 == 0:
+                self._evict()
+
+    def lookup(self, file_path, probe):
+        """อ่านจากแคช ถ้าไม่มีให้เรียก probe(file_path) แล้วบันทึกผลลงแคช"""
+        try:
+            st = os.stat(str(file_path))
+        except OSError:
+            return None
+
+        info = self.get(file_path, st)
+        if info is None:
+            info = probe(file_path)
+            if info:
+                self.put(file_path, info, st)
+        return info
+
+    def size_bytes(self):
+        """ขนาดข้อมูลในฐานข้อมูล (page ที่ใช้อยู่ × ขนาด page ไม่นับ page ว่างที่ SQLite จะใช้ซ้ำ)"""
+        page_size = self._conn.execute('PRAGMA page_size').fetchone()[0]
+        page_count = self._conn.execute('PRAGMA page_count').fetchone()[0]
+        free_pages = self._conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def _evict(self):
+        """ลบรายการเก่าเมื่อฐานข้อมูลใหญ่เกิน max_bytes (ลดเหลือ 90% เพื่อไม่ต้องลบทุกครั้งที่เพิ่ม)"""
+        used = self.size_bytes()
+        if used <= self.max_bytes:
+            return
+        count = self._conn.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+        # ประมาณจำนวนรายการที่ต้องลบจากขนาดเฉลี่ยต่อรายการ
+        remove = count - int(count * self.max_bytes * 0.9 / used)
+        if remove <= 0:
+            return
+        self._conn.execute(
+            'DELETE FROM files WHERE path IN (SELECT path FROM files ORDER BY last_used LIMIT ?)',
+            (remove,)
+        )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM files')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_metadata_cache():
+    """แคช metadata ที่ใช้ร่วมกันทั้งโปรเซส (None ถ้าเปิดฐานข้อมูลไม่ได้)"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            try:
+                _shared_cache = MetadataCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"ไม่สามารถเปิดแคชข้อมูลไฟล์: {e}")
+                return None
+        return _shared_cache
@@ -0,0 +1,224 @@
+import sys
+import json
+import argparse
+from audio_core import run_pipeline, resume_organize, undo_organize
+from audio_journal import find_incomplete_journals, latest_committed_journal
+from audio_jobs import EXECUTOR_BACKENDS
+from audio_dsp import CROSSFADE_CURVES
+
+# จุดเริ่มต้นแบบ command line สำหรับเครื่องที่ไม่มีหน้าจอ (render server / cron)
+#
+# ตัวอย่าง:
+#   python audio_cli.py merge --parent /data/organized --output /data/out --crossfade 3
+#   python audio_cli.py run --organize-dir /data/drop --merge --loop-count 3 --output /data/out
+#   python audio_cli.py run --job job.json
+#   python audio_cli.py resume          (ทำการจัดระเบียบที่หยุดกลางทางต่อ)
+#   python audio_cli.py undo            (ย้อนกลับการจัดระเบียบครั้งล่าสุด)
+
+
+def add_format_arguments(parser):
+    parser.add_argument('--sample-rate', type=int, help="sample rate ของผลลัพธ์การรวม (ค่าเริ่มต้น: สูงสุดในโฟลเดอร์)")
+    parser.add_argument('--channels', type=int, choices=[1, 2], help="จำนวนช่องเสียงของผลลัพธ์การรวม (ค่าเริ่มต้น: มากสุดในโฟลเดอร์)")
+    parser.add_argument('--sample-width', type=int, choices=[1, 2, 3, 4],
+                        help="จำนวนไบต์ต่อ sample ของผลลัพธ์การรวม (ค่าเริ่มต้น: มากสุดในโฟลเดอร์)")
+
+
+def add_common_arguments(parser):
+    parser.add_argument('--output', help="โฟลเดอร์สำหรับบันทึกไฟล์ผลลัพธ์")
+    parser.add_argument('--format', default='wav', choices=['mp3', 'wav', 'flac', 'm4a'])
+    parser.add_argument('--bitrate', default='320k')
+    parser.add_argument('--bit-depth', type=int, default=24, choices=[16, 24, 32])
+    parser.add_argument('--backend', default='thread', choices=EXECUTOR_BACKENDS)
+    parser.add_argument('--workers', type=int, default=None, help="จำนวน worker (ค่าเริ่มต้นตามโหมดประมวลผล)")
+    parser.add_argument('--memory-budget', type=int, default=None,
+                        help="memory (MB) สำหรับเก็บผลลัพธ์ระหว่างขั้นตอน เกินแล้วจะย้ายลงดิสก์")
+    parser.add_argument('--crossfade-curve', choices=CROSSFADE_CURVES, default=None,
+                        help="รูปแบบคอสเฟด (equal_power = ระดับเสียงไม่ตกกลางรอยต่อ)")
+    parser.add_argument('--decode-cache', type=int, default=None,
+                        help="memory (MB) สำหรับแคชเสียงที่ถอดรหัสแล้ว ใช้ซ้ำเมื่อไฟล์เดิมถูกใช้อีก (0 = ปิด)")
+    parser.add_argument('--decode-cache-disk', type=int, default=None,
+                        help="พื้นที่ดิสก์ (MB) สำหรับแคชเสียงที่ล้นจาก memory (อ่านกลับด้วย mmap)")
+    parser.add_argument('--progress', default='json', choices=['json', 'text', 'none'],
+                        help="รูปแบบการแสดงความคืบหน้า (json = หนึ่งบรรทัดต่อเหตุการณ์)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Audio File Manager (headless)")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    organize = subparsers.add_parser('organize', help="จัดระเบียบไฟล์เสียงตามตัวเลขท้ายชื่อ")
+    organize.add_argument('files', nargs='*')
+    organize.add_argument('--source-dir')
+    add_common_arguments(organize)
+
+    merge = subparsers.add_parser('merge', help="รวมไฟล์เสียงในแต่ละโฟลเดอร์")
+    merge.add_argument('folders', nargs='*')
+    merge.add_argument('--parent', help="โฟลเดอร์หลักที่มีโฟลเดอร์ย่อย")
+    merge.add_argument('--depth', type=int, default=1, help="ความลึกในการค้นหาโฟลเดอร์ย่อย (0 = ทุกชั้น)")
+    merge.add_argument('--crossfade', type=float, default=3)
+    add_format_arguments(merge)
+    add_common_arguments(merge)
+
+    loop = subparsers.add_parser('loop', help="ลูปไฟล์เสียง")
+    loop.add_argument('files', nargs='+')
+    loop.add_argument('--count', type=int, default=3)
+    loop.add_argument('--crossfade', type=float, default=3)
+    add_common_arguments(loop)
+
+    run = subparsers.add_parser('run', help="รันทั้ง pipeline จาก argument หรือไฟล์ job (JSON)")
+    run.add_argument('--job', help="ไฟล์ job (JSON) ตามรูปแบบของ audio_core.run_pipeline")
+    run.add_argument('--organize-dir', help="โฟลเดอร์ไฟล์เสียงที่ต้องการจัดระเบียบ")
+    run.add_argument('--merge', action='store_true', help="รวมไฟล์เสียงหลังจัดระเบียบ")
+    run.add_argument('--parent', help="โฟลเดอร์หลักที่มีโฟลเดอร์ย่อยสำหรับรวมเสียง")
+    run.add_argument('--depth', type=int, default=1, help="ความลึกในการค้นหาโฟลเดอร์ย่อย (0 = ทุกชั้น)")
+    run.add_argument('--crossfade', type=float, default=3)
+    add_format_arguments(run)
+    run.add_argument('--loop-count', type=int, default=0, help="ลูปผลลัพธ์ตามจำนวนครั้ง (0 = ไม่ลูป)")
+    run.add_argument('--loop-crossfade', type=float, default=3)
+    add_common_arguments(run)
+
+    resume = subparsers.add_parser('resume', help="ทำการจัดระเบียบที่หยุดกลางทางต่อจากบันทึก")
+    resume.add_argument('--journal', help="ไฟล์บันทึก (ค่าเริ่มต้น: ทุกบันทึกที่ยังไม่เสร็จ)")
+    resume.add_argument('--progress', default='json', choices=['json', 'text', 'none'])
+
+    undo = subparsers.add_parser('undo', help="ย้ายไฟล์ของการจัดระเบียบกลับที่เดิม")
+    undo.add_argument('--journal', help="ไฟล์บันทึก (ค่าเริ่มต้น: การจัดระเบียบครั้งล่าสุด)")
+    undo.add_argument('--progress', default='json', choices=['json', 'text', 'none'])
+
+    return parser
+
+
+def build_job(args):
+    """แปลง argument เป็น job สำหรับ run_pipeline"""
+    if args.command == 'run' and args.job:
+        with open(args.job, encoding='utf-8') as f:
+            job = json.load(f)
+    else:
+        job = {}
+        if args.command == 'organize' or (args.command == 'run' and args.organize_dir):
+            job['organize'] = {
+                'files': getattr(args, 'files', None) or [],
+                'source_dir': getattr(args, 'source_dir', None) or getattr(args, 'organize_dir', None)
+            }
+        if args.command == 'merge' or (args.command == 'run' and (args.merge or args.parent)):
+            job['merge'] = {
+                'folders': getattr(args, 'folders', None) or [],
+                'parent': args.parent,
+                'depth': args.depth or None,
+                'crossfade': args.crossfade,
+                'sample_rate': args.sample_rate,
+                'channels': args.channels,
+                'sample_width': args.sample_width
+            }
+        if args.command == 'loop':
+            job['loop'] = {'files': args.files, 'count': args.count, 'crossfade': args.crossfade}
+        elif args.command == 'run' and args.loop_count > 1:
+            job['loop'] = {'count': args.loop_count, 'crossfade': args.loop_crossfade}
+
+    # argument ที่ระบุใน command line ใช้แทนค่าในไฟล์ job
+    export = job.setdefault('export', {})
+    if args.output:
+        export['output_dir'] = args.output
+    export.setdefault('format', args.format)
+    export.setdefault('bitrate', args.bitrate)
+    export.setdefault('bit_depth', args.bit_depth)
+    job.setdefault('backend', args.backend)
+    if args.workers:
+        job['workers'] = args.workers
+    if args.memory_budget:
+        job['memory_budget_mb'] = args.memory_budget
+    if args.crossfade_curve:
+        for stage in ('merge', 'loop'):
+            if job.get(stage) is not None:
+                job[stage]['curve'] = args.crossfade_curve
+    if args.decode_cache is not None:
+        job['decode_cache_mb'] = args.decode_cache
+    if args.decode_cache_disk is not None:
+        job['decode_cache_disk_mb'] = args.decode_cache_disk
+    return job
+
+
+def make_reporter(mode, stream=sys.stdout):
+    """สร้างฟังก์ชันรายงานความคืบหน้า"""
+    def report_json(event):
+        stream.write(json.dumps(event, ensure_ascii=False) + "\n")
+        stream.flush()
+
+    def report_text(event):
+        kind = event['event']
+        if kind == 'stage':
+            stream.write(f"[{event['stage']}] {event['total']} รายการ\n")
+        elif kind == 'progress':
+            stream.write(f"[{event['stage']}] {event['done']}/{event['total']} {event.get('item', '')}\n")
+        elif kind == 'error':
+            stream.write(f"[{event['stage']}] ผิดพลาด {event['item']}: {event['message']}\n")
+        elif kind == 'done':
+            stream.write(f"เสร็จสิ้น: บันทึก {event['outputs']} ไฟล์, ผิดพลาด {event['errors']} รายการ\n")
+            cache = event.get('decode_cache')
+            if cache:
+                stream.write(f"แคชเสียง: ใช้ซ้ำ {cache['hits']} ครั้ง, ถอดรหัสใหม่ {cache['misses']} ครั้ง\n")
+            ffmpeg = event.get('ffmpeg')
+            if ffmpeg:
+                stream.write(f"ffmpeg: ถอดรหัส {ffmpeg['decode_spawns']} ครั้ง, เข้ารหัส {ffmpeg['encode_spawns']} ครั้ง "
+                             f"(เฉลี่ย {ffmpeg['spawn_ms_avg']} ms), อ่านเองไม่ใช้ ffmpeg {ffmpeg['in_process']} ไฟล์\n")
+        stream.flush()
+
+    if mode == 'json':
+        return report_json
+    if mode == 'text':
+        return report_text
+    return None
+
+
+def run_journal_command(args, progress):
+    """คำสั่ง resume / undo จากบันทึกการจัดระเบียบ"""
+    def report(done, total):
+        progress({'event': 'progress', 'stage': args.command, 'done': done, 'total': total})
+
+    if args.command == 'resume':
+        journals = [args.journal] if args.journal else find_incomplete_journals()
+        progress({'event': 'stage', 'stage': 'resume', 'total': len(journals)})
+        moved_files = 0
+        for journal in journals:
+            moved, base_dir = resume_organize(journal, report)
+            moved_files += moved
+        progress({'event': 'done', 'outputs': moved_files, 'errors': 0})
+        return
+
+    journal = args.journal or latest_committed_journal()
+    if not journal:
+        progress({'event': 'error', 'stage': 'undo', 'item': '', 'message': "ไม่มีการจัดระเบียบที่ย้อนกลับได้"})
+        return
+    progress({'event': 'stage', 'stage': 'undo', 'total': 1})
+    restored, skipped = undo_organize(journal, report)
+    for path in skipped:
+        progress({'event': 'error', 'stage': 'undo', 'item': path, 'message': "ย้ายกลับไม่ได้"})
+    progress({'event': 'done', 'outputs': restored, 'errors': len(skipped)})
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    reporter = make_reporter(args.progress)
+
+    errors = []
+
+    def progress(event):
+        if event['event'] == 'error':
+            errors.append(event)
+        if reporter:
+            reporter(event)
+
+    try:
+        if args.command in ('resume', 'undo'):
+            run_journal_command(args, progress)
+        else:
+            run_pipeline(build_job(args), progress)
+    except Exception as e:
+        progress({'event': 'error', 'stage': 'pipeline', 'item': '', 'message': str(e)})
+        return 2
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
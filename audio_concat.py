@@ -0,0 +1,185 @@
+import os
+import time
+import struct
+import tempfile
+import subprocess
+from pathlib import Path
+try:
+    from pydub import AudioSegment
+    PYDUB_AVAILABLE = True
+except ImportError:
+    PYDUB_AVAILABLE = False
+from audio_probe import file_info, decoded_sample_width, flac_bits, stream_bitrate
+from audio_decode import record
+
+# ทางลัดรวมไฟล์แบบไม่ถอดรหัส/เข้ารหัสใหม่ (ใช้เมื่อไม่มีคอสเฟด และทุกไฟล์รูปแบบเดียวกับผลลัพธ์)
+# - WAV: เขียน header ใหม่แล้วคัดลอก data chunk ของทุกไฟล์ต่อกัน (ในโปรเซส ไม่ใช้ ffmpeg)
+# - MP3/FLAC/M4A: ffmpeg concat demuxer แบบ -c copy (ต่อ frame เดิม ไม่เข้ารหัสใหม่)
+#   ต้นฉบับต้องมี bitrate คงที่ (MP3/M4A) หรือ bit depth (FLAC) ตรงกับที่เลือกไว้
+# ถ้าเงื่อนไขไม่ครบคืนค่า None ให้ใช้การรวมแบบปกติ
+
+COPY_CHUNK_BYTES = 4 * 1024 * 1024
+WAV_MAX_BYTES = 0xFFFFFFFF - 36  # ขนาดสูงสุดของ data chunk ใน RIFF
+
+# codec ของไฟล์ต้นฉบับที่ต่อกันแบบ -c copy ได้ ตามรูปแบบผลลัพธ์ → format ของ ffmpeg
+COPY_CODECS = {'mp3': ('mp3', 'mp3'), 'flac': ('flac', 'flac'), 'm4a': ('aac', 'mp4')}
+
+
+def _wav_chunks(f):
+    """(fmt chunk, ตำแหน่งเริ่ม data, ขนาด data) ของไฟล์ WAV (None ถ้าอ่านไม่ได้)"""
+    header = f.read(12)
+    if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        return None
+    file_size = os.fstat(f.fileno()).st_size
+    fmt = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, chunk_size = struct.unpack('<4sI', chunk)
+        if chunk_id == b'fmt ':
+            fmt = f.read(chunk_size)
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)
+        elif chunk_id == b'data':
+            if fmt is None:
+                return None
+            data_start = f.tell()
+            return fmt, data_start, min(chunk_size, file_size - data_start)
+        else:
+            f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+
+
+def _parse_bitrate(bitrate):
+    """'320k' → 320000 (None ถ้าอ่านไม่ได้)"""
+    text = str(bitrate).strip().lower()
+    try:
+        if text.endswith('k'):
+            return int(float(text[:-1]) * 1000)
+        return int(text)
+    except ValueError:
+        return None
+
+
+def _source_format(file_path):
+    """(codec, sample_rate, channels, sample_width, stream) จาก header/แคช (None ถ้าอ่านไม่ได้)
+
+    stream = bit depth ของ FLAC หรือ bitrate คงที่ของ MP3/AAC (None ถ้าไม่ทราบหรือเป็น VBR)
+    """
+    info = file_info(file_path)
+    if not info or not info.get('codec'):
+        return None
+    codec = info['codec']
+    if codec == 'flac':
+        stream = flac_bits(file_path)
+    elif codec in ('mp3', 'aac'):
+        stream = stream_bitrate(file_path)
+    else:
+        stream = None
+    return (codec, info.get('sample_rate'), info.get('channels'),
+            decoded_sample_width(file_path, info), stream)
+
+
+def concat_method(file_paths, output_format, bit_depth=24, target_format=None, bitrate="320k"):
+    """วิธีรวมแบบไม่ถอดรหัส: 'wav', 'copy' หรือ None (ต้องรวมแบบปกติ)"""
+    formats = {_source_format(file_path) for file_path in file_paths}
+    if len(formats) != 1 or None in formats:
+        return None
+    codec, sample_rate, channels, sample_width, stream = formats.pop()
+    if target_format and tuple(target_format) != (sample_rate, channels, sample_width):
+        return None
+    if output_format == 'wav':
+        # ผลลัพธ์ WAV เข้ารหัสเป็น pcm_s{bit_depth}le ต้นฉบับต้องเป็นแบบเดียวกัน
+        return 'wav' if codec == f"pcm_s{bit_depth}le" else None
+    expected = COPY_CODECS.get(output_format)
+    if expected is None or codec != expected[0]:
+        return None
+    if output_format == 'flac':
+        # ผลลัพธ์ต้องได้ bit depth ที่เลือก
+        return 'copy' if stream == bit_depth else None
+    # MP3/M4A: ต้นฉบับต้องเป็น bitrate คงที่เท่ากับที่เลือกไว้ (VBR หรือ bitrate อื่นต้องเข้ารหัสใหม่)
+    return 'copy' if stream is not None and stream == _parse_bitrate(bitrate) else None
+
+
+def concat_wav(file_paths, output_file):
+    """ต่อ data chunk ของไฟล์ WAV ที่รูปแบบเดียวกันลงไฟล์เดียว คืนค่า path (None ถ้าทำไม่ได้)"""
+    sources = []
+    for file_path in file_paths:
+        with open(file_path, 'rb') as f:
+            chunks = _wav_chunks(f)
+        if chunks is None:
+            return None
+        sources.append((file_path,) + chunks)
+    data_size = sum(source[3] for source in sources)
+    if data_size > WAV_MAX_BYTES:
+        return None
+
+    fmt = sources[0][1]
+    fmt_chunk = b'fmt ' + struct.pack('<I', len(fmt)) + fmt + (b'\0' if len(fmt) % 2 else b'')
+    riff_size = 4 + len(fmt_chunk) + 8 + data_size + (data_size % 2)
+    try:
+        with open(output_file, 'wb') as out:
+            out.write(b'RIFF' + struct.pack('<I', riff_size) + b'WAVE' + fmt_chunk)
+            out.write(b'data' + struct.pack('<I', data_size))
+            for file_path, _, data_start, size in sources:
+                with open(file_path, 'rb') as f:
+                    f.seek(data_start)
+                    while size > 0:
+                        block = f.read(min(COPY_CHUNK_BYTES, size))
+                        if not block:
+                            raise OSError(f"ไฟล์ {Path(file_path).name} สั้นกว่าที่ header ระบุ")
+                        out.write(block)
+                        size -= len(block)
+            if data_size % 2:
+                out.write(b'\0')
+    except OSError:
+        _remove(output_file)
+        raise
+    return output_file
+
+
+def concat_copy(file_paths, output_file, output_format):
+    """ต่อไฟล์ด้วย ffmpeg concat demuxer แบบไม่เข้ารหัสใหม่ คืนค่า path (None ถ้า ffmpeg ทำไม่ได้)"""
+    converter = AudioSegment.converter if PYDUB_AVAILABLE else "ffmpeg"
+    list_fd, list_path = tempfile.mkstemp(prefix="mixpro_concat_", suffix=".txt")
+    try:
+        with os.fdopen(list_fd, 'w', encoding='utf-8') as f:
+            for file_path in file_paths:
+                escaped = os.path.abspath(str(file_path)).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        command = [converter, "-y", "-nostdin", "-loglevel", "error",
+                   "-f", "concat", "-safe", "0", "-i", list_path,
+                   "-map", "0:a", "-c", "copy", "-f", COPY_CODECS[output_format][1], str(output_file)]
+        started = time.perf_counter()
+        process = subprocess.run(command, stdin=subprocess.DEVNULL,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        record('encode', time.perf_counter() - started)
+    finally:
+        _remove(list_path)
+    if process.returncode != 0:
+        print(f"ต่อไฟล์แบบไม่เข้ารหัสใหม่ไม่สำเร็จ ใช้การรวมแบบปกติ: "
+              f"{process.stderr.decode('utf-8', 'replace').strip()}")
+        _remove(output_file)
+        return None
+    return str(output_file)
+
+
+def concat_files(file_paths, output_file, output_format, bit_depth=24, target_format=None,
+                 bitrate="320k"):
+    """รวมไฟล์โดยไม่ถอดรหัส ถ้าทุกไฟล์รูปแบบเดียวกับผลลัพธ์ คืนค่า path (None = ต้องรวมแบบปกติ)"""
+    file_paths = [str(file_path) for file_path in file_paths]
+    if not file_paths:
+        return None
+    method = concat_method(file_paths, output_format, bit_depth, target_format, bitrate)
+    if method == 'wav':
+        return concat_wav(file_paths, output_file)
+    if method == 'copy':
+        return concat_copy(file_paths, output_file, output_format)
+    return None
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,540 @@
+import os
+import re
+import time
+import errno
+import shutil
+import tempfile
+from pathlib import Path
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from audio_jobs import (run_jobs, run_merge_job, run_loop_job, merge_output_name, loop_output_name,
+                        plan_target_formats)
+from audio_staging import StagingStore, DEFAULT_MEMORY_BUDGET_MB
+from audio_journal import OrganizeJournal
+from audio_pcm_cache import configure_decoded_cache, get_decoded_cache, DEFAULT_DISK_CACHE_MB
+from audio_decode import spawn_stats, merge_spawn_stats
+from audio_dsp import DEFAULT_CROSSFADE_CURVE
+
+# ส่วนหลักที่ไม่ขึ้นกับ GUI: ใช้ร่วมกันระหว่าง audio_manager.py (Tk) และ audio_cli.py (headless)
+
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg', '.wma'}
+
+MOVE_WORKERS = 8  # การย้ายไฟล์บน NAS รอ network เป็นหลัก ใช้หลาย thread ได้
+PROGRESS_INTERVAL = 0.1  # วินาที ระหว่างการรายงานความคืบหน้าการย้ายไฟล์
+
+
+def natural_sort_key(filename):
+    """เรียงลำดับไฟล์ตามตัวเลขในชื่อไฟล์"""
+    return [int(text) if text.isdigit() else text.lower() for text in re.split('([0-9]+)', filename)]
+
+
+def group_files_by_number(file_paths):
+    """จัดกลุ่มไฟล์ตามตัวเลขท้ายชื่อไฟล์ คืนค่า (กลุ่ม {เลข: [ชื่อไฟล์]}, ไฟล์ที่ไม่มีตัวเลข)"""
+    groups = defaultdict(list)
+    no_number_files = []
+
+    for file_path_str in file_paths:
+        file_path = Path(file_path_str)
+        # หาตัวเลขท้ายชื่อไฟล์ (อาจมีช่องว่างก่อนนามสกุล)
+        match = re.search(r'(\d+)\s*$', file_path.stem)
+        if match:
+            groups[match.group(1)].append(file_path.name)
+        else:
+            no_number_files.append(file_path.name)
+
+    return groups, no_number_files
+
+
+def _unique_name(file_name, taken):
+    """ชื่อไฟล์ที่ไม่ซ้ำกับชื่อใน taken (เติม _1, _2, ... แบบเดียวกับ unique_path) แล้วจองชื่อนั้นไว้
+
+    taken เก็บชื่อแบบ casefold: Windows/macOS ไม่แยกตัวพิมพ์เล็ก-ใหญ่ "Track 1.mp3" กับ "track 1.mp3"
+    จึงเป็นไฟล์เดียวกัน (บนระบบที่แยกตัวพิมพ์ก็แค่เติม _1 ไม่มีไฟล์ถูกเขียนทับ)
+    """
+    if file_name.casefold() in taken:
+        stem, suffix = os.path.splitext(file_name)
+        counter = 1
+        while f"{stem}_{counter}{suffix}".casefold() in taken:
+            counter += 1
+        file_name = f"{stem}_{counter}{suffix}"
+    taken.add(file_name.casefold())
+    return file_name
+
+
+def plan_organize(file_paths, groups, base_dir=None):
+    """วางแผนการย้ายไฟล์ตามกลุ่มตัวเลข โดยไม่แตะไฟล์
+
+    สร้าง index ชื่อไฟล์ → path ครั้งเดียว และอ่านรายชื่อไฟล์ของแต่ละโฟลเดอร์ปลายทางครั้งเดียว
+    แล้วแก้ชื่อซ้ำใน memory คืนค่า (รายการ (ต้นทาง, ปลายทาง), โฟลเดอร์ฐาน)
+    """
+    # ใช้ตำแหน่งของไฟล์แรกเป็นฐาน
+    base_dir = Path(base_dir) if base_dir else Path(file_paths[0]).parent
+
+    # ชื่อไฟล์ซ้ำ (มาจากหลายโฟลเดอร์) ใช้ path ตามลำดับที่เลือก
+    sources = defaultdict(deque)
+    for file_path_str in file_paths:
+        sources[os.path.basename(file_path_str)].append(str(file_path_str))
+
+    plan = []
+    for number, file_names in groups.items():
+        target_dir = os.path.join(str(base_dir), number)
+        try:
+            taken = {name.casefold() for name in os.listdir(target_dir)}
+        except OSError:
+            taken = set()
+
+        for file_name in file_names:
+            if not sources[file_name]:
+                continue
+            source = sources[file_name].popleft()
+            plan.append((source, os.path.join(target_dir, _unique_name(file_name, taken))))
+
+    return plan, base_dir
+
+
+def move_file(source, target, same_device=True):
+    """ย้ายไฟล์ filesystem เดียวกันใช้ os.rename ข้าม filesystem คัดลอกแล้วลบต้นฉบับ
+    คืนค่า False ถ้าไฟล์ต้นทางไม่มีแล้ว"""
+    try:
+        if same_device:
+            try:
+                os.rename(source, target)
+                return True
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+        shutil.copy2(source, target)
+        os.unlink(source)
+        return True
+    except FileNotFoundError:
+        if os.path.exists(source):
+            raise  # โฟลเดอร์ปลายทางหายไประหว่างย้าย
+        return False
+
+
+def execute_moves(plan, progress=None, max_workers=MOVE_WORKERS, on_moved=None):
+    """ย้ายไฟล์ตามแผนแบบขนาน คืนค่าจำนวนไฟล์ที่ย้ายสำเร็จ (ไฟล์ต้นทางที่หายไปแล้วจะข้าม)
+
+    progress(ย้ายแล้ว, ทั้งหมด) ถูกเรียกไม่เกินทุก PROGRESS_INTERVAL วินาที และครั้งสุดท้ายเมื่อเสร็จ
+    on_moved(ลำดับในแผน) ถูกเรียกทุกครั้งที่ย้ายไฟล์สำเร็จ (ใช้บันทึกความคืบหน้า)
+    """
+    moved_files = 0
+    total_files = len(plan)
+    if not plan:
+        return 0
+
+    # สร้างโฟลเดอร์ปลายทาง และดูว่าอยู่ filesystem เดียวกับต้นทางหรือไม่ (stat ครั้งเดียวต่อโฟลเดอร์)
+    devices = {}
+
+    def device(directory):
+        if directory not in devices:
+            try:
+                devices[directory] = os.stat(directory).st_dev
+            except OSError:
+                devices[directory] = None
+        return devices[directory]
+
+    for target_dir in set(os.path.dirname(target) for source, target in plan):
+        os.makedirs(target_dir, exist_ok=True)
+
+    last_report = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(move_file, source, target,
+                            device(os.path.dirname(source)) == device(os.path.dirname(target))): index
+            for index, (source, target) in enumerate(plan)
+        }
+        error = None
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            try:
+                moved = future.result()
+            except Exception as e:
+                # หยุดงานที่ยังไม่เริ่ม แต่ยังบันทึกไฟล์ที่ย้ายเสร็จแล้วให้ครบ
+                if error is None:
+                    error = e
+                    for pending in futures:
+                        pending.cancel()
+                continue
+            if moved:
+                moved_files += 1
+                if on_moved:
+                    on_moved(futures[future])
+                now = time.monotonic()
+                if progress and now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    progress(moved_files, total_files)
+        if error is not None:
+            raise error
+
+    if progress:
+        progress(moved_files, total_files)
+    return moved_files
+
+
+def organize_files(file_paths, groups, progress=None, journal_dir=None):
+    """ย้ายไฟล์เข้าโฟลเดอร์ตามกลุ่มตัวเลข คืนค่า (จำนวนไฟล์ที่ย้าย, โฟลเดอร์ฐาน)
+
+    แผนและความคืบหน้าถูกเขียนลงบันทึก (audio_journal) ก่อนย้าย เพื่อทำต่อหรือย้อนกลับได้
+    """
+    plan, base_dir = plan_organize(file_paths, groups)
+    journal = OrganizeJournal.create(plan, base_dir, journal_dir)
+    try:
+        moved_files = execute_moves(plan, progress, on_moved=journal.record_done)
+        journal.commit()
+    finally:
+        journal.close()
+    return moved_files, base_dir
+
+
+def resume_organize(journal_path, progress=None):
+    """ทำการจัดระเบียบที่หยุดกลางทางต่อจากบันทึก คืนค่า (จำนวนไฟล์ที่ย้าย, โฟลเดอร์ฐาน)"""
+    journal = OrganizeJournal.load(journal_path)
+    try:
+        if journal.finished:
+            return 0, Path(journal.base_dir) if journal.base_dir else None
+
+        remaining = []
+        reserved = {Path(target) for source, target in journal.moves}
+        for index, source, target in journal.pending():
+            if not os.path.exists(target):
+                remaining.append((index, source, target))
+            elif not os.path.exists(source):
+                # ย้ายไปแล้วแต่บันทึกไม่ทันก่อนโปรแกรมหยุด
+                journal.record_done(index)
+            else:
+                # มีไฟล์อื่นมาอยู่ที่ปลายทางหลังจากวางแผน ย้ายไปชื่อใหม่แทนการเขียนทับ
+                target = str(unique_path(target, reserved))
+                journal.record_retarget(index, target)
+                remaining.append((index, source, target))
+
+        moved_files = execute_moves([(source, target) for index, source, target in remaining], progress,
+                                    on_moved=lambda k: journal.record_done(remaining[k][0]))
+        journal.commit()
+    finally:
+        journal.close()
+    return moved_files, Path(journal.base_dir)
+
+
+def undo_organize(journal_path, progress=None):
+    """ย้ายไฟล์กลับที่เดิมตามบันทึก คืนค่า (จำนวนไฟล์ที่ย้ายกลับ, ไฟล์ที่ย้ายกลับไม่ได้)
+
+    ไฟล์ที่ไม่อยู่ที่ปลายทางแล้ว หรือมีไฟล์อื่นอยู่ที่ตำแหน่งเดิม จะไม่ถูกย้าย (ไม่เขียนทับ)
+    """
+    journal = OrganizeJournal.load(journal_path)
+    try:
+        moves = []
+        skipped = []
+        for index, source, target in journal.moved():
+            if os.path.exists(target) and not os.path.exists(source):
+                moves.append((index, target, source))
+            else:
+                skipped.append(target)
+
+        restored = execute_moves([(target, source) for index, target, source in moves], progress,
+                                 on_moved=lambda k: journal.record_undo(moves[k][0]))
+
+        # ลบโฟลเดอร์ที่สร้างตอนจัดระเบียบถ้าว่างแล้ว
+        for target_dir in set(os.path.dirname(target) for source, target in journal.moves):
+            try:
+                os.rmdir(target_dir)
+            except OSError:
+                pass
+        journal.mark_reverted()
+    finally:
+        journal.close()
+    return restored, skipped
+
+
+def format_duration(seconds):
+    """แปลงวินาทีเป็นข้อความ mm:ss ("N/A" ถ้าไม่ทราบระยะเวลา)"""
+    if not seconds or seconds <= 0:
+        return "N/A"
+    return f"{int(seconds//60):02d}:{int(seconds%60):02d}"
+
+
+def unique_path(path, reserved=None):
+    """คืนค่า path ที่ยังไม่มีไฟล์อยู่ โดยเติม _1, _2, ... ถ้าชื่อซ้ำ
+
+    reserved = set ของ path ที่จองไว้แล้ว (ไฟล์ที่กำลังจะเขียนพร้อมกัน) จะเพิ่ม path ที่ได้ลงไปด้วย
+    """
+    path = Path(path)
+    counter = 1
+    original = path
+    while path.exists() or (reserved is not None and path in reserved):
+        path = original.parent / f"{original.stem}_{counter}{original.suffix}"
+        counter += 1
+    if reserved is not None:
+        reserved.add(path)
+    return path
+
+
+def _is_audio_name(name):
+    # เทียบนามสกุลแบบเดียวกับ splitext แต่เร็วกว่า (เรียกกับทุกไฟล์ในโฟลเดอร์)
+    return name[name.rfind('.'):].lower() in AUDIO_EXTENSIONS
+
+
+def scan_audio_files(folder):
+    """ชื่อไฟล์เสียงในโฟลเดอร์ (ไม่เรียง) อ่านด้วย os.scandir ใช้ชนิดไฟล์จาก directory entry ไม่ต้อง stat ทีละไฟล์"""
+    with os.scandir(str(folder)) as entries:
+        return [entry.name for entry in entries if _is_audio_name(entry.name) and entry.is_file()]
+
+
+def list_audio_files(folder):
+    """รายชื่อไฟล์เสียงในโฟลเดอร์ เรียงตามตัวเลขในชื่อไฟล์"""
+    return sorted(scan_audio_files(folder), key=natural_sort_key)
+
+
+def iter_audio_folders(parent, max_depth=1):
+    """หาโฟลเดอร์ย่อยที่มีไฟล์เสียง yield (path, [ชื่อไฟล์เสียง]) ทันทีที่พบ
+
+    อ่านแต่ละโฟลเดอร์ด้วย os.scandir ครั้งเดียว ได้ทั้งไฟล์เสียงและโฟลเดอร์ย่อยที่ต้องค้นต่อ
+    max_depth = ความลึกที่ค้น (1 = เฉพาะโฟลเดอร์ย่อยชั้นแรก, None = ทุกชั้น)
+    โฟลเดอร์ที่ค้นแล้วจะไม่ค้นซ้ำ (symlink ที่ชี้กลับไปโฟลเดอร์แม่จะไม่วนไม่รู้จบ)
+    """
+    queue = deque([(str(parent), 0)])
+    visited = set()
+    while queue:
+        folder, depth = queue.popleft()
+        audio_files = []
+        subfolders = []
+        try:
+            stat = os.stat(folder)
+            if (stat.st_dev, stat.st_ino) in visited:
+                continue
+            visited.add((stat.st_dev, stat.st_ino))
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if _is_audio_name(entry.name) and entry.is_file():
+                        audio_files.append(entry.name)
+                    elif entry.is_dir():
+                        subfolders.append(entry.path)
+        except OSError:
+            continue
+
+        if depth > 0 and audio_files:
+            yield folder, audio_files
+        if max_depth is None or depth < max_depth:
+            subfolders.sort(key=lambda path: natural_sort_key(os.path.basename(path)))
+            queue.extend((path, depth + 1) for path in subfolders)
+
+
+def find_audio_folders(parent, max_depth=1):
+    """หาโฟลเดอร์ย่อยที่มีไฟล์เสียง"""
+    found_folders = [folder for folder, audio_files in iter_audio_folders(parent, max_depth)]
+    return sorted(found_folders, key=lambda x: natural_sort_key(os.path.relpath(x, str(parent))))
+
+
+def export_audio(audio, output_file, output_format, bitrate="320k", bit_depth=24):
+    """Export เสียงตามรูปแบบที่เลือก"""
+    if output_format == "mp3":
+        audio.export(str(output_file), format="mp3", bitrate=bitrate)
+    elif output_format == "wav":
+        audio.export(str(output_file), format="wav",
+                     parameters=["-acodec", f"pcm_s{bit_depth}le"])
+    elif output_format == "flac":
+        audio.export(str(output_file), format="flac",
+                     parameters=["-sample_fmt", f"s{bit_depth}"])
+    elif output_format == "m4a":
+        audio.export(str(output_file), format="mp4", bitrate=bitrate)
+    else:
+        raise ValueError(f"ไม่รองรับรูปแบบไฟล์: {output_format}")
+
+
+def stream_output(job, output_path, name, export, reserved):
+    """ตั้งค่า job ให้เข้ารหัสลงไฟล์ปลายทางระหว่างประมวลผล (ไม่ต้องเก็บผลลัพธ์ทั้งไฟล์ไว้ก่อน export)"""
+    job['output_file'] = str(unique_path(Path(output_path) / name, reserved))
+    job['bitrate'] = export.get('bitrate', '320k')
+    job['bit_depth'] = int(export.get('bit_depth', 24))
+    return job
+
+
+def _emit(progress, event, **fields):
+    if progress:
+        event_data = {'event': event}
+        event_data.update(fields)
+        progress(event_data)
+
+
+def run_pipeline(job, progress=None):
+    """รันขั้นตอน organize → merge → loop → export ตาม job (dict) โดยไม่ใช้ GUI
+
+    job = {
+        'organize': {'files': [...]} หรือ {'source_dir': ...},
+        'merge': {'parent': ..., 'depth': 1, 'folders': [...], 'crossfade': 3, 'curve': 'linear',
+                  'sample_rate': None, 'channels': None, 'sample_width': None},
+        'loop': {'count': 3, 'crossfade': 3, 'curve': 'linear', 'files': [...]},
+        'export': {'output_dir': ..., 'format': 'wav', 'bitrate': '320k', 'bit_depth': 24},
+        'backend': 'thread', 'workers': None, 'work_dir': None, 'memory_budget_mb': 2048,
+        'decode_cache_mb': 512, 'decode_cache_disk_mb': 0
+    }
+    progress รับ dict ของเหตุการณ์ (event = stage / progress / error / output / done)
+    curve = รูปแบบคอสเฟด 'linear' หรือ 'equal_power'
+    sample_rate / channels / sample_width = รูปแบบเสียงของผลลัพธ์การรวม (None = เลือกจากไฟล์ในโฟลเดอร์)
+    decode_cache_mb = งบของแคชเสียงที่ถอดรหัสแล้ว (0 = ปิด) done จะรายงานสถิติของแคชด้วย
+    ถ้ามี output_dir ขั้นตอนสุดท้าย (merge หรือ loop) จะเข้ารหัสลงไฟล์ทันทีระหว่างประมวลผล
+    คืนค่ารายการไฟล์ที่ export แล้ว
+    """
+    backend = job.get('backend', 'thread')
+    max_workers = job.get('workers')
+    work_dir = None
+    own_work_dir = False
+    if backend == 'process':
+        # โหมด process ส่งผลลัพธ์ผ่านไฟล์ PCM จึงต้องมีโฟลเดอร์ทำงาน
+        work_dir = job.get('work_dir')
+        if not work_dir:
+            work_dir = tempfile.mkdtemp(prefix="mixpro_jobs_")
+            own_work_dir = True
+    export = job.get('export') or {}
+    output_format = export.get('format', 'wav')
+    output_path = None
+    if export.get('output_dir'):
+        output_path = Path(export['output_dir'])
+        output_path.mkdir(parents=True, exist_ok=True)
+    reserved = set()
+    if job.get('decode_cache_mb') is not None:
+        configure_decoded_cache(job['decode_cache_mb'],
+                                job.get('decode_cache_disk_mb') or DEFAULT_DISK_CACHE_MB)
+    # ผลลัพธ์ระหว่างขั้นตอน เกินงบ memory จะย้ายลงดิสก์
+    memory_budget_mb = job.get('memory_budget_mb') or DEFAULT_MEMORY_BUDGET_MB
+    folders = []
+    results = StagingStore(memory_budget_mb, work_dir)
+    outputs = []
+    errors = 0
+
+    # 1) จัดระเบียบไฟล์
+    organize = job.get('organize')
+    if organize:
+        files = list(organize.get('files') or [])
+        if organize.get('source_dir'):
+            source = str(organize['source_dir'])
+            files += sorted(os.path.join(source, name) for name in scan_audio_files(source))
+        groups, no_number_files = group_files_by_number(files)
+        _emit(progress, 'stage', stage='organize', total=sum(len(g) for g in groups.values()),
+              skipped=len(no_number_files))
+        if groups:
+            moved, base_dir = organize_files(
+                files, groups,
+                lambda done, total: _emit(progress, 'progress', stage='organize', done=done, total=total)
+            )
+            folders = [str(base_dir / number) for number in sorted(groups, key=int)]
+
+    # ผลลัพธ์ของขั้นตอนสุดท้ายเข้ารหัสลงไฟล์ปลายทางระหว่างประมวลผล ขั้นตอนก่อนหน้าเก็บไว้ส่งต่อ
+    loop = job.get('loop')
+
+    def collect(stage, result):
+        # สถิติการเรียก ffmpeg ของ worker process (โหมด process) รวมเข้าโปรเซสนี้
+        merge_spawn_stats(result.pop('spawn_stats', None))
+        if 'output' in result:
+            outputs.append(result['output'])
+            _emit(progress, 'output', stage=stage, path=result['output'])
+        else:
+            results.add(result)
+
+    # 2) รวมไฟล์เสียง
+    merge = job.get('merge')
+    if merge is not None:
+        folders = list(merge.get('folders') or folders)
+        if merge.get('parent'):
+            folders += find_audio_folders(merge['parent'], merge.get('depth', 1))
+        crossfade_ms = int(float(merge.get('crossfade', 0)) * 1000)
+
+        jobs = []
+        for folder_path in folders:
+            try:
+                files = list_audio_files(folder_path)
+            except OSError as e:
+                errors += 1
+                _emit(progress, 'error', stage='merge', item=str(folder_path), message=str(e))
+                continue
+            merge_job = {
+                'folder_name': Path(folder_path).name,
+                'folder_path': str(folder_path),
+                'files': files,
+                'crossfade_ms': crossfade_ms,
+                'crossfade_curve': merge.get('curve', DEFAULT_CROSSFADE_CURVE),
+                'output_format': output_format,
+                'work_dir': work_dir
+            }
+            if output_path and not loop:
+                stream_output(merge_job, output_path,
+                              merge_output_name(merge_job['folder_name'], output_format), export, reserved)
+            jobs.append(merge_job)
+
+        # normalize: เลือกรูปแบบเสียงของแต่ละโฟลเดอร์ก่อนรวม ทุกไฟล์ถูกแปลงครั้งเดียวตอนถอดรหัส
+        _emit(progress, 'stage', stage='normalize', total=len(jobs))
+        converted = plan_target_formats(jobs, merge.get('sample_rate'), merge.get('channels'),
+                                        merge.get('sample_width'))
+        _emit(progress, 'progress', stage='normalize', done=len(jobs), total=len(jobs),
+              item=f"แปลงรูปแบบ {converted} ไฟล์", converted=converted)
+
+        _emit(progress, 'stage', stage='merge', total=len(jobs))
+        for done, (merge_job, result, error) in enumerate(
+                run_jobs(run_merge_job, jobs, backend, max_workers), 1):
+            if result:
+                collect('merge', result)
+            else:
+                errors += 1
+                _emit(progress, 'error', stage='merge', item=merge_job['folder_name'],
+                      message=str(error) if error else "ไม่มีเสียงที่อ่านได้")
+            _emit(progress, 'progress', stage='merge', done=done, total=len(jobs),
+                  item=merge_job['folder_name'])
+
+    # 3) ลูปเสียง (ลูปผลจากการรวม หรือไฟล์ที่กำหนด)
+    if loop:
+        crossfade_ms = int(float(loop.get('crossfade', 0)) * 1000)
+        loop_count = int(loop.get('count', 2))
+        curve = loop.get('curve', DEFAULT_CROSSFADE_CURVE)
+        jobs = [
+            {
+                'file_name': result['name'],
+                'source': result,
+                'loop_count': loop_count,
+                'crossfade_ms': crossfade_ms,
+                'crossfade_curve': curve,
+                'output_format': output_format,
+                'work_dir': work_dir
+            }
+            for result in results
+        ]
+        jobs += [
+            {
+                'file_name': Path(file_path).name,
+                'path': str(file_path),
+                'loop_count': loop_count,
+                'crossfade_ms': crossfade_ms,
+                'crossfade_curve': curve,
+                'output_format': output_format,
+                'work_dir': work_dir
+            }
+            for file_path in loop.get('files') or []
+        ]
+        if output_path:
+            for loop_job in jobs:
+                stream_output(loop_job, output_path,
+                              loop_output_name(loop_job['file_name'], output_format), export, reserved)
+
+        _emit(progress, 'stage', stage='loop', total=len(jobs))
+        merged = results
+        results = StagingStore(memory_budget_mb, work_dir)
+        for done, (loop_job, result, error) in enumerate(
+                run_jobs(run_loop_job, jobs, backend, max_workers), 1):
+            if result:
+                collect('loop', result)
+            else:
+                errors += 1
+                _emit(progress, 'error', stage='loop', item=loop_job['file_name'],
+                      message=str(error) if error else "ไม่สามารถลูปไฟล์ได้")
+            _emit(progress, 'progress', stage='loop', done=done, total=len(jobs),
+                  item=loop_job['file_name'])
+        merged.clear()
+
+    results.clear()
+    if own_work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    cache = get_decoded_cache()
+    _emit(progress, 'done', outputs=len(outputs), errors=errors,
+          decode_cache=cache.stats() if cache else None, ffmpeg=spawn_stats())
+    return outputs
@@ -0,0 +1,162 @@
+import os
+import time
+import threading
+import subprocess
+import multiprocessing
+from pathlib import Path
+try:
+    from pydub import AudioSegment
+    from pydub.audio_segment import fix_wav_headers
+    PYDUB_AVAILABLE = True
+except ImportError:
+    PYDUB_AVAILABLE = False
+try:
+    import numpy as np
+    import soundfile
+    SOUNDFILE_AVAILABLE = True
+except ImportError:
+    SOUNDFILE_AVAILABLE = False
+
+# ถอดรหัสไฟล์เสียงโดยเรียก ffmpeg ให้น้อยที่สุด
+# AudioSegment.from_file เรียก ffprobe + ffmpeg ทุกไฟล์ (2 โปรเซส) ไฟล์สั้นจำนวนมากจึงเสียเวลากับการเปิดโปรเซสมากกว่าการถอดรหัส
+# - WAV อ่านในโปรเซสเดียวกัน
+# - FLAC/OGG/AIFF อ่านในโปรเซสด้วย soundfile (ถ้าติดตั้งไว้)
+# - ไฟล์ lossy ใช้ ffmpeg ครั้งเดียว (ไม่ต้อง ffprobe: ถอดรหัสเป็น 16 บิตเหมือน pydub)
+# - ที่เหลือใช้ AudioSegment.from_file ตามเดิม
+# นับจำนวนครั้งและเวลาที่ใช้เรียก ffmpeg ไว้รายงานผล
+
+WAV_EXTENSIONS = {'.wav', '.wave'}
+SOUNDFILE_EXTENSIONS = {'.flac', '.ogg', '.aif', '.aiff'}
+LOSSY_EXTENSIONS = {'.mp3', '.aac', '.ogg', '.wma'}
+
+# sample width (ไบต์) ของผลลัพธ์ตาม subtype ของ soundfile (ค่าเดียวกับที่ pydub ได้จาก ffmpeg)
+# AudioSegment เก็บ 24 บิตเป็น 32 บิตอยู่แล้ว
+SOUNDFILE_WIDTHS = {'PCM_U8': 1, 'PCM_S8': 1, 'PCM_16': 2, 'PCM_24': 4, 'PCM_32': 4}
+
+_stats_lock = threading.Lock()
+_stats = {
+    'in_process': 0,  # ไฟล์ที่ถอดรหัสโดยไม่เรียก ffmpeg
+    'in_process_seconds': 0.0,
+    'decode_spawns': 0,  # จำนวนโปรเซส ffmpeg/ffprobe ที่เปิดเพื่อถอดรหัส
+    'decode_seconds': 0.0,
+    'encode_spawns': 0,
+    'encode_seconds': 0.0
+}
+
+
+def record(kind, seconds, count=1):
+    """บันทึกการถอดรหัส/เข้ารหัส (kind = 'in_process', 'decode', 'encode')"""
+    count_key = kind if kind == 'in_process' else f"{kind}_spawns"
+    with _stats_lock:
+        _stats[count_key] += count
+        _stats[f"{kind}_seconds"] += seconds
+
+
+def spawn_stats():
+    """สถิติการเรียก ffmpeg ของโปรเซสนี้"""
+    with _stats_lock:
+        stats = dict(_stats)
+    spawns = stats['decode_spawns'] + stats['encode_spawns']
+    stats['spawn_ms_avg'] = round((stats['decode_seconds'] + stats['encode_seconds']) * 1000 / spawns, 1) if spawns else 0
+    return stats
+
+
+def take_spawn_stats():
+    """คืนค่าสถิติแล้วเริ่มนับใหม่ (ใช้ส่งสถิติจาก worker process กลับโปรเซสหลัก)"""
+    with _stats_lock:
+        stats = dict(_stats)
+        for key in _stats:
+            _stats[key] = type(_stats[key])()
+    return stats
+
+
+def merge_spawn_stats(stats):
+    """รวมสถิติที่ได้จาก take_spawn_stats ของโปรเซสอื่น"""
+    if not stats:
+        return
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] += stats.get(key, 0)
+
+
+def _reset_after_fork():
+    # โปรเซสลูกที่ fork มาได้สำเนาสถิติของแม่ ถ้าไม่ล้างจะถูกส่งกลับไปรวมซ้ำ (และ lock อาจค้างตอน fork)
+    global _stats_lock
+    _stats_lock = threading.Lock()
+    for key in _stats:
+        _stats[key] = type(_stats[key])()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def attach_spawn_stats(result):
+    """แนบสถิติของ worker process ไปกับผลลัพธ์ (โหมด thread นับในโปรเซสหลักอยู่แล้ว)"""
+    if result and multiprocessing.current_process().name != 'MainProcess':
+        result['spawn_stats'] = take_spawn_stats()
+    return result
+
+
+def _read_wav(file_path):
+    with open(file_path, 'rb') as f:
+        return AudioSegment(data=f.read())
+
+
+def _read_soundfile(file_path):
+    info = soundfile.info(file_path)
+    sample_width = SOUNDFILE_WIDTHS.get(info.subtype, 2)
+    if sample_width == 1:
+        # AudioSegment เก็บ 8 บิตเป็น signed
+        data = (soundfile.read(file_path, dtype='int16')[0] >> 8).astype(np.int8)
+    else:
+        data = soundfile.read(file_path, dtype='int32' if sample_width == 4 else 'int16')[0]
+    return AudioSegment(data=np.ascontiguousarray(data).tobytes(), sample_width=sample_width,
+                        frame_rate=info.samplerate, channels=info.channels)
+
+
+def _run_ffmpeg(file_path):
+    """ถอดรหัสเป็น WAV 16 บิตด้วย ffmpeg ครั้งเดียว (ไม่ต้อง ffprobe)"""
+    command = [AudioSegment.converter, "-nostdin", "-loglevel", "error",
+               "-i", file_path, "-vn", "-acodec", "pcm_s16le", "-f", "wav", "-"]
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output, error = process.communicate()
+    if process.returncode != 0 or not output:
+        raise RuntimeError(f"ไม่สามารถถอดรหัส {Path(file_path).name}: "
+                           f"{error.decode('utf-8', 'replace').strip()}")
+    output = bytearray(output)
+    fix_wav_headers(output)
+    return AudioSegment(data=bytes(output))
+
+
+def decode_file(file_path):
+    """ถอดรหัสไฟล์เสียงเป็น AudioSegment โดยเลือกวิธีที่ไม่ต้องเปิดโปรเซสก่อน"""
+    file_path = str(file_path)
+    extension = Path(file_path).suffix.lower()
+    started = time.perf_counter()
+
+    readers = []
+    if extension in WAV_EXTENSIONS:
+        readers.append(_read_wav)
+    if SOUNDFILE_AVAILABLE and extension in SOUNDFILE_EXTENSIONS:
+        readers.append(_read_soundfile)
+    for reader in readers:
+        try:
+            audio = reader(file_path)
+        except Exception:
+            # รูปแบบที่อ่านเองไม่ได้ (เช่น WAV แบบบีบอัด) ส่งต่อให้ ffmpeg
+            continue
+        record('in_process', time.perf_counter() - started)
+        return audio
+
+    started = time.perf_counter()
+    if extension in LOSSY_EXTENSIONS:
+        try:
+            return _run_ffmpeg(file_path)
+        finally:
+            record('decode', time.perf_counter() - started)
+    try:
+        return AudioSegment.from_file(file_path)
+    finally:
+        record('decode', time.perf_counter() - started, count=2)  # ffprobe + ffmpeg
@@ -0,0 +1,59 @@
+import sys
+import time
+import threading
+from collections import deque
+
+# ส่งงานอัพเดทหน้าจอจาก worker thread ไปทำใน main thread ของ Tk
+# แทนการเรียก root.after(0, ...) ทีละรายการ (Tk ต้องจัดการ callback ทีละตัวและวาดจอใหม่ทุกครั้ง)
+# main thread ดึงงานจากคิวเป็นรอบ (ประมาณ 30 รอบต่อวินาที) และจำกัดเวลาที่ใช้ต่อรอบ
+# งานสถานะ/progress ที่ส่งซ้ำด้วย key เดียวกันจะเหลือเฉพาะค่าล่าสุด
+
+FRAME_MS = 33
+FRAME_BUDGET = 0.02  # วินาทีต่อรอบ งานที่เหลือทำในรอบถัดไป ให้ Tk ได้วาดจอและรับ input
+
+
+class UIDispatcher:
+    """คิวงานสำหรับ main thread ของ Tk ที่ worker thread ส่งเข้ามาได้อย่างปลอดภัย"""
+    def __init__(self, root, interval_ms=FRAME_MS, budget=FRAME_BUDGET):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._queue = deque()  # [key, func] ตามลำดับที่ส่ง
+        self._latest = {}  # {key: รายการในคิว} งานที่รอแทนที่ได้
+        self.root.after(self.interval_ms, self._drain)
+
+    def call(self, func):
+        """ทำ func() ใน main thread ตามลำดับที่ส่ง"""
+        with self._lock:
+            self._queue.append([None, func])
+
+    def update(self, key, func):
+        """เหมือน call แต่ถ้ายังมีงาน key เดียวกันรออยู่ จะแทนที่ด้วยงานใหม่ (คงลำดับเดิมในคิว)"""
+        with self._lock:
+            entry = self._latest.get(key)
+            if entry is not None:
+                entry[1] = func
+            else:
+                entry = [key, func]
+                self._latest[key] = entry
+                self._queue.append(entry)
+
+    def _drain(self):
+        # ตั้งรอบถัดไปก่อน งานที่เปิด dialog (event loop ซ้อน) จะไม่ทำให้คิวค้าง
+        self.root.after(self.interval_ms, self._drain)
+        deadline = time.monotonic() + self.budget
+        while True:
+            with self._lock:
+                if not self._queue:
+                    break
+                key, func = self._queue.popleft()
+                if key is not None:
+                    del self._latest[key]
+            try:
+                func()
+            except Exception:
+                # แสดงข้อผิดพลาดแบบเดียวกับ callback ของ Tk แล้วทำงานถัดไปต่อ
+                self.root.report_callback_exception(*sys.exc_info())
+            if time.monotonic() >= deadline:
+                break
@@ -0,0 +1,98 @@
+from functools import lru_cache
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# งานประมวลผล PCM แบบ vectorized ด้วย NumPy (ถ้าติดตั้งไว้)
+# pydub ทำ fade/overlay ด้วย audioop ทีละมิลลิวินาทีและคัดลอก bytes ทุกขั้น
+# ที่นี่แปลงเฉพาะช่วงที่ต้องใช้เป็น array แล้วคำนวณครั้งเดียว (NumPy ปล่อย GIL ระหว่างคำนวณ thread อื่นทำงานต่อได้)
+
+CROSSFADE_CURVES = ('linear', 'equal_power')
+DEFAULT_CROSSFADE_CURVE = 'linear'
+
+
+def pcm_to_array(data, sample_width, channels):
+    """PCM (little-endian, signed แบบเดียวกับข้อมูลใน AudioSegment) → array ขนาด (frames, channels)"""
+    if sample_width == 1:
+        samples = np.frombuffer(data, np.int8)
+    elif sample_width == 2:
+        samples = np.frombuffer(data, '<i2')
+    elif sample_width == 3:
+        raw = np.frombuffer(data, np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        samples = (samples << 8) >> 8  # ขยายเครื่องหมายของ 24 บิต
+    else:
+        samples = np.frombuffer(data, '<i4')
+    return samples.reshape(-1, channels)
+
+
+def array_to_pcm(samples, sample_width):
+    """array จำนวนเต็ม (อยู่ในช่วงของ sample width แล้ว) → PCM bytes"""
+    if sample_width == 1:
+        return samples.astype(np.int8).tobytes()
+    if sample_width == 2:
+        return samples.astype('<i2').tobytes()
+    if sample_width == 3:
+        return np.ascontiguousarray(samples.astype('<i4')).view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    return samples.astype('<i4').tobytes()
+
+
+def sample_limits(sample_width):
+    bits = sample_width * 8
+    return -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+
+
+@lru_cache(maxsize=16)
+def fade_curves(frames, curve=DEFAULT_CROSSFADE_CURVE):
+    """(fade_in, fade_out) ความยาว frames (รอยต่อของลูปใช้ค่าเดิมซ้ำ)"""
+    if curve not in CROSSFADE_CURVES:
+        raise ValueError(f"ไม่รู้จักรูปแบบคอสเฟด: {curve}")
+    position = (np.arange(frames, dtype=np.float64) + 0.5) / frames
+    if curve == 'equal_power':
+        # พลังงานรวมคงที่ (sin² + cos² = 1) ไม่มีช่วงเสียงเบาลงกลางรอยต่อ
+        fade_in = np.sin(position * (np.pi / 2))
+        fade_out = np.cos(position * (np.pi / 2))
+    else:
+        fade_in = position
+        fade_out = 1.0 - position
+    fade_in, fade_out = fade_in[:, None], fade_out[:, None]
+    fade_in.flags.writeable = False
+    fade_out.flags.writeable = False
+    return fade_in, fade_out
+
+
+def crossfade_pcm(tail, head, sample_width, channels, curve=DEFAULT_CROSSFADE_CURVE):
+    """ผสมท้ายเสียงก่อนหน้า (tail) กับต้นเสียงถัดไป (head) ที่ยาวเท่ากัน คืนค่า PCM ของช่วงคอสเฟด"""
+    tail = pcm_to_array(tail, sample_width, channels)
+    head = pcm_to_array(head, sample_width, channels)
+    fade_in, fade_out = fade_curves(len(tail), curve)
+    mixed = tail * fade_out
+    mixed += head * fade_in
+    low, high = sample_limits(sample_width)
+    np.rint(mixed, out=mixed)
+    np.clip(mixed, low, high, out=mixed)
+    return array_to_pcm(mixed, sample_width)
+
+
+def convert_sample_width(data, sample_width, new_width):
+    """เปลี่ยนจำนวนบิตต่อ sample (ผลเหมือน audioop.lin2lin: เลื่อนบิต ไม่ปัดเศษ)"""
+    samples = pcm_to_array(data, sample_width, 1).astype(np.int64)
+    shift = (new_width - sample_width) * 8
+    samples = samples << shift if shift > 0 else samples >> -shift
+    return array_to_pcm(samples, new_width)
+
+
+def convert_channels(data, sample_width, channels, new_channels):
+    """mono ↔ stereo (ผลเหมือน pydub: stereo → mono เฉลี่ยสองช่องแล้วปัดลง)
+
+    คืนค่า None ถ้าไม่รองรับจำนวนช่องนี้ (ให้ใช้ pydub แทน)
+    """
+    samples = pcm_to_array(data, sample_width, channels)
+    if channels == 1 and new_channels == 2:
+        return array_to_pcm(np.repeat(samples, 2, axis=1), sample_width)
+    if channels == 2 and new_channels == 1:
+        mono = np.floor(samples[:, 0] * 0.5 + samples[:, 1] * 0.5)
+        return array_to_pcm(mono.astype(np.int64), sample_width)
+    return None
@@ -0,0 +1,425 @@
+import io
+import os
+import mmap
+import time
+import struct
+import tempfile
+import subprocess
+from pathlib import Path
+try:
+    from pydub import AudioSegment
+    PYDUB_AVAILABLE = True
+except ImportError:
+    PYDUB_AVAILABLE = False
+from audio_pcm_cache import decode_audio, audio_format, conform_audio
+from audio_dsp import NUMPY_AVAILABLE, DEFAULT_CROSSFADE_CURVE, crossfade_pcm
+from audio_decode import record
+
+
+class MemorySink:
+    """ปลายทาง PCM ที่เก็บไว้ใน memory (ต่อท้ายบัฟเฟอร์เดียว ไม่คัดลอกซ้ำ)"""
+    def __init__(self):
+        self._buffer = io.BytesIO()
+        self.bytes_written = 0
+
+    def write(self, data):
+        self._buffer.write(data)
+        self.bytes_written += len(data)
+
+    def close(self, template):
+        """คืนค่า AudioSegment จากข้อมูลทั้งหมดที่เขียนไว้"""
+        data = self._buffer.getvalue()
+        self._buffer = io.BytesIO()
+        return template._spawn(data)
+
+    def abort(self):
+        self._buffer = io.BytesIO()
+
+
+PCM_HEADER_BYTES = 44
+
+# AudioSegment เก็บ 8 บิตเป็น signed แต่ WAV 8 บิตเป็น unsigned (ต่างกันแค่บิตบนสุด ใช้ตารางเดียวกันแปลงไป-กลับ)
+_SIGN_FLIP = bytes(i ^ 0x80 for i in range(256))
+
+
+def wav_header(template, data_size):
+    """header ของ WAV (PCM) ขนาด PCM_HEADER_BYTES (ข้อมูลเกิน 4 GB ใส่ขนาดสูงสุดแบบไฟล์สตรีม)"""
+    block_align = template.channels * template.sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', min(36 + data_size, 0xFFFFFFFF), b'WAVE',
+        b'fmt ', 16, 1, template.channels, template.frame_rate,
+        template.frame_rate * block_align, block_align, template.sample_width * 8,
+        b'data', min(data_size, 0xFFFFFFFF)
+    )
+
+
+class FileSink:
+    """ปลายทาง PCM ที่เขียนลงไฟล์โดยตรง (ใช้ส่งผลลัพธ์ข้ามโปรเซสโดยไม่ต้อง pickle เสียง)
+
+    ไฟล์มี header แบบ WAV นำหน้า PCM จึงรู้รูปแบบเสียงจากตัวไฟล์เอง
+    ข้อมูลเรียงแบบเดียวกับใน AudioSegment ยกเว้น 8 บิตที่เก็บเป็น unsigned ตามแบบ WAV (ต้องเรียก start ก่อนเขียน)
+    """
+    def __init__(self, path):
+        self.path = str(path)
+        self._file = open(self.path, 'wb')
+        self._file.write(b'\0' * PCM_HEADER_BYTES)  # เขียน header จริงตอนปิด เมื่อรู้ขนาดข้อมูลแล้ว
+        self._sample_width = None
+        self.bytes_written = 0
+
+    def start(self, template):
+        self._sample_width = template.sample_width
+
+    def write(self, data):
+        if self._sample_width == 1:
+            data = bytes(data).translate(_SIGN_FLIP)
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def close(self, template):
+        """ปิดไฟล์และคืนค่าข้อมูลอธิบายรูปแบบ PCM"""
+        if self.bytes_written and self._sample_width != template.sample_width:
+            raise ValueError("FileSink: รูปแบบเสียงตอนปิดไม่ตรงกับตอน start")
+        self._file.seek(0)
+        self._file.write(wav_header(template, self.bytes_written))
+        self._file.close()
+        return {
+            'path': self.path,
+            'frame_rate': template.frame_rate,
+            'channels': template.channels,
+            'sample_width': template.sample_width,
+            'offset': PCM_HEADER_BYTES,
+            'bytes': self.bytes_written
+        }
+
+    def abort(self):
+        """ยกเลิกและลบไฟล์ที่เขียนค้างไว้"""
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+# รูปแบบ PCM ขาเข้าของ ffmpeg ตาม sample width (ไบต์) ตามข้อมูลใน AudioSegment (8 บิตเป็น signed)
+PCM_INPUT_FORMATS = {1: 's8', 2: 's16le', 3: 's24le', 4: 's32le'}
+
+
+def encoder_arguments(output_format, bitrate="320k", bit_depth=24):
+    """argument ของ ffmpeg สำหรับเข้ารหัสตามรูปแบบที่เลือก (ค่าเดียวกับ export_audio)"""
+    if output_format == "mp3":
+        return ["-b:a", bitrate, "-f", "mp3"]
+    if output_format == "wav":
+        return ["-acodec", f"pcm_s{bit_depth}le", "-f", "wav"]
+    if output_format == "flac":
+        return ["-sample_fmt", f"s{bit_depth}", "-f", "flac"]
+    if output_format == "m4a":
+        return ["-b:a", bitrate, "-f", "mp4"]
+    raise ValueError(f"ไม่รองรับรูปแบบไฟล์: {output_format}")
+
+
+class EncoderSink:
+    """ปลายทาง PCM ที่ส่งเข้า stdin ของ ffmpeg ทันที ไม่ต้องเก็บเสียงทั้งไฟล์ไว้ใน memory"""
+    def __init__(self, output_file, output_format, bitrate="320k", bit_depth=24):
+        self.output_file = str(output_file)
+        self.output_format = output_format
+        self.bitrate = bitrate
+        self.bit_depth = bit_depth
+        self.bytes_written = 0
+        self._process = None
+        self._stderr = None
+        self._started = None
+
+    def start(self, template):
+        """เปิด ffmpeg ตามรูปแบบ PCM ของผลลัพธ์ (เรียกก่อนเขียนข้อมูลครั้งแรก)"""
+        if self._process is not None:
+            return
+        converter = AudioSegment.converter if PYDUB_AVAILABLE else "ffmpeg"
+        command = [
+            converter, "-y", "-loglevel", "error",
+            "-f", PCM_INPUT_FORMATS[template.sample_width],
+            "-ar", str(template.frame_rate),
+            "-ac", str(template.channels),
+            "-i", "pipe:0"
+        ] + encoder_arguments(self.output_format, self.bitrate, self.bit_depth) + [self.output_file]
+        # เก็บ stderr ลงไฟล์ชั่วคราว ป้องกัน pipe เต็มจน ffmpeg ค้าง
+        self._stderr = tempfile.TemporaryFile()
+        self._started = time.perf_counter()
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                         stdout=subprocess.DEVNULL, stderr=self._stderr)
+
+    def write(self, data):
+        try:
+            self._process.stdin.write(data)
+        except BrokenPipeError:
+            raise RuntimeError(f"ตัวเข้ารหัสหยุดทำงาน: {self._error_output()}")
+        self.bytes_written += len(data)
+
+    def _error_output(self):
+        self._process.wait()
+        self._stderr.seek(0)
+        return self._stderr.read().decode('utf-8', 'replace').strip()
+
+    def close(self, template):
+        """ปิด stdin รอ ffmpeg เข้ารหัสเสร็จ แล้วคืนค่า path ของไฟล์ผลลัพธ์"""
+        self.start(template)
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self._process.wait()
+        record('encode', time.perf_counter() - self._started)
+        if returncode != 0:
+            message = self._error_output()
+            self._cleanup()
+            raise RuntimeError(f"ไม่สามารถเข้ารหัส {Path(self.output_file).name}: {message}")
+        self._stderr.close()
+        return self.output_file
+
+    def abort(self):
+        """หยุด ffmpeg และลบไฟล์ที่เขียนค้างไว้"""
+        if self._process is not None:
+            self._process.kill()
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+            self._process.wait()
+            record('encode', time.perf_counter() - self._started)
+            self._cleanup()
+
+    def _cleanup(self):
+        self._stderr.close()
+        try:
+            os.remove(self.output_file)
+        except OSError:
+            pass
+
+
+def start_sink(sink, template):
+    """แจ้งรูปแบบเสียงให้ sink ที่ต้องรู้ก่อนเริ่มเขียน (เช่น EncoderSink)"""
+    start = getattr(sink, 'start', None)
+    if start is not None:
+        start(template)
+
+
+def map_pcm(descriptor):
+    """เปิดข้อมูล PCM ของไฟล์จาก FileSink ด้วย mmap คืนค่า memoryview (ไม่คัดลอกเข้า memory ของ Python)
+
+    ข้อมูลอยู่ใน page cache ของระบบ โหลดเฉพาะส่วนที่อ่านจริง
+    """
+    offset = descriptor.get('offset', 0)
+    size = descriptor['bytes']
+    if not size:
+        return memoryview(b'')
+    with open(descriptor['path'], 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(data)[offset:offset + size]
+
+
+def load_pcm(descriptor, mapped=False):
+    """เปิดไฟล์ PCM ที่เขียนด้วย FileSink เป็น AudioSegment
+
+    ปกติอ่านข้อมูลเป็น bytes ใช้ได้เหมือน AudioSegment ทั่วไป
+    mapped=True ใช้ memoryview ของ mmap แทน (ไม่คัดลอกเข้า memory) ตัดช่วง/export/เขียนเข้า sink ได้
+    แต่ + / append / pickle ใช้ไม่ได้ ใช้เฉพาะงานที่อ่านอย่างเดียว เช่น render_loop
+    """
+    if mapped and descriptor['sample_width'] != 1:
+        data = map_pcm(descriptor)
+    else:
+        with open(descriptor['path'], 'rb') as f:
+            f.seek(descriptor.get('offset', 0))
+            data = f.read(descriptor['bytes'])
+        if descriptor['sample_width'] == 1:
+            data = data.translate(_SIGN_FLIP)
+    return AudioSegment(
+        data=data,
+        sample_width=descriptor['sample_width'],
+        frame_rate=descriptor['frame_rate'],
+        channels=descriptor['channels']
+    )
+
+
+PCM_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def stream_pcm(descriptor, sink, chunk_size=PCM_CHUNK_BYTES):
+    """ส่งข้อมูลไฟล์ PCM ที่เขียนด้วย FileSink เข้า sink ทีละก้อน (view ของ mmap ไม่โหลดทั้งไฟล์)"""
+    template = AudioSegment(
+        data=b'',
+        sample_width=descriptor['sample_width'],
+        frame_rate=descriptor['frame_rate'],
+        channels=descriptor['channels']
+    )
+    try:
+        start_sink(sink, template)
+        data = map_pcm(descriptor)
+        for start in range(0, len(data), chunk_size):
+            chunk = data[start:start + chunk_size]
+            if template.sample_width == 1:
+                chunk = bytes(chunk).translate(_SIGN_FLIP)
+            sink.write(chunk)
+        return sink.close(template)
+    except Exception:
+        sink.abort()
+        raise
+
+
+def stream_audio(audio, sink):
+    """เขียนเสียงที่อยู่ใน memory เข้า sink"""
+    try:
+        start_sink(sink, audio)
+        sink.write(memoryview(audio.raw_data))
+        return sink.close(audio)
+    except Exception:
+        sink.abort()
+        raise
+
+
+def crossfade_block(tail, head, curve=DEFAULT_CROSSFADE_CURVE):
+    """สร้างช่วงคอสเฟดระหว่างท้ายเสียงก่อนหน้ากับต้นเสียงถัดไป คืนค่า PCM
+
+    curve = 'linear' หรือ 'equal_power' (ใช้ NumPy ถ้ามี ไม่เช่นนั้นใช้สูตรของ AudioSegment.append ซึ่งเป็น linear)
+    """
+    if NUMPY_AVAILABLE:
+        return crossfade_pcm(tail.raw_data, head.raw_data, tail.sample_width, tail.channels, curve)
+    xf = tail.fade(to_gain=-120, start=0, end=float('inf'))
+    xf *= head.fade(from_gain=-120, start=0, end=float('inf'))
+    return xf.raw_data
+
+
+class StreamingMerger:
+    """รวมเสียงต่อกันแบบสตรีม เขียน PCM ลง sink ทีละก้อน ผสมเฉพาะช่วงคอสเฟด"""
+    def __init__(self, crossfade_ms=0, sink=None, curve=DEFAULT_CROSSFADE_CURVE, target_format=None):
+        self.crossfade_ms = crossfade_ms
+        self.curve = curve
+        self.sink = sink if sink is not None else MemorySink()
+        self.template = None  # รูปแบบเสียงของผลลัพธ์ (target_format ถ้ากำหนด ไม่เช่นนั้นยึดตามไฟล์แรก)
+        self._target_format = tuple(target_format) if target_format else None
+        self._pending = bytearray()  # ท้ายผลลัพธ์ที่ยังไม่เขียน เผื่อใช้ทำคอสเฟด
+        self._xf_bytes = 0
+
+    @property
+    def target_format(self):
+        """รูปแบบเสียงที่ไฟล์ถัดไปต้องแปลงให้ตรง (None ถ้าไม่ได้กำหนดและยังไม่ได้เพิ่มไฟล์แรก)"""
+        if self.template is not None:
+            return audio_format(self.template)
+        return self._target_format
+
+    @property
+    def total_bytes(self):
+        return self.sink.bytes_written + len(self._pending)
+
+    def _conform(self, audio):
+        """แปลงเสียงให้อยู่ในรูปแบบเดียวกับผลลัพธ์"""
+        if self.template is None:
+            if self._target_format and audio_format(audio) != self._target_format:
+                audio = conform_audio(audio, self._target_format)
+            self.template = audio
+            start_sink(self.sink, audio)
+            xf_frames = int(audio.frame_count(ms=self.crossfade_ms)) if self.crossfade_ms > 0 else 0
+            self._xf_bytes = xf_frames * audio.frame_width
+            return audio
+        if audio_format(audio) == self.target_format:
+            return audio
+        return conform_audio(audio, self.target_format)
+
+    def add(self, audio):
+        """ต่อเสียงเข้าท้ายผลลัพธ์"""
+        audio = self._conform(audio)
+        data = memoryview(audio.raw_data)
+        xf_bytes = self._xf_bytes
+
+        if xf_bytes and self.total_bytes > xf_bytes and len(data) > xf_bytes:
+            # ผสมเฉพาะช่วงท้ายที่ค้างไว้กับต้นไฟล์ใหม่
+            tail = self.template._spawn(bytes(self._pending))
+            head = self.template._spawn(bytes(data[:xf_bytes]))
+            self._pending = bytearray(crossfade_block(tail, head, self.curve))
+            data = data[xf_bytes:]
+
+        if len(data) >= xf_bytes:
+            if self._pending:
+                self.sink.write(self._pending)
+            self.sink.write(data[:len(data) - xf_bytes])
+            self._pending = bytearray(data[len(data) - xf_bytes:])
+        else:
+            # ไฟล์สั้นกว่าคอสเฟด เก็บต่อท้ายไว้ก่อน แล้วเขียนส่วนที่เกิน
+            self._pending += data
+            overflow = len(self._pending) - xf_bytes
+            if overflow > 0:
+                self.sink.write(self._pending[:overflow])
+                del self._pending[:overflow]
+
+    def finish(self):
+        """เขียนส่วนที่ค้างและคืนค่าผลลัพธ์ (None ถ้าไม่มีเสียงเลย)"""
+        if self.template is None:
+            self.sink.abort()
+            return None
+        if self._pending:
+            self.sink.write(self._pending)
+            self._pending = bytearray()
+        return self.sink.close(self.template)
+
+
+def merge_files(file_paths, crossfade_ms=0, sink=None, curve=DEFAULT_CROSSFADE_CURVE, target_format=None):
+    """รวมไฟล์เสียงหลายไฟล์ตามลำดับ โดยถอดรหัสทีละไฟล์และเขียนต่อกันแบบสตรีม
+
+    แต่ละไฟล์ถูกแปลงเป็น target_format (หรือรูปแบบของไฟล์แรก) ครั้งเดียวตอนถอดรหัส
+    ไฟล์ที่เคยถอดรหัส (และแปลงรูปแบบ) แล้วใช้จากแคชเสียงที่ใช้ร่วมกัน
+    """
+    merger = StreamingMerger(crossfade_ms, sink, curve, target_format)
+    try:
+        for file_path in file_paths:
+            try:
+                audio = decode_audio(file_path, merger.target_format)
+            except Exception as e:
+                print(f"ไม่สามารถอ่านไฟล์ {Path(file_path).name}: {e}")
+                continue
+            merger.add(audio)
+            del audio
+        return merger.finish()
+    except Exception:
+        merger.sink.abort()
+        raise
+
+
+def render_loop(audio, loop_count, crossfade_ms=0, sink=None, curve=DEFAULT_CROSSFADE_CURVE):
+    """สร้างเสียงลูปจากเสียงต้นฉบับที่ถอดรหัสแล้ว โดยคำนวณรอยต่อคอสเฟดครั้งเดียวแล้วเขียนซ้ำ"""
+    sink = sink if sink is not None else MemorySink()
+    try:
+        return _write_loop(audio, loop_count, crossfade_ms, sink, curve)
+    except Exception:
+        sink.abort()
+        raise
+
+
+def _write_loop(audio, loop_count, crossfade_ms, sink, curve):
+    data = memoryview(audio.raw_data)
+    size = len(data)
+    xf_frames = int(audio.frame_count(ms=crossfade_ms)) if crossfade_ms > 0 else 0
+    xf_bytes = xf_frames * audio.frame_width
+
+    if loop_count > 1 and xf_bytes and size > xf_bytes:
+        if size < 2 * xf_bytes:
+            # เสียงสั้นกว่าสองเท่าของคอสเฟด รอยต่อจะซ้อนกัน ใช้ตัวรวมแบบสตรีมแทน
+            merger = StreamingMerger(crossfade_ms, sink, curve)
+            for _ in range(loop_count):
+                merger.add(audio)
+            return merger.finish()
+
+        start_sink(sink, audio)
+        # รอยต่อ = ท้ายเสียงผสมกับต้นเสียง ใช้ซ้ำได้ทุกรอบ
+        seam = crossfade_block(audio._spawn(bytes(data[size - xf_bytes:])),
+                               audio._spawn(bytes(data[:xf_bytes])), curve)
+        body = data[xf_bytes:size - xf_bytes]
+
+        sink.write(data[:size - xf_bytes])
+        for i in range(1, loop_count):
+            sink.write(seam)
+            sink.write(body if i < loop_count - 1 else data[xf_bytes:])
+    else:
+        start_sink(sink, audio)
+        for _ in range(max(loop_count, 1)):
+            sink.write(data)
+
+    return sink.close(audio)
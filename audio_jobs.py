@@ -0,0 +1,231 @@
+import os
+import uuid
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from audio_engine import FileSink, EncoderSink, load_pcm, stream_pcm, stream_audio, merge_files, render_loop
+from audio_pcm_cache import decode_audio
+from audio_decode import attach_spawn_stats
+from audio_dsp import DEFAULT_CROSSFADE_CURVE
+from audio_probe import probe_formats, choose_target_format
+from audio_concat import concat_files
+
+# โหมดประมวลผลที่รองรับ: thread = ทำงานในโปรเซสเดียว, process = กระจายไปหลายโปรเซส (ใช้ได้ทุก core)
+EXECUTOR_BACKENDS = ('thread', 'process')
+
+
+def default_worker_count(backend='thread'):
+    """จำนวน worker เริ่มต้นตามโหมดประมวลผล"""
+    cpu_count = multiprocessing.cpu_count()
+    if backend == 'process':
+        return cpu_count
+    return min(cpu_count, 4)  # thread ติด GIL ใช้เกิน 4 ไม่ค่อยได้ประโยชน์
+
+
+def create_executor(backend='thread', max_workers=None):
+    """สร้าง executor ตามโหมดที่เลือก"""
+    if backend not in EXECUTOR_BACKENDS:
+        raise ValueError(f"ไม่รู้จักโหมดประมวลผล: {backend}")
+    if not max_workers:
+        max_workers = default_worker_count(backend)
+    if backend == 'process':
+        return ProcessPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers)
+
+
+def run_jobs(worker, jobs, backend='thread', max_workers=None, cancel=None):
+    """ส่ง jobs ให้ worker ประมวลผลแบบขนาน แล้ว yield (job, result, error) ตามลำดับที่เสร็จ
+
+    cancel = threading.Event ถ้าถูก set งานที่ยังไม่เริ่มจะถูกยกเลิก (error เป็น CancelledError)
+    งานที่กำลังทำอยู่จะทำต่อจนเสร็จ
+    """
+    with create_executor(backend, max_workers) as executor:
+        future_to_job = {executor.submit(worker, job): job for job in jobs}
+        pending = set(future_to_job)
+        cancelled = False
+        while pending:
+            done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            if cancel is not None and cancel.is_set() and not cancelled:
+                for future in pending:
+                    future.cancel()
+                cancelled = True
+            for future in done:
+                job = future_to_job[future]
+                try:
+                    yield job, future.result(), None
+                except Exception as e:
+                    yield job, None, e
+
+
+def pcm_path(work_dir, name):
+    return os.path.join(work_dir, f"{Path(name).stem}_{uuid.uuid4().hex[:8]}.wav")
+
+
+def merge_output_name(folder_name, output_format):
+    """ชื่อไฟล์ผลลัพธ์ของการรวมโฟลเดอร์"""
+    return f"{folder_name}_merged.{output_format}"
+
+
+def loop_output_name(file_name, output_format):
+    """ชื่อไฟล์ผลลัพธ์ของการลูป (ไฟล์ temp_merged ใช้แค่เลขท้าย)"""
+    file_stem = Path(file_name).stem
+    if file_stem.startswith('temp_merged_'):
+        file_stem = file_stem.replace('temp_merged_', '')
+    return f"{file_stem}.{output_format}"
+
+
+def plan_target_formats(jobs, frame_rate=None, channels=None, sample_width=None):
+    """ขั้นตอน normalize ก่อนรวมเสียง: อ่านรูปแบบของทุกไฟล์ (จาก header ไม่ต้องถอดรหัส)
+    แล้วกำหนด 'target_format' ของแต่ละ merge job ให้ทุกไฟล์ถูกแปลงครั้งเดียวตอนถอดรหัส
+
+    frame_rate / channels / sample_width = ค่าที่ผู้ใช้กำหนด (None = เลือกจากไฟล์)
+    คืนค่าจำนวนไฟล์ที่ต้องแปลงรูปแบบ
+    """
+    paths = {id(job): [str(Path(job['folder_path']) / name) for name in job['files']] for job in jobs}
+    formats = probe_formats(path for job_paths in paths.values() for path in job_paths)
+    converted = 0
+    for job in jobs:
+        job_formats = [formats[path] for path in paths[id(job)]]
+        target = choose_target_format(job_formats, frame_rate, channels, sample_width)
+        job['target_format'] = target
+        if target:
+            converted += sum(1 for fmt in job_formats if fmt != target)
+    return converted
+
+
+def _job_sink(job, name):
+    """เลือกปลายทางของผลลัพธ์ตาม job
+
+    'output_file' = เข้ารหัสลงไฟล์ปลายทางทันที, 'work_dir' = เขียน PCM ลงไฟล์, ไม่มี = เก็บใน memory
+    คืนค่า (sink, คีย์ของผลลัพธ์)
+    """
+    if job.get('output_file'):
+        return EncoderSink(job['output_file'], job['output_format'],
+                           job.get('bitrate', '320k'), job.get('bit_depth', 24)), 'output'
+    if job.get('work_dir'):
+        return FileSink(pcm_path(job['work_dir'], name)), 'pcm'
+    return None, 'audio'
+
+
+def run_merge_job(job):
+    """worker สำหรับรวมไฟล์ในโฟลเดอร์เดียว
+
+    job = {'folder_name', 'folder_path', 'files', 'crossfade_ms', 'output_format', 'work_dir'}
+    'crossfade_curve' (ไม่บังคับ) = 'linear' หรือ 'equal_power'
+    'target_format' (ไม่บังคับ, จาก plan_target_formats) = รูปแบบเสียงของผลลัพธ์ ไม่มี = ใช้รูปแบบของไฟล์แรก
+    ถ้ามี work_dir จะเขียนผลลัพธ์เป็นไฟล์ PCM และคืนค่า 'pcm' แทน 'audio'
+    ถ้ามี output_file (+ bitrate, bit_depth) จะเข้ารหัสลงไฟล์ทันทีและคืนค่า 'output'
+    (ไม่มีคอสเฟดและทุกไฟล์รูปแบบเดียวกับผลลัพธ์ จะต่อไฟล์โดยไม่ถอดรหัส/เข้ารหัสใหม่)
+    """
+    folder_name = job['folder_name']
+    folder_path = Path(job['folder_path'])
+    if not job['files']:
+        return None
+
+    if job.get('output_file') and not job['crossfade_ms']:
+        try:
+            output = concat_files([folder_path / file_name for file_name in job['files']],
+                                  job['output_file'], job['output_format'],
+                                  job.get('bit_depth', 24), job.get('target_format'),
+                                  job.get('bitrate', '320k'))
+        except OSError as e:
+            print(f"ไม่สามารถต่อไฟล์ในโฟลเดอร์ {folder_name} โดยตรง ใช้การรวมแบบปกติ: {e}")
+            output = None
+        if output:
+            return attach_spawn_stats({
+                'name': merge_output_name(folder_name, job['output_format']),
+                'folder_name': folder_name,
+                'output': output
+            })
+
+    try:
+        sink, key = _job_sink(job, folder_name)
+        combined = merge_files((folder_path / file_name for file_name in job['files']),
+                               job['crossfade_ms'], sink,
+                               job.get('crossfade_curve', DEFAULT_CROSSFADE_CURVE),
+                               job.get('target_format'))
+        if not combined:
+            return None
+
+        return attach_spawn_stats({
+            'name': merge_output_name(folder_name, job['output_format']),
+            'folder_name': folder_name,
+            key: combined
+        })
+    except Exception as e:
+        print(f"ไม่สามารถประมวลผลโฟลเดอร์ {folder_name}: {e}")
+    return None
+
+
+def run_loop_job(job):
+    """worker สำหรับลูปไฟล์เสียงไฟล์เดียว
+
+    job = {'file_name', 'path', 'loop_count', 'crossfade_ms', 'output_format', 'work_dir'}
+    แทน 'path' ด้วย 'source' (ผลลัพธ์จาก run_merge_job) ได้ เพื่อลูปต่อโดยไม่ต้องถอดรหัสใหม่
+    """
+    filename = job['file_name']
+    try:
+        # โหลดไฟล์เสียง (ถอดรหัสครั้งเดียว) render_loop แค่อ่านและเขียนซ้ำ จึงใช้ข้อมูลแบบ mmap ได้
+        if job.get('source'):
+            audio = result_audio(job['source'], mapped=True)
+        else:
+            audio = decode_audio(job['path'], mapped=True)
+
+        # สร้างไฟล์ลูป โดยเขียนเนื้อเสียงและรอยต่อคอสเฟดซ้ำตามจำนวนลูป
+        sink, key = _job_sink(job, filename)
+        looped = render_loop(audio, job['loop_count'], job['crossfade_ms'], sink,
+                             job.get('crossfade_curve', DEFAULT_CROSSFADE_CURVE))
+
+        return attach_spawn_stats({
+            'name': loop_output_name(filename, job['output_format']),
+            'original_name': filename,
+            key: looped
+        })
+    except Exception as e:
+        print(f"ไม่สามารถลูปไฟล์ {filename}: {e}")
+        return None
+
+
+def run_export_job(job):
+    """worker สำหรับบันทึกผลลัพธ์ลงไฟล์ โดยส่ง PCM เข้าตัวเข้ารหัสโดยตรง
+
+    job = {'source' (ผลลัพธ์จาก run_merge_job / run_loop_job), 'output_file',
+           'output_format', 'bitrate', 'bit_depth'}
+    คืนค่า path ของไฟล์ที่บันทึก
+    """
+    source = job['source']
+    sink = EncoderSink(job['output_file'], job['output_format'],
+                       job.get('bitrate', '320k'), job.get('bit_depth', 24))
+    if 'pcm' in source:
+        return stream_pcm(source['pcm'], sink)
+    return stream_audio(source['audio'], sink)
+
+
+def result_audio(result, mapped=False):
+    """ดึง AudioSegment จากผลลัพธ์ (ทั้งแบบเก็บใน memory และแบบไฟล์ PCM)
+
+    mapped=True อ่านไฟล์ PCM ผ่าน mmap (ดู load_pcm: ใช้ได้เฉพาะงานที่อ่านอย่างเดียว)
+    """
+    if 'audio' in result:
+        return result['audio']
+    return load_pcm(result['pcm'], mapped)
+
+
+def result_duration(result):
+    """ระยะเวลา (วินาที) ของผลลัพธ์ โดยไม่ต้องโหลดหรือถอดรหัสเสียง"""
+    if 'audio' in result:
+        return result['audio'].duration_seconds
+    pcm = result['pcm']
+    frame_width = pcm['channels'] * pcm['sample_width']
+    return pcm['bytes'] / float(frame_width * pcm['frame_rate'])
+
+
+def discard_results(results):
+    """ลบไฟล์ PCM ชั่วคราวของผลลัพธ์"""
+    for result in results:
+        pcm = result.get('pcm')
+        if pcm:
+            try:
+                os.remove(pcm['path'])
+            except OSError:
+                pass
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import uuid
+from audio_cache import default_cache_dir
+
+# บันทึกการจัดระเบียบไฟล์แบบเขียนต่อท้ายอย่างเดียว (JSON หนึ่งบรรทัดต่อรายการ)
+#
+#   {"op": "begin", "base_dir": ..., "total": N, "created": ...}
+#   {"op": "move", "src": ..., "dst": ...}      × N  (แผนการย้าย)
+#   {"op": "planned"}                                (แผนครบ เริ่มย้ายได้)
+#   {"op": "retarget", "i": k, "dst": ...}           (เปลี่ยนปลายทางของรายการที่ k ตอนทำต่อ เพราะมีไฟล์อื่นอยู่แล้ว)
+#   {"op": "done", "i": k}                           (ย้ายรายการที่ k แล้ว)
+#   {"op": "commit"}                                 (ย้ายครบทุกรายการ)
+#   {"op": "undo", "i": k} / {"op": "reverted"}      (ย้อนกลับ)
+#
+# ถ้าโปรแกรมหยุดกลางทาง ใช้บันทึกนี้ทำต่อหรือย้อนกลับได้โดยไม่ต้องสแกนไฟล์ใหม่
+
+MAX_JOURNALS = 50  # เก็บบันทึกที่เสร็จแล้วไว้ย้อนกลับได้กี่รายการ
+TAIL_BYTES = 4096  # อ่านบันทึกจากท้ายไฟล์ทีละกี่ไบต์ (ดูสถานะโดยไม่ต้องอ่านทั้งไฟล์)
+
+
+def journal_dir():
+    """โฟลเดอร์เก็บบันทึกการจัดระเบียบ"""
+    return os.path.join(default_cache_dir(), 'journals')
+
+
+class OrganizeJournal:
+    """บันทึกแผนและความคืบหน้าของการจัดระเบียบหนึ่งครั้ง"""
+    def __init__(self, path):
+        self.path = str(path)
+        self.base_dir = None
+        self.created = None
+        self.moves = []
+        self.planned = False
+        self.done = set()
+        self.committed = False
+        self.undone = set()
+        self.reverted = False
+        self._file = None
+
+    @classmethod
+    def create(cls, plan, base_dir, directory=None):
+        """เขียนแผนการย้ายลงบันทึกใหม่ (fsync ก่อนเริ่มย้ายไฟล์จริง)"""
+        directory = directory or journal_dir()
+        os.makedirs(directory, exist_ok=True)
+        prune_journals(directory)
+
+        name = f"organize_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}.jsonl"
+        journal = cls(os.path.join(directory, name))
+        journal.base_dir = str(base_dir)
+        journal.created = time.time()
+        journal.moves = [(str(source), str(target)) for source, target in plan]
+
+        journal._open()
+        journal._write({'op': 'begin', 'base_dir': journal.base_dir,
+                        'total': len(journal.moves), 'created': journal.created})
+        for source, target in journal.moves:
+            journal._write({'op': 'move', 'src': source, 'dst': target})
+        journal._write({'op': 'planned'}, sync=True)
+        journal.planned = True
+        return journal
+
+    @classmethod
+    def load(cls, path):
+        """อ่านบันทึก (บรรทัดท้ายที่เขียนไม่ครบจากไฟดับจะถูกข้าม)"""
+        journal = cls(path)
+        with open(journal.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                op = entry.get('op')
+                if op == 'begin':
+                    journal.base_dir = entry['base_dir']
+                    journal.created = entry.get('created')
+                elif op == 'move':
+                    journal.moves.append((entry['src'], entry['dst']))
+                elif op == 'planned':
+                    journal.planned = True
+                elif op == 'retarget':
+                    journal.moves[entry['i']] = (journal.moves[entry['i']][0], entry['dst'])
+                elif op == 'done':
+                    journal.done.add(entry['i'])
+                elif op == 'commit':
+                    journal.committed = True
+                elif op == 'undo':
+                    journal.undone.add(entry['i'])
+                elif op == 'reverted':
+                    journal.reverted = True
+        return journal
+
+    @property
+    def finished(self):
+        """จบแล้ว (ย้ายครบ ย้อนกลับแล้ว หรือยังไม่ได้เริ่มย้ายเลย)"""
+        return self.committed or self.reverted or not self.planned
+
+    def pending(self):
+        """รายการ (ลำดับ, ต้นทาง, ปลายทาง) ที่ยังไม่ได้ย้าย"""
+        return [(i, source, target) for i, (source, target) in enumerate(self.moves)
+                if i not in self.done]
+
+    def moved(self):
+        """รายการ (ลำดับ, ต้นทาง, ปลายทาง) ที่ย้ายแล้วและยังไม่ได้ย้อนกลับ"""
+        done = range(len(self.moves)) if self.committed else sorted(self.done)
+        return [(i, self.moves[i][0], self.moves[i][1]) for i in done if i not in self.undone]
+
+    def record_done(self, index):
+        self.done.add(index)
+        self._write({'op': 'done', 'i': index})
+
+    def record_retarget(self, index, target):
+        """เปลี่ยนปลายทางของรายการ (บันทึกลงดิสก์ก่อนย้ายจริง การย้อนกลับจะได้ใช้ปลายทางใหม่)"""
+        self.moves[index] = (self.moves[index][0], str(target))
+        self._write({'op': 'retarget', 'i': index, 'dst': str(target)}, sync=True)
+
+    def record_undo(self, index):
+        self.undone.add(index)
+        self._write({'op': 'undo', 'i': index})
+
+    def commit(self):
+        self.committed = True
+        self._write({'op': 'commit'}, sync=True)
+
+    def mark_reverted(self):
+        self.reverted = True
+        self._write({'op': 'reverted'}, sync=True)
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _write(self, entry, sync=False):
+        self._open()
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def list_journals(directory=None):
+    """path ของบันทึกทั้งหมด เรียงจากใหม่ไปเก่า"""
+    directory = directory or journal_dir()
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith('.jsonl')]
+    except OSError:
+        return []
+    return [os.path.join(directory, name) for name in sorted(names, reverse=True)]
+
+
+def _ops_from_end(path):
+    """op ของแต่ละรายการในบันทึก เรียงจากท้ายไฟล์ขึ้นไป (ข้ามบรรทัดที่เขียนไม่ครบ)"""
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        rest = b''
+        while position > 0:
+            size = min(TAIL_BYTES, position)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + rest).split(b'\n')
+            rest = lines.pop(0)  # อาจเป็นท่อนท้ายของบรรทัดก่อนหน้า อ่านต่อในรอบถัดไป
+            for line in reversed(lines):
+                op = _parse_op(line)
+                if op:
+                    yield op
+        op = _parse_op(rest)
+        if op:
+            yield op
+
+
+def _parse_op(line):
+    try:
+        return json.loads(line.decode('utf-8')).get('op')
+    except (ValueError, AttributeError):
+        return None
+
+
+def journal_state(path):
+    """สถานะของบันทึกจากรายการท้ายไฟล์ (ผลเดียวกับ OrganizeJournal.load แต่ไม่ต้องอ่านทั้งไฟล์)
+
+    'incomplete' = หยุดกลางทาง, 'committed' = ย้ายครบ (ยังย้อนกลับได้),
+    'reverted' = ย้อนกลับแล้ว, 'unplanned' = เขียนแผนไม่ครบ (ยังไม่ได้ย้ายไฟล์)
+    """
+    for op in _ops_from_end(path):
+        if op == 'reverted':
+            return 'reverted'
+        if op == 'commit':
+            return 'committed'
+        if op in ('planned', 'retarget', 'done'):
+            return 'incomplete'
+        if op in ('begin', 'move'):
+            return 'unplanned'
+        # 'undo' = ย้อนกลับไม่ครบ สถานะขึ้นกับรายการก่อนหน้า
+    return 'unplanned'
+
+
+def find_incomplete_journals(directory=None):
+    """บันทึกของการจัดระเบียบที่หยุดกลางทาง"""
+    incomplete = []
+    for path in list_journals(directory):
+        try:
+            if journal_state(path) == 'incomplete':
+                incomplete.append(path)
+        except OSError:
+            continue
+    return incomplete
+
+
+def latest_committed_journal(directory=None):
+    """บันทึกล่าสุดที่ย้ายครบและยังไม่ได้ย้อนกลับ (None ถ้าไม่มี)"""
+    for path in list_journals(directory):
+        try:
+            if journal_state(path) == 'committed':
+                return path
+        except OSError:
+            continue
+    return None
+
+
+def prune_journals(directory=None, keep=MAX_JOURNALS):
+    """ลบบันทึกเก่าที่จบแล้ว เก็บไว้ไม่เกิน keep รายการ (บันทึกที่ค้างอยู่ไม่ลบ)"""
+    for path in list_journals(directory)[keep:]:
+        try:
+            if journal_state(path) != 'incomplete':
+                os.remove(path)
+        except OSError:
+            pass
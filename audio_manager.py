@@ -1,18 +1,25 @@
 import os
-import shutil
-import re
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from pathlib import Path
+import time
 import threading
-from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import multiprocessing
-try:
-    from pydub import AudioSegment
-    PYDUB_AVAILABLE = True
-except ImportError:
-    PYDUB_AVAILABLE = False
+import tempfile
+from importlib.util import find_spec
+from concurrent.futures import CancelledError
+PYDUB_AVAILABLE = find_spec('pydub') is not None  # ตัวหน้าต่างไม่ได้ใช้ pydub เอง แค่ตรวจว่าติดตั้งไว้
+from audio_core import (group_files_by_number, organize_files, resume_organize, undo_organize,
+                        unique_path, format_duration, stream_output, natural_sort_key,
+                        scan_audio_files, iter_audio_folders)
+from audio_journal import find_incomplete_journals, latest_committed_journal
+from audio_probe import probe_durations
+from audio_staging import StagingStore, DEFAULT_MEMORY_BUDGET_MB
+from audio_watch import FolderWatcher
+from audio_tree import LazyTree
+from audio_dispatch import UIDispatcher
+from audio_jobs import (EXECUTOR_BACKENDS, default_worker_count, run_jobs,
+                        run_merge_job, run_loop_job, run_export_job, result_duration, merge_output_name,
+                        plan_target_formats)
 
 class AudioManagerGUI:
     def __init__(self, root):
@@ -39,21 +46,45 @@ class AudioManagerGUI:
         
         # ตัวแปรสำหรับโหมดรวมเสียง
         self.selected_folders = []
-        self.merge_preview_data = {}
-        self.merged_files = []  # เก็บไฟล์ที่รวมแล้ว
+        self.folder_labels = {}  # {path ของโฟลเดอร์: ชื่อที่แสดงในรายการ}
+        self.merge_preview_data = {}  # {path ของโฟลเดอร์: ข้อมูลไฟล์} (ค้นหลายชั้นอาจมีชื่อโฟลเดอร์ซ้ำกัน)
+        self.merge_folder_items = {}  # {path ของโฟลเดอร์: item ใน merge preview tree}
+        self.merge_item_folders = {}  # {item: path ของโฟลเดอร์}
+        self.merged_files = StagingStore()  # เก็บไฟล์ที่รวมแล้ว (เกินงบ memory จะย้ายลงดิสก์)
         self.folder_cache = {}  # แคชข้อมูลโฟลเดอร์
+        self.scan_depth = tk.StringVar(value="1")  # ความลึกในการค้นหาโฟลเดอร์ย่อย
+        self.scan_generation = 0  # เปลี่ยนทุกครั้งที่เริ่มค้นหาใหม่ ผลจากการค้นหาเก่าจะถูกทิ้ง
+        self.watch_folders = tk.BooleanVar(value=False)  # อัพเดทตัวอย่างเมื่อมีไฟล์เพิ่ม/ลบในโฟลเดอร์
+        self.folder_watcher = None
         
         # ตัวแปรสำหรับโหมดลูปเสียง
         self.loop_files = []  # เก็บไฟล์เสียงที่จะนำมาลูป
         self.loop_preview_data = {}
-        self.looped_files = []  # เก็บไฟล์ที่ลูปแล้ว
+        self.looped_files = StagingStore()  # เก็บไฟล์ที่ลูปแล้ว (เกินงบ memory จะย้ายลงดิสก์)
+        self.loop_sources = {}  # ไฟล์รวมที่นำเข้าจากโหมดรวมเสียง {key ใน loop_files: ผลลัพธ์}
+        self.loop_inputs = StagingStore()  # เจ้าของข้อมูลเสียงของ loop_sources
         
         # เก็บ path ของโฟลเดอร์ที่จัดระเบียบไว้
         self.organized_base_dir = None
         
+        # ตั้งค่าการประมวลผลแบบขนาน (ใช้ร่วมกันทั้งโหมดรวมและโหมดลูป)
+        self.executor_backend = tk.StringVar(value="thread")
+        self.max_workers = tk.StringVar(value="auto")
+        self.job_work_dir = None  # โฟลเดอร์เก็บผลลัพธ์ PCM จากโหมด process
+        self.memory_budget = tk.StringVar(value=str(DEFAULT_MEMORY_BUDGET_MB))  # MB สำหรับผลลัพธ์ที่รอโหลด
+        self.export_cancel = threading.Event()  # ยกเลิกการบันทึกไฟล์ที่กำลังทำอยู่
+        self.exporting = False
+        self.stream_export = tk.BooleanVar(value=False)  # รวมแล้วเข้ารหัสลงไฟล์ทันที ไม่เก็บไว้ใน memory
+        
+        # งานอัพเดทหน้าจอจาก worker thread ทำเป็นรอบใน main thread
+        self.ui = UIDispatcher(self.root)
+        
         self.current_mode = 'organize'
         self.setup_ui()
         
+        # ตรวจการจัดระเบียบที่หยุดกลางทางจากครั้งก่อน
+        self.root.after(500, self.check_incomplete_organize)
+        
     def setup_ui(self):
         # หัวข้อ
         title_frame = tk.Frame(self.root, bg=self.colors['bg'], pady=15)
@@ -263,6 +294,7 @@ class AudioManagerGUI:
         self.preview_tree.config(yscrollcommand=tree_scrollbar.set)
         tree_scrollbar.config(command=self.preview_tree.yview)
         self.preview_tree.pack(side='left', fill='both', expand=True)
+        self.preview_rows = LazyTree(self.preview_tree)
         
         # ปุ่มดำเนินการ
         action_frame = tk.Frame(right_frame, bg=self.colors['card'])
@@ -284,6 +316,20 @@ class AudioManagerGUI:
         )
         self.organize_btn.pack(fill='x', pady=(0, 10))
         
+        self.undo_organize_btn = tk.Button(
+            action_frame,
+            text="↩️ ย้อนกลับการจัดระเบียบล่าสุด",
+            command=self.start_undo_organize,
+            bg='#5d5d5d',
+            fg='white',
+            font=('Segoe UI', 10),
+            bd=0,
+            padx=20,
+            pady=10,
+            cursor='hand2'
+        )
+        self.undo_organize_btn.pack(fill='x', pady=(0, 10))
+        
         
         # แถบความคืบหน้า
         self.progress = ttk.Progressbar(
@@ -454,6 +500,39 @@ class AudioManagerGUI:
         )
         import_organized_btn.pack(fill='x', pady=(5, 0))
         
+        # ความลึกในการค้นหาโฟลเดอร์ย่อย
+        depth_label = tk.Label(
+            folder_button_frame,
+            text="ค้นหาลึก (ชั้น):",
+            font=('Segoe UI', 8),
+            fg=self.colors['text_secondary'],
+            bg=self.colors['card']
+        )
+        depth_label.pack(anchor='w', pady=(10, 0))
+        
+        depth_combo = ttk.Combobox(
+            folder_button_frame,
+            textvariable=self.scan_depth,
+            values=["1", "2", "3", "ทั้งหมด"],
+            state="readonly",
+            width=10
+        )
+        depth_combo.pack(fill='x')
+        
+        watch_check = tk.Checkbutton(
+            folder_button_frame,
+            text="👀 ติดตามไฟล์ใหม่",
+            variable=self.watch_folders,
+            command=self.on_watch_toggle,
+            font=('Segoe UI', 8),
+            fg=self.colors['text_secondary'],
+            bg=self.colors['card'],
+            selectcolor=self.colors['bg'],
+            activebackground=self.colors['card'],
+            activeforeground=self.colors['text']
+        )
+        watch_check.pack(anchor='w', pady=(10, 0))
+        
         # ส่วนขวา - แสดง Preview การรวมเสียง
         right_frame = tk.Frame(self.merge_frame, bg=self.colors['card'], padx=20, pady=20)
         right_frame.pack(side='right', fill='both', expand=True, padx=(10, 0))
@@ -546,6 +625,7 @@ class AudioManagerGUI:
         self.merge_preview_tree.config(yscrollcommand=merge_tree_scrollbar.set)
         merge_tree_scrollbar.config(command=self.merge_preview_tree.yview)
         self.merge_preview_tree.pack(side='left', fill='both', expand=True)
+        self.merge_rows = LazyTree(self.merge_preview_tree)
         
         # Bind event สำหรับการคลิกบน treeview
         self.merge_preview_tree.bind('<ButtonRelease-1>', self.on_merge_tree_click)
@@ -657,6 +737,22 @@ class AudioManagerGUI:
         )
         crossfade_combo.pack(side='right')
         
+        self.setup_executor_settings(settings_frame)
+        
+        # บันทึกไฟล์ทันทีระหว่างรวม (สำหรับงานใหญ่ที่เก็บผลลัพธ์ไว้ใน memory ไม่ไหว)
+        stream_check = tk.Checkbutton(
+            settings_frame,
+            text="บันทึกทันทีระหว่างรวม (ไม่เก็บไว้ใน memory)",
+            variable=self.stream_export,
+            font=('Segoe UI', 9),
+            fg=self.colors['text_secondary'],
+            bg=self.colors['card'],
+            selectcolor=self.colors['bg'],
+            activebackground=self.colors['card'],
+            activeforeground=self.colors['text']
+        )
+        stream_check.pack(anchor='w', pady=(5, 0))
+        
         # ปุ่มรวมเสียง
         merge_action_frame = tk.Frame(right_frame, bg=self.colors['card'])
         merge_action_frame.pack(fill='x')
@@ -861,6 +957,7 @@ class AudioManagerGUI:
         self.loop_preview_tree.config(yscrollcommand=loop_tree_scrollbar.set)
         loop_tree_scrollbar.config(command=self.loop_preview_tree.yview)
         self.loop_preview_tree.pack(side='left', fill='both', expand=True)
+        self.loop_rows = LazyTree(self.loop_preview_tree)
         
         # การตั้งค่าการลูป
         loop_settings_frame = tk.Frame(right_frame, bg=self.colors['card'])
@@ -990,6 +1087,8 @@ class AudioManagerGUI:
         )
         loop_crossfade_combo.pack(side='right')
         
+        self.setup_executor_settings(loop_settings_frame)
+        
         # ปุ่มลูปเสียง
         loop_action_frame = tk.Frame(right_frame, bg=self.colors['card'])
         loop_action_frame.pack(fill='x')
@@ -1040,6 +1139,85 @@ class AudioManagerGUI:
             bg=self.colors['card']
         )
         
+    def setup_executor_settings(self, parent):
+        """สร้างตัวเลือกโหมดประมวลผลและจำนวน worker"""
+        backend_frame = tk.Frame(parent, bg=self.colors['card'])
+        backend_frame.pack(fill='x', pady=(5, 0))
+        
+        backend_label = tk.Label(
+            backend_frame,
+            text="โหมดประมวลผล:",
+            font=('Segoe UI', 9),
+            fg=self.colors['text_secondary'],
+            bg=self.colors['card']
+        )
+        backend_label.pack(side='left')
+        
+        backend_combo = ttk.Combobox(
+            backend_frame,
+            textvariable=self.executor_backend,
+            values=list(EXECUTOR_BACKENDS),
+            state="readonly",
+            width=10
+        )
+        backend_combo.pack(side='right')
+        
+        workers_frame = tk.Frame(parent, bg=self.colors['card'])
+        workers_frame.pack(fill='x', pady=(5, 0))
+        
+        workers_label = tk.Label(
+            workers_frame,
+            text="จำนวน worker:",
+            font=('Segoe UI', 9),
+            fg=self.colors['text_secondary'],
+            bg=self.colors['card']
+        )
+        workers_label.pack(side='left')
+        
+        workers_combo = ttk.Combobox(
+            workers_frame,
+            textvariable=self.max_workers,
+            values=["auto", "1", "2", "4", "8", "16", "32"],
+            state="readonly",
+            width=10
+        )
+        workers_combo.pack(side='right')
+        
+        budget_frame = tk.Frame(parent, bg=self.colors['card'])
+        budget_frame.pack(fill='x', pady=(5, 0))
+        
+        budget_label = tk.Label(
+            budget_frame,
+            text="memory สำหรับผลลัพธ์ (MB):",
+            font=('Segoe UI', 9),
+            fg=self.colors['text_secondary'],
+            bg=self.colors['card']
+        )
+        budget_label.pack(side='left')
+        
+        budget_combo = ttk.Combobox(
+            budget_frame,
+            textvariable=self.memory_budget,
+            values=["256", "512", "1024", "2048", "4096", "8192", "16384"],
+            state="readonly",
+            width=10
+        )
+        budget_combo.pack(side='right')
+    
+    def get_executor_settings(self):
+        """คืนค่า (backend, max_workers, work_dir) สำหรับส่งงานให้ worker"""
+        backend = self.executor_backend.get()
+        workers = self.max_workers.get()
+        max_workers = default_worker_count(backend) if workers == "auto" else int(workers)
+        
+        # โหมด process ส่งผลลัพธ์กลับเป็นไฟล์ PCM แทนการ pickle เสียงทั้งก้อน
+        work_dir = None
+        if backend == 'process':
+            if not self.job_work_dir or not os.path.isdir(self.job_work_dir):
+                self.job_work_dir = tempfile.mkdtemp(prefix="mixpro_jobs_")
+            work_dir = self.job_work_dir
+        return backend, max_workers, work_dir
+    
     def switch_to_organize(self):
         self.current_mode = 'organize'
         self.organize_mode_btn.configure(bg=self.colors['primary'])
@@ -1121,7 +1299,7 @@ class AudioManagerGUI:
     def clear_files(self):
         self.selected_files = []
         self.files_listbox.delete(0, tk.END)
-        self.preview_tree.delete(*self.preview_tree.get_children())
+        self.preview_rows.clear()
         self.organize_btn.configure(state='disabled')
         self.preview_data = {}
     
@@ -1131,76 +1309,40 @@ class AudioManagerGUI:
             return
         
         # ล้างข้อมูลเก่า
-        self.preview_tree.delete(*self.preview_tree.get_children())
-        self.preview_data = defaultdict(list)
+        self.preview_rows.clear()
         
         # จัดกลุ่มไฟล์ตามตัวเลข
-        no_number_files = []
+        self.preview_data, no_number_files = group_files_by_number(self.selected_files)
         
-        for file_path_str in self.selected_files:
-            file_path = Path(file_path_str)
-            # หาตัวเลขท้ายชื่อไฟล์ (อาจมีช่องว่างก่อนนามสกุล)
-            filename_without_ext = file_path.stem
-            match = re.search(r'(\d+)\s*$', filename_without_ext)
-            
-            if match:
-                number = match.group(1)
-                self.preview_data[number].append(file_path.name)
-            else:
-                no_number_files.append(file_path.name)
-        
-        # แสดงโครงสร้างใน TreeView
-        total_organized = 0
-        
-        for number in sorted(self.preview_data.keys(), key=int):
-            files = self.preview_data[number]
-            folder_item = self.preview_tree.insert(
-                '', 'end', 
-                text=f"📁 โฟลเดอร์ {number}",
-                values=(len(files),),
-                open=False
-            )
-            
-            for file_name in sorted(files):
-                self.preview_tree.insert(
-                    folder_item, 'end',
-                    text=f"  🎵 {file_name}",
-                    values=('',)
-                )
-            
-            total_organized += len(files)
+        # แสดงโครงสร้างใน TreeView (รายชื่อไฟล์แทรกเมื่อเปิดโฟลเดอร์)
+        total_organized = sum(len(files) for files in self.preview_data.values())
+        
+        folder_rows = [
+            (f"📁 โฟลเดอร์ {number}", (len(files),),
+             lambda files=files: [(f"  🎵 {file_name}", ('',), None) for file_name in sorted(files)])
+            for number, files in sorted(self.preview_data.items(), key=lambda entry: int(entry[0]))
+        ]
+        self.preview_rows.populate('', folder_rows)
         
         # แสดงไฟล์ที่ไม่มีตัวเลข
         if no_number_files:
-            no_number_item = self.preview_tree.insert(
-                '', 'end',
+            self.preview_rows.insert(
+                '',
                 text="⚠️ ไฟล์ที่ไม่สามารถจัดระเบียบได้",
                 values=(len(no_number_files),),
-                open=False
+                children=lambda: [(f"  ❌ {file_name}", ('',), None) for file_name in sorted(no_number_files)]
             )
-            
-            for file_name in sorted(no_number_files):
-                self.preview_tree.insert(
-                    no_number_item, 'end',
-                    text=f"  ❌ {file_name}",
-                    values=('',)
-                )
         
         # สรุปผล
-        summary_item = self.preview_tree.insert(
+        self.preview_tree.insert(
             '', 'end',
             text=f"📊 สรุป: จัดระเบียบได้ {total_organized}/{len(self.selected_files)} ไฟล์",
-            values=('',),
-            open=True
+            values=('',)
         )
         
         # เปิดใช้งานปุ่มต่างๆ
         if total_organized > 0:
             self.organize_btn.configure(state='normal')
-        
-        # ปิด items ทั้งหมด (ให้ผู้ใช้กดเปิดเอง)
-        for item in self.preview_tree.get_children():
-            self.preview_tree.item(item, open=False)
     
     def start_organize(self):
         if not self.preview_data:
@@ -1222,6 +1364,7 @@ class AudioManagerGUI:
         self.progress.start()
         
         self.organize_btn.configure(state='disabled', text="กำลังจัดระเบียบ...")
+        self.undo_organize_btn.configure(state='disabled')
         self.status_label.configure(text="กำลังย้ายไฟล์...")
         
         # รันในเธรดแยก
@@ -1232,59 +1375,101 @@ class AudioManagerGUI:
     def organize_files(self):
         try:
             if not self.selected_files:
-                self.root.after(0, lambda: self.finish_organize_with_message("ไม่มีไฟล์ที่เลือก"))
+                self.ui.call(lambda: self.finish_organize_with_message("ไม่มีไฟล์ที่เลือก"))
                 return
             
-            # ใช้ตำแหน่งของไฟล์แรกเป็นฐาน
-            base_dir = Path(self.selected_files[0]).parent
-            
-            moved_files = 0
-            total_files = sum(len(files) for files in self.preview_data.values())
-            
             # จัดระเบียบไฟล์ตาม preview_data
-            for number, file_names in self.preview_data.items():
-                target_dir = base_dir / number
-                target_dir.mkdir(exist_ok=True)
-                
-                for file_name in file_names:
-                    # หาไฟล์ต้นฉบับ
-                    source_file = None
-                    for file_path_str in self.selected_files:
-                        if Path(file_path_str).name == file_name:
-                            source_file = Path(file_path_str)
-                            break
-                    
-                    if source_file and source_file.exists():
-                        target_path = target_dir / file_name
-                        
-                        # จัดการไฟล์ชื่อซ้ำ
-                        counter = 1
-                        original_target = target_path
-                        while target_path.exists():
-                            stem = original_target.stem
-                            suffix = original_target.suffix
-                            target_path = original_target.parent / f"{stem}_{counter}{suffix}"
-                            counter += 1
-                        
-                        shutil.move(str(source_file), str(target_path))
-                        moved_files += 1
-                        
-                        # อัพเดทสถานะ
-                        status_text = f"ย้ายแล้ว {moved_files}/{total_files} ไฟล์"
-                        self.root.after(0, lambda text=status_text: self.status_label.configure(text=text))
+            moved_files, base_dir = organize_files(self.selected_files, self.preview_data,
+                                                   self.update_organize_status)
             
             # บันทึกตำแหน่งที่จัดระเบียบสำหรับดึงข้อมูลภายหลัง
             self.organized_base_dir = str(base_dir)
             
             # ล้างข้อมูลไฟล์หลังเสร็จ
-            self.root.after(0, self.clear_files)
+            self.ui.call(self.clear_files)
             
             success_msg = f"🎉 เสร็จสิ้น!\\n\\nจัดระเบียบ {moved_files} ไฟล์แล้ว\\nสร้าง {len(self.preview_data)} โฟลเดอร์"
-            self.root.after(0, lambda: self.finish_organize_with_message(success_msg, True))
+            self.ui.call(lambda: self.finish_organize_with_message(success_msg, True))
             
         except Exception as e:
-            self.root.after(0, lambda: self.finish_organize_with_message(f"เกิดข้อผิดพลาด: {str(e)}"))
+            message = f"เกิดข้อผิดพลาด: {e}"
+            self.ui.call(lambda m=message: self.finish_organize_with_message(m))
+    
+    
+    def check_incomplete_organize(self):
+        """ตรวจบันทึกการจัดระเบียบที่หยุดกลางทางในเธรดแยก (ไม่ให้หน้าต่างค้างตอนเปิดโปรแกรม)"""
+        def check():
+            journals = find_incomplete_journals()
+            if journals:
+                self.ui.call(lambda: self.ask_resume_organize(journals))
+        
+        thread = threading.Thread(target=check)
+        thread.daemon = True
+        thread.start()
+    
+    def ask_resume_organize(self, journals):
+        """ถามว่าจะทำการจัดระเบียบที่หยุดกลางทางต่อหรือไม่"""
+        if messagebox.askyesno(
+            "พบการจัดระเบียบที่ยังไม่เสร็จ",
+            f"การจัดระเบียบไฟล์ครั้งก่อนหยุดกลางทาง ({len(journals)} ครั้ง)\n\nต้องการย้ายไฟล์ที่เหลือต่อจากเดิมหรือไม่?"
+        ):
+            self.run_journal_task(self.resume_organize_journals, journals, "กำลังย้ายไฟล์ที่เหลือ...")
+    
+    def start_undo_organize(self):
+        """ย้ายไฟล์ของการจัดระเบียบครั้งล่าสุดกลับที่เดิม"""
+        journal = latest_committed_journal()
+        if not journal:
+            messagebox.showinfo("ย้อนกลับ", "ไม่มีการจัดระเบียบที่ย้อนกลับได้")
+            return
+        if not messagebox.askyesno(
+            "ยืนยัน",
+            "ต้องการย้ายไฟล์ของการจัดระเบียบครั้งล่าสุดกลับที่เดิมใช่หรือไม่?"
+        ):
+            return
+        self.run_journal_task(self.undo_organize_journal, journal, "กำลังย้ายไฟล์กลับที่เดิม...")
+    
+    def run_journal_task(self, task, journal, status_text):
+        """รันงานจากบันทึกการจัดระเบียบในเธรดแยก"""
+        self.progress.pack(fill='x', pady=(20, 10))
+        self.status_label.pack(anchor='w')
+        self.progress.configure(mode='indeterminate')
+        self.progress.start()
+        self.organize_btn.configure(state='disabled')
+        self.undo_organize_btn.configure(state='disabled')
+        self.status_label.configure(text=status_text)
+        
+        thread = threading.Thread(target=task, args=(journal,))
+        thread.daemon = True
+        thread.start()
+    
+    def update_organize_status(self, moved, total):
+        status_text = f"ย้ายแล้ว {moved}/{total} ไฟล์"
+        self.ui.update('organize_status', lambda text=status_text: self.status_label.configure(text=text))
+    
+    def resume_organize_journals(self, journals):
+        try:
+            moved_files = 0
+            for journal in journals:
+                moved, base_dir = resume_organize(journal, self.update_organize_status)
+                moved_files += moved
+                if base_dir:
+                    self.organized_base_dir = str(base_dir)
+            message = f"🎉 เสร็จสิ้น!\n\nย้ายไฟล์ที่เหลือ {moved_files} ไฟล์แล้ว"
+            self.ui.call(lambda: self.finish_organize_with_message(message))
+        except Exception as e:
+            message = f"เกิดข้อผิดพลาด: {e}"
+            self.ui.call(lambda m=message: self.finish_organize_with_message(m))
     
+    def undo_organize_journal(self, journal):
+        try:
+            restored, skipped = undo_organize(journal, self.update_organize_status)
+            message = f"ย้ายไฟล์กลับที่เดิม {restored} ไฟล์แล้ว"
+            if skipped:
+                message += f"\n\nย้ายกลับไม่ได้ {len(skipped)} ไฟล์ (ถูกย้ายไปแล้วหรือมีไฟล์อื่นอยู่ที่เดิม)"
+            self.ui.call(lambda: self.finish_organize_with_message(message))
+        except Exception as e:
+            message = f"เกิดข้อผิดพลาด: {e}"
+            self.ui.call(lambda m=message: self.finish_organize_with_message(m))
     
     def send_to_merge_mode(self):
         """ส่งข้อมูลโฟลเดอร์ที่จัดระเบียบไปโหมดรวมเสียง"""
@@ -1295,41 +1480,19 @@ class AudioManagerGUI:
         # สลับไปโหมดรวมเสียง
         self.switch_to_merge()
         
-        # เคลียร์รายการโฟลเดอร์เดิม
-        self.selected_folders = []
-        self.folders_listbox.delete(0, tk.END)
-        
-        # หาโฟลเดอร์ที่จัดระเบียบแล้วในตำแหน่งที่กำหนด
-        base_path = Path(self.organized_base_dir)
-        audio_extensions = {'.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg', '.wma'}
-        
-        # หาโฟลเดอร์ย่อยที่มีไฟล์เสียง
-        for item in base_path.iterdir():
-            if item.is_dir():
-                # ตรวจสอบว่ามีไฟล์เสียงหรือไม่
-                has_audio = any(f.suffix.lower() in audio_extensions 
-                              for f in item.iterdir() if f.is_file())
-                if has_audio:
-                    self.selected_folders.append(str(item))
-                    self.folders_listbox.insert(tk.END, f"📁 {item.name}")
-        
-        # แสดงข้อความสำเร็จ
-        if self.selected_folders:
-            messagebox.showinfo(
-                "สำเร็จ", 
-                f"ส่งข้อมูล {len(self.selected_folders)} โฟลเดอร์ไปโหมดรวมเสียงแล้ว!\n\nกด 'ดูตัวอย่าง' เพื่อดูรายละเอียดการรวมเสียง"
-            )
-        else:
-            messagebox.showwarning(
-                "ไม่พบโฟลเดอร์",
-                "ไม่พบโฟลเดอร์ที่มีไฟล์เสียงในตำแหน่งที่จัดระเบียบ"
-            )
+        # หาโฟลเดอร์ย่อยที่มีไฟล์เสียงในตำแหน่งที่จัดระเบียบ
+        self.scan_audio_folders(
+            self.organized_base_dir,
+            ("สำเร็จ", "ส่งข้อมูล {count} โฟลเดอร์ไปโหมดรวมเสียงแล้ว!\n\nกด 'ดูตัวอย่าง' เพื่อดูรายละเอียดการรวมเสียง"),
+            ("ไม่พบโฟลเดอร์", "ไม่พบโฟลเดอร์ที่มีไฟล์เสียงในตำแหน่งที่จัดระเบียบ")
+        )
     
     def finish_organize_with_message(self, message, show_send_button=False):
         self.progress.stop()
         self.progress.pack_forget()
         self.status_label.pack_forget()
         self.organize_btn.configure(state='disabled', text="🚀 จัดระเบียบไฟล์")
+        self.undo_organize_btn.configure(state='normal')
         
         
         messagebox.showinfo("ผลลัพธ์", message)
@@ -1340,50 +1503,135 @@ class AudioManagerGUI:
         """เลือกโฟลเดอร์หลักที่มีโฟลเดอร์ย่อย (โฟลเดอร์ที่จัดระเบียบไว้แล้ว)"""
         parent_folder = filedialog.askdirectory(title="เลือกโฟลเดอร์หลักที่มีโฟลเดอร์ย่อย")
         if parent_folder:
-            # หาโฟลเดอร์ย่อยที่มีไฟล์เสียง
-            parent_path = Path(parent_folder)
-            audio_extensions = {'.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg', '.wma'}
-            
-            found_folders = []
-            for item in parent_path.iterdir():
-                if item.is_dir():
-                    # ตรวจสอบว่าโฟลเดอร์นี้มีไฟล์เสียงหรือไม่
-                    has_audio = any(f.suffix.lower() in audio_extensions 
-                                  for f in item.iterdir() if f.is_file())
-                    if has_audio:
-                        found_folders.append(str(item))
+            self.scan_audio_folders(
+                parent_folder,
+                ("สำเร็จ", "พบ {count} โฟลเดอร์ที่มีไฟล์เสียง"),
+                ("ไม่พบโฟลเดอร์", "ไม่พบโฟลเดอร์ย่อยที่มีไฟล์เสียงในโฟลเดอร์ที่เลือก")
+            )
+    
+    def scan_audio_folders(self, parent, found_message, empty_message):
+        """ค้นหาโฟลเดอร์ย่อยที่มีไฟล์เสียงในเธรดแยก แล้วเพิ่มลงรายการทันทีที่พบ
+
+        found_message / empty_message = (หัวข้อ, ข้อความ) ข้อความแรกใช้ {count} แทนจำนวนโฟลเดอร์
+        """
+        # เคลียร์รายการเก่า
+        self.stop_folder_watch()
+        self.selected_folders = []
+        self.folder_labels = {}
+        self.folders_listbox.delete(0, tk.END)
+        
+        depth = self.scan_depth.get()
+        max_depth = None if depth == "ทั้งหมด" else int(depth)
+        self.scan_generation += 1
+        generation = self.scan_generation
+        
+        def scan():
+            batch = []
+            last_flush = time.monotonic()
+            try:
+                for folder, audio_files in iter_audio_folders(parent, max_depth):
+                    if generation != self.scan_generation:
+                        return  # มีการค้นหาใหม่แล้ว
+                    
+                    # เก็บรายชื่อไฟล์ไว้ในแคช ดูตัวอย่างได้โดยไม่ต้องอ่านโฟลเดอร์ซ้ำ
+                    try:
+                        self.folder_cache[folder] = {
+                            'files': sorted(audio_files, key=natural_sort_key),
+                            'mtime': os.stat(folder).st_mtime
+                        }
+                    except OSError:
+                        pass
+                    
+                    # ส่งเข้ารายการเป็นชุด ไม่ต้องเรียก UI ทุกโฟลเดอร์
+                    batch.append(folder)
+                    if time.monotonic() - last_flush >= 0.1:
+                        self.ui.call(lambda folders=batch: self.add_scanned_folders(parent, folders, generation))
+                        batch = []
+                        last_flush = time.monotonic()
+            except OSError as e:
+                print(f"ไม่สามารถอ่านโฟลเดอร์ {parent}: {e}")
+            
+            self.ui.call(lambda folders=batch: self.add_scanned_folders(parent, folders, generation))
+            self.ui.call(lambda: self.finish_folder_scan(parent, generation, found_message, empty_message))
+        
+        thread = threading.Thread(target=scan)
+        thread.daemon = True
+        thread.start()
+    
+    def folder_display_name(self, parent, folder_path):
+        """ชื่อที่แสดงในรายการ (ค้นหลายชั้นแสดง path เทียบกับโฟลเดอร์หลัก)"""
+        return os.path.relpath(folder_path, parent) if self.scan_depth.get() != "1" else Path(folder_path).name
+    
+    def folder_label(self, folder_path):
+        """ชื่อโฟลเดอร์ที่แสดงใน merge preview (ชื่อเดียวกับในรายการโฟลเดอร์)"""
+        return self.folder_labels.get(str(folder_path)) or Path(folder_path).name
+    
+    def merge_job_names(self, folder_paths):
+        """ชื่อผลลัพธ์ของแต่ละโฟลเดอร์ {path: ชื่อ}
+
+        ใช้ชื่อที่แสดง (path ย่อยใช้ _ แทนตัวคั่น) ชื่อซ้ำเติม _1, _2, ... ไฟล์ผลลัพธ์จะได้ไม่ทับกัน
+        """
+        names = {}
+        taken = set()
+        for folder_path in folder_paths:
+            base = self.folder_label(folder_path)
+            for separator in {os.sep, '/'}:
+                base = base.replace(separator, '_')
+            name = base
+            counter = 1
+            while name.casefold() in taken:
+                name = f"{base}_{counter}"
+                counter += 1
+            taken.add(name.casefold())
+            names[folder_path] = name
+        return names
+    
+    def add_scanned_folders(self, parent, folders, generation):
+        if generation != self.scan_generation:
+            return
+        for folder_path in folders:
+            self.selected_folders.append(folder_path)
+            self.folder_labels[folder_path] = self.folder_display_name(parent, folder_path)
+            self.folders_listbox.insert(tk.END, f"📁 {self.folder_labels[folder_path]}")
+    
+    def finish_folder_scan(self, parent, generation, found_message, empty_message):
+        """ค้นหาเสร็จ: เรียงรายการตามชื่อแล้วแจ้งผล"""
+        if generation != self.scan_generation:
+            return
+        
+        if self.selected_folders:
+            self.selected_folders.sort(key=lambda path: natural_sort_key(self.folder_labels[path]))
+            self.folders_listbox.delete(0, tk.END)
+            for folder_path in self.selected_folders:
+                self.folders_listbox.insert(tk.END, f"📁 {self.folder_labels[folder_path]}")
             
-            if found_folders:
-                # เคลียร์รายการเก่า
-                self.selected_folders = []
-                self.folders_listbox.delete(0, tk.END)
-                
-                # เพิ่มโฟลเดอร์ที่พบ
-                for folder_path in sorted(found_folders, key=lambda x: Path(x).name):
-                    self.selected_folders.append(folder_path)
-                    folder_name = Path(folder_path).name
-                    self.folders_listbox.insert(tk.END, f"📁 {folder_name}")
-                
-                messagebox.showinfo("สำเร็จ", f"พบ {len(found_folders)} โฟลเดอร์ที่มีไฟล์เสียง")
-            else:
-                messagebox.showwarning("ไม่พบโฟลเดอร์", "ไม่พบโฟลเดอร์ย่อยที่มีไฟล์เสียงในโฟลเดอร์ที่เลือก")
+            title, message = found_message
+            messagebox.showinfo(title, message.format(count=len(self.selected_folders)))
+        else:
+            title, message = empty_message
+            messagebox.showwarning(title, message)
     
     def browse_folders(self):
         """เลือกโฟลเดอร์ทีละโฟลเดอร์"""
         folder = filedialog.askdirectory(title="เลือกโฟลเดอร์ที่มีไฟล์เสียง")
         if folder and folder not in self.selected_folders:
             self.selected_folders.append(folder)
-            folder_name = Path(folder).name
-            self.folders_listbox.insert(tk.END, f"📁 {folder_name}")
+            self.folder_labels[folder] = Path(folder).name
+            self.folders_listbox.insert(tk.END, f"📁 {self.folder_labels[folder]}")
     
     def clear_folders(self):
+        if self.exporting:
+            messagebox.showwarning("คำเตือน", "กำลังบันทึกไฟล์อยู่ กรุณารอหรือยกเลิกก่อน")
+            return
+        self.stop_folder_watch()
         self.selected_folders = []
+        self.folder_labels = {}
         self.folders_listbox.delete(0, tk.END)
-        self.merge_preview_tree.delete(*self.merge_preview_tree.get_children())
+        self.clear_merge_tree()
         self.merge_btn.configure(state='disabled')
         self.download_btn.configure(state='disabled')
         self.merge_preview_data = {}
-        self.merged_files = []  # ล้างไฟล์ที่รวมแล้วด้วย
+        self.merged_files.clear()  # ล้างไฟล์ที่รวมแล้วด้วย
         # ไม่ลบแคชเพื่อความเร็วในการโหลดครั้งถัดไป
     
     def preview_selected_folder(self):
@@ -1399,60 +1647,32 @@ class AudioManagerGUI:
             selected_folders.append(self.selected_folders[index])
         
         # ล้างข้อมูลเก่า
-        self.merge_preview_tree.delete(*self.merge_preview_tree.get_children())
+        self.clear_merge_tree()
         preview_data = {}
         
-        audio_extensions = {'.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg', '.wma'}
         total_files = 0
         
         for folder_path in selected_folders:
             folder = Path(folder_path)
-            audio_files = []
-            total_duration = 0
+            audio_files = scan_audio_files(folder)
             
-            for file_path in folder.iterdir():
-                if file_path.is_file() and file_path.suffix.lower() in audio_extensions:
-                    audio_files.append(file_path.name)
-                    # พยายามหาระยะเวลาไฟล์ (ถ้าเป็นไปได้)
-                    try:
-                        if PYDUB_AVAILABLE:
-                            audio = AudioSegment.from_file(str(file_path))
-                            total_duration += len(audio) / 1000  # แปลงเป็นวินาที
-                    except:
-                        total_duration = 0  # ไม่สามารถอ่านได้
+            # อ่านระยะเวลาจาก header ของไฟล์ (ไม่ต้องถอดรหัสเสียงทั้งไฟล์)
+            durations = self.probe_folder_durations(folder, audio_files)
+            total_duration = sum(durations.values())
             
             if audio_files:
                 # เรียงลำดับไฟล์ตามตัวเลขในชื่อไฟล์
-                def natural_sort_key(filename):
-                    import re
-                    return [int(text) if text.isdigit() else text.lower() for text in re.split('([0-9]+)', filename)]
-                
                 audio_files_sorted = sorted(audio_files, key=natural_sort_key)
                 
-                preview_data[folder.name] = {
+                preview_data[str(folder_path)] = {
                     'path': folder_path,
                     'files': audio_files_sorted,
                     'original_files': audio_files_sorted.copy(),  # เก็บลำดับเดิมไว้
-                    'duration': total_duration
+                    'duration': total_duration,
+                    'durations': durations
                 }
                 
-                duration_text = f"{int(total_duration//60):02d}:{int(total_duration%60):02d}" if total_duration > 0 else "N/A"
-                
-                folder_item = self.merge_preview_tree.insert(
-                    '', 'end',
-                    text=f"📁 {folder.name}",
-                    values=(len(audio_files), duration_text),
-                    open=True
-                )
-                
-                for file_name in audio_files:
-                    child_item = self.merge_preview_tree.insert(
-                        folder_item, 'end',
-                        text=f"  🎵 {file_name}",
-                        values=('', '')
-                    )
-                    print(f"Added child item: {child_item} with text: 🎵 {file_name}")  # debug
-                
+                self.add_folder_to_tree(folder, audio_files_sorted, total_duration, durations)
                 total_files += len(audio_files)
         
         # สรุปผล
@@ -1471,6 +1691,9 @@ class AudioManagerGUI:
             messagebox.showwarning("คำเตือน", "กรุณาเลือกโฟลเดอร์ก่อน")
             return
         
+        # หยุดติดตามระหว่างสแกนใหม่ (เริ่มใหม่เมื่อสแกนเสร็จ)
+        self.stop_folder_watch()
+        
         # แสดง progress bar
         self.merge_progress.pack(fill='x', pady=(20, 10))
         self.merge_status_label.pack(anchor='w')
@@ -1486,11 +1709,9 @@ class AudioManagerGUI:
     def generate_merge_preview_thread(self):
         try:
             # ล้างข้อมูลเก่า
-            self.root.after(0, lambda: self.merge_preview_tree.delete(*self.merge_preview_tree.get_children()))
+            self.ui.call(self.clear_merge_tree)
             self.merge_preview_data = {}
             
-            audio_extensions = {'.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg', '.wma'}
-            total_files = 0
             processed = 0
             total_folders = len(self.selected_folders)
             
@@ -1499,8 +1720,8 @@ class AudioManagerGUI:
                 processed += 1
                 
                 # อัพเดทสถานะ
-                status_text = f"กำลังสแกนโฟลเดอร์ {processed}/{total_folders}: {folder.name}"
-                self.root.after(0, lambda text=status_text: self.merge_status_label.configure(text=text))
+                status_text = f"กำลังสแกนโฟลเดอร์ {processed}/{total_folders}: {self.folder_label(folder_path)}"
+                self.ui.update('merge_status', lambda text=status_text: self.merge_status_label.configure(text=text))
                 
                 # ตรวจสอบแคช
                 cache_key = str(folder_path)
@@ -1512,39 +1733,38 @@ class AudioManagerGUI:
                         if cached_data['mtime'] == folder_mtime:
                             # ใช้ข้อมูลจากแคช
                             audio_files_sorted = cached_data['files']
-                            total_duration = 0  # ข้ามการคำนวณระยะเวลาเพื่อความเร็ว
                             
-                            self.merge_preview_data[folder.name] = {
+                            # อ่านระยะเวลาจากแคชบนดิสก์ (probe เฉพาะไฟล์ที่ยังไม่เคยเห็น)
+                            durations = self.probe_folder_durations(folder, audio_files_sorted)
+                            total_duration = sum(durations.values())
+                            
+                            self.merge_preview_data[cache_key] = {
                                 'path': folder_path,
                                 'files': audio_files_sorted,
                                 'original_files': audio_files_sorted.copy(),
-                                'duration': total_duration
+                                'duration': total_duration,
+                                'durations': durations
                             }
                             
                             # เพิ่มใน UI
-                            self.root.after(0, lambda f=folder, files=audio_files_sorted: self.add_folder_to_tree(f, files, 0))
-                            total_files += len(audio_files_sorted)
+                            self.ui.call(lambda f=folder, files=audio_files_sorted, d=total_duration, fd=durations: self.add_folder_to_tree(f, files, d, fd))
                             continue
                     except:
                         pass  # ถ้าตรวจสอบแคชไม่ได้ ให้โหลดใหม่
                 
                 # สแกนไฟล์ในโฟลเดอร์
-                audio_files = []
                 try:
-                    for file_path in folder.iterdir():
-                        if file_path.is_file() and file_path.suffix.lower() in audio_extensions:
-                            audio_files.append(file_path.name)
-                except:
+                    audio_files = scan_audio_files(folder)
+                except OSError:
                     continue  # ข้ามโฟลเดอร์ที่อ่านไม่ได้
                 
                 if audio_files:
                     # เรียงลำดับไฟล์ตามตัวเลขในชื่อไฟล์
-                    def natural_sort_key(filename):
-                        import re
-                        return [int(text) if text.isdigit() else text.lower() for text in re.split('([0-9]+)', filename)]
-                    
                     audio_files_sorted = sorted(audio_files, key=natural_sort_key)
-                    total_duration = 0  # ข้ามการคำนวณระยะเวลาเพื่อความเร็ว
+                    
+                    # อ่านระยะเวลาจากแคชบนดิสก์ (probe เฉพาะไฟล์ที่ยังไม่เคยเห็น)
+                    durations = self.probe_folder_durations(folder, audio_files_sorted)
+                    total_duration = sum(durations.values())
                     
                     # บันทึกลงแคช
                     try:
@@ -1556,47 +1776,174 @@ class AudioManagerGUI:
                     except:
                         pass
                     
-                    self.merge_preview_data[folder.name] = {
+                    self.merge_preview_data[cache_key] = {
                         'path': folder_path,
                         'files': audio_files_sorted,
                         'original_files': audio_files_sorted.copy(),
-                        'duration': total_duration
+                        'duration': total_duration,
+                        'durations': durations
                     }
                     
                     # เพิ่มใน UI
-                    self.root.after(0, lambda f=folder, files=audio_files_sorted: self.add_folder_to_tree(f, files, 0))
-                    total_files += len(audio_files_sorted)
+                    self.ui.call(lambda f=folder, files=audio_files_sorted, d=total_duration, fd=durations: self.add_folder_to_tree(f, files, d, fd))
             
             # สรุปผล
-            if self.merge_preview_data:
-                summary_text = f"📊 สรุป: {len(self.merge_preview_data)} โฟลเดอร์, {total_files} ไฟล์"
-                self.root.after(0, lambda: self.merge_preview_tree.insert('', 'end', text=summary_text, values=('', 'พร้อมใช้งาน')))
-                self.root.after(0, lambda: self.merge_btn.configure(state='normal'))
+            self.ui.call(self.update_merge_summary)
+            self.ui.call(self.update_folder_watch)
             
             # ซ่อน progress bar
-            self.root.after(0, self.hide_merge_progress)
+            self.ui.call(self.hide_merge_progress)
             
         except Exception as e:
-            self.root.after(0, lambda: self.merge_status_label.configure(text=f"เกิดข้อผิดพลาด: {str(e)}"))
-            self.root.after(0, self.hide_merge_progress)
+            message = f"เกิดข้อผิดพลาด: {e}"
+            self.ui.call(lambda m=message: self.merge_status_label.configure(text=m))
+            self.ui.call(self.hide_merge_progress)
     
-    def add_folder_to_tree(self, folder, files, duration):
-        """เพิ่มโฟลเดอร์ลง treeview"""
-        duration_text = "N/A"  # ไม่คำนวณระยะเวลาเพื่อความเร็ว
-        
-        folder_item = self.merge_preview_tree.insert(
-            '', 'end',
-            text=f"📁 {folder.name}",
-            values=(len(files), duration_text),
+    def add_folder_to_tree(self, folder, files, duration, durations=None):
+        """เพิ่มโฟลเดอร์ลง treeview (แถวไฟล์แทรกเมื่อเปิดโฟลเดอร์)"""
+        durations = durations or {}
+        
+        folder_item = self.merge_rows.insert(
+            '',
+            text=f"📁 {self.folder_label(folder)}",
+            values=(len(files), format_duration(duration)),
+            children=lambda: self.merge_file_rows(files, durations),
             open=True
         )
+        self.merge_folder_items[str(folder)] = folder_item
+        self.merge_item_folders[folder_item] = str(folder)
+    
+    def merge_file_rows(self, files, durations):
+        """แถวไฟล์ของโฟลเดอร์ใน merge preview tree"""
+        return [
+            (f"  🎵 {file_name}", ('', format_duration(durations[file_name]) if file_name in durations else ''), None)
+            for file_name in files
+        ]
+    
+    def clear_merge_tree(self):
+        self.merge_rows.clear()
+        self.merge_folder_items = {}
+        self.merge_item_folders = {}
+    
+    def find_merge_folder_item(self, folder_path):
+        """item ของโฟลเดอร์ใน merge preview tree (None ถ้าไม่มี)"""
+        return self.merge_folder_items.get(str(folder_path))
+    
+    def update_merge_summary(self):
+        """แสดงแถวสรุปท้าย merge preview tree ตามข้อมูลปัจจุบัน"""
+        for item in self.merge_preview_tree.get_children():
+            if self.merge_preview_tree.item(item, "text").startswith("📊"):
+                self.merge_preview_tree.delete(item)
+        
+        if self.merge_preview_data:
+            total_files = sum(len(data['files']) for data in self.merge_preview_data.values())
+            summary_text = f"📊 สรุป: {len(self.merge_preview_data)} โฟลเดอร์, {total_files} ไฟล์"
+            self.merge_preview_tree.insert('', 'end', text=summary_text, values=('', 'พร้อมใช้งาน'))
+            self.merge_btn.configure(state='normal')
+        else:
+            self.merge_btn.configure(state='disabled')
+    
+    def on_watch_toggle(self):
+        if self.watch_folders.get():
+            self.update_folder_watch()
+        else:
+            self.stop_folder_watch()
+    
+    def update_folder_watch(self):
+        """เฝ้าดูโฟลเดอร์ที่เลือกไว้ (หลังดูตัวอย่างแล้ว) เพื่ออัพเดทตัวอย่างเมื่อไฟล์เปลี่ยน"""
+        if not self.watch_folders.get() or not self.merge_preview_data:
+            self.stop_folder_watch()
+            return
         
-        for file_name in files:
-            self.merge_preview_tree.insert(
-                folder_item, 'end',
-                text=f"  🎵 {file_name}",
-                values=('', '')
-            )
+        # รายชื่อไฟล์ที่แสดงอยู่ใช้เป็นจุดเริ่มต้น โฟลเดอร์ที่ยังไม่มีไฟล์เสียงเริ่มจากว่าง
+        known = {str(data['path']): data['original_files'] for data in self.merge_preview_data.values()}
+        folders = {str(path): known.get(str(path)) for path in self.selected_folders}
+        
+        if self.folder_watcher is None:
+            try:
+                watcher = FolderWatcher(self.on_watched_folder_change)
+                watcher.watch(folders)
+                watcher.start()
+            except OSError as e:
+                print(f"ใช้ inotify ไม่ได้ ({e}) เปลี่ยนเป็นตรวจโฟลเดอร์เป็นระยะ")
+                watcher = FolderWatcher(self.on_watched_folder_change, backend='poll')
+                watcher.watch(folders)
+                watcher.start()
+            self.folder_watcher = watcher
+        else:
+            self.folder_watcher.watch(folders)
+    
+    def stop_folder_watch(self):
+        if self.folder_watcher is not None:
+            self.folder_watcher.stop()
+            self.folder_watcher = None
+    
+    def on_watched_folder_change(self, folder_path, added, removed, changed):
+        """เรียกจาก thread ของ watcher: อ่านระยะเวลาเฉพาะไฟล์ที่เพิ่ม/เขียนใหม่ แล้วส่งไปอัพเดท UI"""
+        durations = self.probe_folder_durations(folder_path, added + changed) if added or changed else {}
+        self.ui.call(lambda: self.apply_folder_change(folder_path, added, removed, durations))
+    
+    def apply_folder_change(self, folder_path, added, removed, new_durations):
+        """อัพเดท merge_preview_data และ tree ของโฟลเดอร์เดียว โดยไม่ต้องสแกนโฟลเดอร์อื่น"""
+        if self.folder_watcher is None:
+            return  # เลิกติดตามไปแล้ว
+        
+        folder = Path(folder_path)
+        data = self.merge_preview_data.get(folder_path)
+        if data is None:
+            if not added:
+                return
+            data = {'path': folder_path, 'files': [], 'original_files': [], 'duration': 0, 'durations': {}}
+        
+        removed_names = set(removed)
+        original_files = sorted(
+            [name for name in data['original_files'] if name not in removed_names] + list(added),
+            key=natural_sort_key
+        )
+        if data['files'] == data['original_files']:
+            files = list(original_files)
+        else:
+            # ผู้ใช้จัดลำดับเองไว้ ไฟล์ใหม่ต่อท้าย
+            files = ([name for name in data['files'] if name not in removed_names] +
+                     sorted(added, key=natural_sort_key))
+        
+        durations = {name: seconds for name, seconds in data['durations'].items() if name not in removed_names}
+        durations.update(new_durations)
+        
+        try:
+            self.folder_cache[folder_path] = {'files': original_files, 'mtime': folder.stat().st_mtime}
+        except OSError:
+            self.folder_cache.pop(folder_path, None)
+        
+        folder_item = self.find_merge_folder_item(folder_path)
+        if not files:
+            self.merge_preview_data.pop(folder_path, None)
+            if folder_item:
+                self.merge_rows.delete(folder_item)
+                del self.merge_folder_items[folder_path]
+                del self.merge_item_folders[folder_item]
+        else:
+            # แทนที่ด้วย list ใหม่ งานรวมที่กำลังทำอยู่ใช้สำเนาของตัวเอง
+            data.update({
+                'files': files,
+                'original_files': original_files,
+                'durations': durations,
+                'duration': sum(durations.values())
+            })
+            self.merge_preview_data[folder_path] = data
+            if folder_item:
+                self.merge_preview_tree.item(folder_item, values=(len(files), format_duration(data['duration'])))
+                self.refresh_folder_preview(folder_path)
+            else:
+                self.add_folder_to_tree(folder, files, data['duration'], durations)
+        
+        self.update_merge_summary()
+    
+    def probe_folder_durations(self, folder, file_names):
+        """อ่านระยะเวลาไฟล์ในโฟลเดอร์แบบขนาน คืนค่า {ชื่อไฟล์: วินาที}"""
+        folder = Path(folder)
+        durations = probe_durations([str(folder / name) for name in file_names])
+        return {name: durations[str(folder / name)] for name in file_names}
     
     def hide_merge_progress(self):
         """ซ่อน progress bar"""
@@ -1622,39 +1969,20 @@ class AudioManagerGUI:
             )
             return
         
-        # เคลียร์รายการโฟลเดอร์เดิม
-        self.selected_folders = []
-        self.folders_listbox.delete(0, tk.END)
-        
         # หาโฟลเดอร์ย่อยที่มีไฟล์เสียง
-        audio_extensions = {'.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg', '.wma'}
-        
-        found_count = 0
-        for item in base_path.iterdir():
-            if item.is_dir():
-                # ตรวจสอบว่ามีไฟล์เสียงหรือไม่
-                has_audio = any(f.suffix.lower() in audio_extensions 
-                              for f in item.iterdir() if f.is_file())
-                if has_audio:
-                    self.selected_folders.append(str(item))
-                    self.folders_listbox.insert(tk.END, f"📁 {item.name}")
-                    found_count += 1
-        
-        if found_count > 0:
-            messagebox.showinfo(
-                "ดึงข้อมูลสำเร็จ", 
-                f"🎉 ดึงข้อมูล {found_count} โฟลเดอร์จากโฟลเดอร์ที่จัดระเบียบไว้!\n\nกด 'ดูตัวอย่างทั้งหมด' เพื่อดูรายละเอียด"
-            )
-        else:
-            messagebox.showwarning(
-                "ไม่พบโฟลเดอร์",
-                "ไม่พบโฟลเดอร์ย่อยที่มีไฟล์เสียงในโฟลเดอร์ที่จัดระเบียบไว้\n\nอาจไฟล์ถูกย้ายหรือลบไปแล้ว"
-            )
+        self.scan_audio_folders(
+            str(base_path),
+            ("ดึงข้อมูลสำเร็จ", "🎉 ดึงข้อมูล {count} โฟลเดอร์จากโฟลเดอร์ที่จัดระเบียบไว้!\n\nกด 'ดูตัวอย่างทั้งหมด' เพื่อดูรายละเอียด"),
+            ("ไม่พบโฟลเดอร์", "ไม่พบโฟลเดอร์ย่อยที่มีไฟล์เสียงในโฟลเดอร์ที่จัดระเบียบไว้\n\nอาจไฟล์ถูกย้ายหรือลบไปแล้ว")
+        )
     
     def on_merge_tree_click(self, event):
         """จัดการการคลิกบน merge preview tree"""
         # หาตำแหน่งที่คลิก
         item = self.merge_preview_tree.identify_row(event.y)
+        if item and self.merge_rows.is_more_row(item):
+            self.merge_rows.load_more(item)
+            return
         if item:
             # เลือก item นั้น
             self.merge_preview_tree.selection_set(item)
@@ -1666,7 +1994,7 @@ class AudioManagerGUI:
                 # สลับการเปิด/ปิดโฟลเดอร์
                 is_open = self.merge_preview_tree.item(item, "open")
                 print(f"Item is currently open: {is_open}")  # debug
-                self.merge_preview_tree.item(item, open=not is_open)
+                self.merge_rows.toggle(item)
                 print(f"Set item open to: {not is_open}")  # debug
                 
                 # ตรวจสอบว่ามี children หรือไม่
@@ -1676,21 +2004,23 @@ class AudioManagerGUI:
     def on_merge_tree_double_click(self, event):
         """จัดการการดับเบิลคลิกบน merge preview tree"""
         item = self.merge_preview_tree.identify_row(event.y)
-        if item:
+        if item and not self.merge_rows.is_more_row(item):
             print(f"Double-clicked item: {self.merge_preview_tree.item(item, 'text')}")  # debug
             item_text = self.merge_preview_tree.item(item, "text")
             
             if item_text.startswith("📁") and not item_text.startswith("📊"):
                 # สลับการเปิด/ปิดโฟลเดอร์
                 is_open = self.merge_preview_tree.item(item, "open")
-                self.merge_preview_tree.item(item, open=not is_open)
+                self.merge_rows.toggle(item)
                 print(f"Double-click toggled folder to: {not is_open}")  # debug
     
     def on_merge_tree_right_click(self, event):
         """จัดการการคลิกขวาบน merge preview tree"""
         item = self.merge_preview_tree.identify_row(event.y)
-        if item:
-            self.merge_preview_tree.selection_set(item)
+        if item and not self.merge_rows.is_more_row(item):
+            # คลิกขวาบนไฟล์ที่เลือกไว้แล้วไม่ล้างการเลือกหลายไฟล์
+            if item not in self.merge_preview_tree.selection():
+                self.merge_preview_tree.selection_set(item)
             item_text = self.merge_preview_tree.item(item, "text")
             
             # สร้าง context menu สำหรับไฟล์เพลง
@@ -1700,8 +2030,8 @@ class AudioManagerGUI:
     def show_file_context_menu(self, event, item):
         """แสดง context menu สำหรับไฟล์เพลง"""
         context_menu = tk.Menu(self.root, tearoff=0)
-        context_menu.add_command(label="⬆️ ย้ายขึ้น", command=lambda: self.move_selected_file_up(item))
-        context_menu.add_command(label="⬇️ ย้ายลง", command=lambda: self.move_selected_file_down(item))
+        context_menu.add_command(label="⬆️ ย้ายขึ้น", command=self.move_file_up)
+        context_menu.add_command(label="⬇️ ย้ายลง", command=self.move_file_down)
         context_menu.add_separator()
         context_menu.add_command(label="ยกเลิก", command=lambda: context_menu.destroy())
         
@@ -1712,73 +2042,55 @@ class AudioManagerGUI:
     
     def move_file_up(self):
         """ย้ายไฟล์ที่เลือกขึ้น"""
-        selected = self.merge_preview_tree.selection()
-        if selected:
-            item = selected[0]
-            self.move_selected_file_up(item)
+        self.move_selected_files(-1)
     
     def move_file_down(self):
         """ย้ายไฟล์ที่เลือกลง"""
-        selected = self.merge_preview_tree.selection()
-        if selected:
-            item = selected[0]
-            self.move_selected_file_down(item)
+        self.move_selected_files(1)
     
-    def move_selected_file_up(self, item):
-        """ย้ายไฟล์ที่เลือกขึ้น"""
-        item_text = self.merge_preview_tree.item(item, "text")
-        if not item_text.strip().startswith("🎵"):
-            return
-            
-        parent = self.merge_preview_tree.parent(item)
-        if not parent:
-            return
-        
-        # หาโฟลเดอร์ที่ไฟล์นี้อยู่
-        parent_text = self.merge_preview_tree.item(parent, "text")
-        folder_name = parent_text.replace("📁 ", "")
-        
-        if folder_name not in self.merge_preview_data:
-            return
-        
-        # หาไฟล์ในรายการ
-        file_name = item_text.replace("  🎵 ", "")
-        files = self.merge_preview_data[folder_name]['files']
-        
-        if file_name in files:
-            current_index = files.index(file_name)
-            if current_index > 0:
-                # สลับตำแหน่ง
-                files[current_index], files[current_index-1] = files[current_index-1], files[current_index]
-                self.refresh_folder_preview(folder_name)
+    def selected_file_rows(self):
+        """ไฟล์ที่เลือกใน merge preview tree {path ของโฟลเดอร์: [ลำดับไฟล์ใน files]}"""
+        selected = {}
+        for item in self.merge_preview_tree.selection():
+            position = self.merge_rows.row_position(item)
+            if position is None:
+                continue
+            folder_path = self.merge_item_folders.get(position[0])
+            if folder_path in self.merge_preview_data:
+                selected.setdefault(folder_path, []).append(position[1])
+        return selected
     
-    def move_selected_file_down(self, item):
-        """ย้ายไฟล์ที่เลือกลง"""
-        item_text = self.merge_preview_tree.item(item, "text")
-        if not item_text.strip().startswith("🎵"):
-            return
+    def move_selected_files(self, direction):
+        """ย้ายไฟล์ที่เลือก (เลือกได้หลายไฟล์) ขึ้น (-1) หรือลง (1) หนึ่งตำแหน่ง
+
+        สลับกับไฟล์ข้างเคียงทั้งใน files และใน tree (ย้ายแถวเดิม การเลือกยังอยู่ กดซ้ำได้)
+        ไฟล์ที่ชนขอบรายการ หรือชนไฟล์ที่เลือกซึ่งขยับไม่ได้แล้ว อยู่ที่เดิม
+        """
+        for folder_path, indices in self.selected_file_rows().items():
+            files = self.merge_preview_data[folder_path]['files']
+            folder_item = self.merge_folder_items[folder_path]
+            rebuild = False
+            
+            if direction < 0:
+                edge = 0
+                for index in sorted(indices):
+                    if index == edge:
+                        edge += 1
+                        continue
+                    files[index - 1], files[index] = files[index], files[index - 1]
+                    rebuild |= not self.merge_rows.swap_adjacent(folder_item, index - 1)
+            else:
+                edge = len(files) - 1
+                for index in sorted(indices, reverse=True):
+                    if index == edge:
+                        edge -= 1
+                        continue
+                    files[index], files[index + 1] = files[index + 1], files[index]
+                    rebuild |= not self.merge_rows.swap_adjacent(folder_item, index)
             
-        parent = self.merge_preview_tree.parent(item)
-        if not parent:
-            return
-        
-        # หาโฟลเดอร์ที่ไฟล์นี้อยู่
-        parent_text = self.merge_preview_tree.item(parent, "text")
-        folder_name = parent_text.replace("📁 ", "")
-        
-        if folder_name not in self.merge_preview_data:
-            return
-        
-        # หาไฟล์ในรายการ
-        file_name = item_text.replace("  🎵 ", "")
-        files = self.merge_preview_data[folder_name]['files']
-        
-        if file_name in files:
-            current_index = files.index(file_name)
-            if current_index < len(files) - 1:
-                # สลับตำแหน่ง
-                files[current_index], files[current_index+1] = files[current_index+1], files[current_index]
-                self.refresh_folder_preview(folder_name)
+            # ไฟล์ข้างเคียงยังไม่ได้แทรกใน tree (อยู่หลังแถว "แสดงเพิ่ม")
+            if rebuild:
+                self.refresh_folder_preview(folder_path)
     
     def reset_file_order(self):
         """รีเซ็ตลำดับไฟล์กลับเป็นเดิม"""
@@ -1787,49 +2099,29 @@ class AudioManagerGUI:
             item = selected[0]
             parent = self.merge_preview_tree.parent(item)
             
-            # หาโฟลเดอร์
-            if parent:  # ถ้าเลือกไฟล์
-                target_item = parent
-            else:  # ถ้าเลือกโฟลเดอร์
-                target_item = item
-            
-            parent_text = self.merge_preview_tree.item(target_item, "text")
-            folder_name = parent_text.replace("📁 ", "")
+            # หาโฟลเดอร์ (เลือกไฟล์ใช้โฟลเดอร์ของไฟล์ เลือกโฟลเดอร์ใช้โฟลเดอร์นั้น)
+            folder_path = self.merge_item_folders.get(parent or item)
             
-            if folder_name in self.merge_preview_data and 'original_files' in self.merge_preview_data[folder_name]:
+            if folder_path in self.merge_preview_data and 'original_files' in self.merge_preview_data[folder_path]:
                 # รีเซ็ตกลับเป็นลำดับเดิม
-                self.merge_preview_data[folder_name]['files'] = self.merge_preview_data[folder_name]['original_files'].copy()
-                self.refresh_folder_preview(folder_name)
-                messagebox.showinfo("รีเซ็ต", f"รีเซ็ตลำดับไฟล์ในโฟลเดอร์ '{folder_name}' เรียบร้อยแล้ว")
+                self.merge_preview_data[folder_path]['files'] = self.merge_preview_data[folder_path]['original_files'].copy()
+                self.refresh_folder_preview(folder_path)
+                messagebox.showinfo("รีเซ็ต", f"รีเซ็ตลำดับไฟล์ในโฟลเดอร์ '{self.folder_label(folder_path)}' เรียบร้อยแล้ว")
     
-    def refresh_folder_preview(self, folder_name):
+    def refresh_folder_preview(self, folder_path):
         """รีเฟรชการแสดงผลโฟลเดอร์ที่กำหนด"""
-        if folder_name not in self.merge_preview_data:
+        if folder_path not in self.merge_preview_data:
             return
         
         # หาโฟลเดอร์ใน treeview
-        folder_item = None
-        for item in self.merge_preview_tree.get_children():
-            item_text = self.merge_preview_tree.item(item, "text")
-            if item_text == f"📁 {folder_name}":
-                folder_item = item
-                break
-        
+        folder_item = self.find_merge_folder_item(folder_path)
         if not folder_item:
             return
         
-        # ลบไฟล์เก่าออกจากโฟลเดอร์
-        for child in self.merge_preview_tree.get_children(folder_item):
-            self.merge_preview_tree.delete(child)
-        
-        # เพิ่มไฟล์ใหม่ตามลำดับที่ปรับแล้ว
-        files = self.merge_preview_data[folder_name]['files']
-        for file_name in files:
-            self.merge_preview_tree.insert(
-                folder_item, 'end',
-                text=f"  🎵 {file_name}",
-                values=('', '')
-            )
+        # แทนที่แถวไฟล์ตามลำดับที่ปรับแล้ว (ถ้าโฟลเดอร์ปิดอยู่จะแทรกเมื่อเปิด)
+        files = self.merge_preview_data[folder_path]['files']
+        durations = self.merge_preview_data[folder_path].get('durations', {})
+        self.merge_rows.reload(folder_item, lambda: self.merge_file_rows(files, durations))
     
     def start_merge_only(self):
         """รวมไฟล์เสียงแต่ยังไม่โหลด เก็บไว้ใน memory"""
@@ -1837,6 +2129,11 @@ class AudioManagerGUI:
             messagebox.showwarning("คำเตือน", "กรุณากดดูตัวอย่างก่อน")
             return
         
+        # โหมดบันทึกทันที: รวมและเข้ารหัสลงโฟลเดอร์ปลายทางเลย
+        if self.stream_export.get():
+            self.start_merge()
+            return
+        
         # ยืนยันการทำงาน
         total_folders = len(self.merge_preview_data)
         if not messagebox.askyesno(
@@ -1859,87 +2156,53 @@ class AudioManagerGUI:
         thread.daemon = True
         thread.start()
     
-    def process_single_folder(self, folder_info):
-        """ประมวลผลโฟลเดอร์เดียว สำหรับ parallel processing"""
-        folder_name, data = folder_info
-        folder_path = Path(data['path'])
-        audio_files = data['files']
-        
-        if not audio_files:
-            return None
-        
-        try:
-            # รวมไฟล์เสียงในโฟลเดอร์พร้อมคอสเฟด
-            combined = AudioSegment.empty()
-            crossfade_ms = int(self.crossfade_duration.get()) * 1000
-            
-            for i, file_name in enumerate(audio_files):
-                file_path = folder_path / file_name
-                try:
-                    audio = AudioSegment.from_file(str(file_path))
-                    
-                    if i == 0:
-                        combined = audio
-                    else:
-                        if crossfade_ms > 0 and len(combined) > crossfade_ms and len(audio) > crossfade_ms:
-                            combined = combined.append(audio, crossfade=crossfade_ms)
-                        else:
-                            combined += audio
-                except Exception as e:
-                    print(f"ไม่สามารถอ่านไฟล์ {file_name}: {e}")
-                    continue
-            
-            if len(combined) > 0:
-                output_format = self.output_format.get()
-                return {
-                    'name': f"{folder_name}_merged.{output_format}",
-                    'audio': combined,
-                    'folder_name': folder_name
-                }
-        except Exception as e:
-            print(f"ไม่สามารถประมวลผลโฟลเดอร์ {folder_name}: {e}")
-        
-        return None
-
     def merge_audio_in_memory(self):
         """รวมไฟล์เสียงเก็บใน memory แบบ parallel"""
         try:
             total_folders = len(self.merge_preview_data)
-            self.merged_files = []
+            self.merged_files.clear()
+            self.merged_files.set_budget(self.memory_budget.get())
             
             # ใช้ parallel processing สำหรับการรวมไฟล์
-            max_workers = min(multiprocessing.cpu_count(), 4)  # จำกัดไม่เกิน 4 threads
-            
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # เตรียม tasks
-                folder_items = list(self.merge_preview_data.items())
-                
-                # ส่ง tasks ไปประมวลผล
-                future_to_folder = {
-                    executor.submit(self.process_single_folder, folder_info): folder_info[0] 
-                    for folder_info in folder_items
+            backend, max_workers, work_dir = self.get_executor_settings()
+            crossfade_ms = int(self.crossfade_duration.get()) * 1000
+            output_format = self.output_format.get()
+            
+            # เตรียม jobs (ส่งเฉพาะข้อมูลโฟลเดอร์/ไฟล์ ไม่ส่ง object ของ GUI)
+            folders = list(self.merge_preview_data.items())
+            names = self.merge_job_names(folder_path for folder_path, data in folders)
+            jobs = [
+                {
+                    'folder_name': names[folder_path],
+                    'folder_path': data['path'],
+                    'files': list(data['files']),
+                    'crossfade_ms': crossfade_ms,
+                    'output_format': output_format,
+                    'work_dir': work_dir
                 }
-                
-                merged_count = 0
-                for future in as_completed(future_to_folder):
-                    folder_name = future_to_folder[future]
-                    try:
-                        result = future.result()
-                        if result:
-                            self.merged_files.append(result)
-                            merged_count += 1
-                            
-                            # อัพเดทสถานะใน UI thread
-                            progress_text = f"รวมเสร็จแล้ว {merged_count}/{total_folders} โฟลเดอร์"
-                            self.root.after(0, lambda text=progress_text: self.merge_status_label.configure(text=text))
-                    except Exception as e:
-                        print(f"ข้อผิดพลาดในการประมวลผลโฟลเดอร์ {folder_name}: {e}")
+                for folder_path, data in folders
+            ]
+            # เลือกรูปแบบเสียงของแต่ละโฟลเดอร์ก่อนรวม (อ่านจาก header) ทุกไฟล์ถูกแปลงครั้งเดียว
+            plan_target_formats(jobs)
+            
+            merged_count = 0
+            for job, result, error in run_jobs(run_merge_job, jobs, backend, max_workers):
+                if error:
+                    print(f"ข้อผิดพลาดในการประมวลผลโฟลเดอร์ {job['folder_name']}: {error}")
+                elif result:
+                    self.merged_files.add(result)
+                    merged_count += 1
+                    
+                    # อัพเดทสถานะใน UI thread
+                    progress_text = f"รวมเสร็จแล้ว {merged_count}/{total_folders} โฟลเดอร์"
+                    self.ui.update('merge_status', lambda text=progress_text: self.merge_status_label.configure(text=text))
             
             success_msg = f"🎉 เสร็จสิ้น!\n\nรวมไฟล์เสียงจาก {merged_count} โฟลเดอร์แล้ว\nกด 'โหลดไฟล์รวม' เพื่อบันทึกไฟล์"
-            self.root.after(0, lambda: self.finish_merge_only_with_message(success_msg))
+            self.ui.call(lambda: self.finish_merge_only_with_message(success_msg))
             
         except Exception as e:
-            self.root.after(0, lambda: self.finish_merge_only_with_message(f"เกิดข้อผิดพลาด: {str(e)}"))
+            message = f"เกิดข้อผิดพลาด: {e}"
+            self.ui.call(lambda m=message: self.finish_merge_only_with_message(m))
     
     def finish_merge_only_with_message(self, message):
         """เสร็จสิ้นการรวมไฟล์ (ยังไม่บันทึก)"""
@@ -1965,52 +2228,12 @@ class AudioManagerGUI:
         if not output_dir:
             return
         
-        try:
-            output_path = Path(output_dir)
-            saved_count = 0
-            
-            for file_data in self.merged_files:
-                output_format = self.output_format.get()
-                bitrate = self.bitrate.get()
-                bit_depth = int(self.bit_depth.get())
-                
-                output_file = output_path / file_data['name']
-                
-                # ป้องกันชื่อไฟล์ซ้ำ
-                counter = 1
-                original_output = output_file
-                while output_file.exists():
-                    stem = original_output.stem
-                    suffix = original_output.suffix
-                    output_file = original_output.parent / f"{stem}_{counter}{suffix}"
-                    counter += 1
-                
-                # Export ตามรูปแบบที่เลือก
-                combined = file_data['audio']
-                if output_format == "mp3":
-                    combined.export(str(output_file), format="mp3", bitrate=bitrate)
-                elif output_format == "wav":
-                    combined.export(str(output_file), format="wav", 
-                                  parameters=["-acodec", f"pcm_s{bit_depth}le"])
-                elif output_format == "flac":
-                    combined.export(str(output_file), format="flac",
-                                  parameters=["-sample_fmt", f"s{bit_depth}"])
-                elif output_format == "m4a":
-                    combined.export(str(output_file), format="mp4", bitrate=bitrate)
-                
-                saved_count += 1
-            
-            # ล้างไฟล์ที่รวมแล้วออกจาก memory
-            self.merged_files = []
-            self.download_btn.configure(state='disabled')
-            
-            messagebox.showinfo(
-                "สำเร็จ", 
-                f"🎉 โหลดเสร็จสิ้น!\n\nบันทึก {saved_count} ไฟล์แล้ว\nที่ตำแหน่ง: {output_dir}"
-            )
-            
-        except Exception as e:
-            messagebox.showerror("ข้อผิดพลาด", f"เกิดข้อผิดพลาดในการบันทึกไฟล์: {str(e)}")
+        self.start_export(
+            self.merged_files, output_dir,
+            self.output_format.get(), self.bitrate.get(), int(self.bit_depth.get()),
+            self.merge_progress, self.merge_status_label, self.merge_btn,
+            self.download_btn, self.download_merged_files
+        )
     
     def start_merge(self):
         if not self.merge_preview_data:
@@ -2021,7 +2244,7 @@ class AudioManagerGUI:
         total_folders = len(self.merge_preview_data)
         if not messagebox.askyesno(
             "ยืนยัน", 
-            f"ต้องการรวมไฟล์เสียงจาก {total_folders} โฟลเดอร์ใช่หรือไม่?\\n\\nจะสร้างไฟล์รวมในแต่ละโฟลเดอร์"
+            f"ต้องการรวมไฟล์เสียงจาก {total_folders} โฟลเดอร์ใช่หรือไม่?\n\nจะบันทึกไฟล์รวมทันทีระหว่างรวม"
         ):
             return
         
@@ -2045,90 +2268,61 @@ class AudioManagerGUI:
         thread.start()
     
     def merge_audio_files(self, output_dir):
+        """รวมไฟล์เสียงแล้วส่ง PCM เข้าตัวเข้ารหัสทันที (ใช้ memory แค่ไฟล์ที่กำลังถอดรหัสต่อ worker)"""
         try:
             output_path = Path(output_dir)
-            merged_count = 0
             total_folders = len(self.merge_preview_data)
             
-            for folder_name, data in self.merge_preview_data.items():
-                folder_path = Path(data['path'])
-                audio_files = data['files']
-                
-                if not audio_files:
-                    continue
-                
-                # อัพเดทสถานะ
-                status_text = f"กำลังรวมโฟลเดอร์ {folder_name}..."
-                self.root.after(0, lambda text=status_text: self.merge_status_label.configure(text=text))
-                
-                # รวมไฟล์เสียงในโฟลเดอร์พร้อมคอสเฟด
-                combined = AudioSegment.empty()
-                crossfade_ms = int(self.crossfade_duration.get()) * 1000  # แปลงเป็น milliseconds
-                
-                for i, file_name in enumerate(audio_files):
-                    file_path = folder_path / file_name
-                    try:
-                        audio = AudioSegment.from_file(str(file_path))
-                        
-                        if i == 0:
-                            # ไฟล์แรก - เพิ่มเข้าไปโดยตรง
-                            combined = audio
-                        else:
-                            # ไฟล์ต่อๆ มา - ใช้คอสเฟด
-                            if crossfade_ms > 0 and len(combined) > crossfade_ms and len(audio) > crossfade_ms:
-                                combined = combined.append(audio, crossfade=crossfade_ms)
-                            else:
-                                # ถ้าไฟล์สั้นเกินไปสำหรับคอสเฟด ให้รวมแบบปกติ
-                                combined += audio
-                    except Exception as e:
-                        print(f"ไม่สามารถอ่านไฟล์ {file_name}: {e}")
-                        continue
-                
-                if len(combined) > 0:
-                    # บันทึกไฟล์รวม
-                    output_format = self.output_format.get()
-                    bitrate = self.bitrate.get()
-                    bit_depth = int(self.bit_depth.get())
-                    output_file = output_path / f"{folder_name}_merged.{output_format}"
-                    
-                    # ป้องกันชื่อไฟล์ซ้ำ
-                    counter = 1
-                    while output_file.exists():
-                        output_file = output_path / f"{folder_name}_merged_{counter}.{output_format}"
-                        counter += 1
-                    
-                    # Export ตามรูปแบบที่เลือก
-                    if output_format == "mp3":
-                        combined.export(str(output_file), format="mp3", bitrate=bitrate)
-                    elif output_format == "wav":
-                        combined.export(str(output_file), format="wav", 
-                                      parameters=["-acodec", f"pcm_s{bit_depth}le"])
-                    elif output_format == "flac":
-                        combined.export(str(output_file), format="flac",
-                                      parameters=["-sample_fmt", f"s{bit_depth}"])
-                    elif output_format == "m4a":
-                        combined.export(str(output_file), format="mp4", bitrate=bitrate)
-                    
+            backend, max_workers, work_dir = self.get_executor_settings()
+            crossfade_ms = int(self.crossfade_duration.get()) * 1000  # แปลงเป็น milliseconds
+            output_format = self.output_format.get()
+            export = {'bitrate': self.bitrate.get(), 'bit_depth': int(self.bit_depth.get())}
+            
+            # จองชื่อไฟล์ปลายทางล่วงหน้า ป้องกันชื่อซ้ำระหว่าง worker
+            reserved = set()
+            folders = list(self.merge_preview_data.items())
+            names = self.merge_job_names(folder_path for folder_path, data in folders)
+            jobs = [
+                stream_output({
+                    'folder_name': names[folder_path],
+                    'folder_path': data['path'],
+                    'files': list(data['files']),
+                    'crossfade_ms': crossfade_ms,
+                    'output_format': output_format,
+                    'work_dir': work_dir
+                }, output_path, merge_output_name(names[folder_path], output_format), export, reserved)
+                for folder_path, data in folders
+                if data['files']
+            ]
+            # เลือกรูปแบบเสียงของแต่ละโฟลเดอร์ก่อนรวม (อ่านจาก header) ทุกไฟล์ถูกแปลงครั้งเดียว
+            plan_target_formats(jobs)
+            
+            merged_count = 0
+            for job, result, error in run_jobs(run_merge_job, jobs, backend, max_workers):
+                if error:
+                    print(f"ข้อผิดพลาดในการประมวลผลโฟลเดอร์ {job['folder_name']}: {error}")
+                elif result:
                     merged_count += 1
                 
                 # อัพเดทความคืบหน้า
                 progress_text = f"รวมเสร็จแล้ว {merged_count}/{total_folders} โฟลเดอร์"
-                self.root.after(0, lambda text=progress_text: self.merge_status_label.configure(text=text))
+                self.ui.update('merge_status', lambda text=progress_text: self.merge_status_label.configure(text=text))
             
             # ล้างข้อมูลหลังเสร็จ
-            self.root.after(0, self.clear_folders)
+            self.ui.call(self.clear_folders)
             
-            success_msg = f"🎉 เสร็จสิ้น!\\n\\nรวมไฟล์เสียงจาก {merged_count} โฟลเดอร์แล้ว\\nไฟล์ถูกบันทึกที่: {output_dir}"
-            self.root.after(0, lambda: self.finish_merge_with_message(success_msg))
+            success_msg = f"🎉 เสร็จสิ้น!\n\nรวมไฟล์เสียงจาก {merged_count} โฟลเดอร์แล้ว\nไฟล์ถูกบันทึกที่: {output_dir}"
+            self.ui.call(lambda: self.finish_merge_with_message(success_msg))
             
         except Exception as e:
-            self.root.after(0, lambda: self.finish_merge_with_message(f"เกิดข้อผิดพลาด: {str(e)}"))
+            message = f"เกิดข้อผิดพลาด: {e}"
+            self.ui.call(lambda m=message: self.finish_merge_with_message(m))
     
     def finish_merge_with_message(self, message):
         self.merge_progress.stop()
         self.merge_progress.pack_forget()
         self.merge_status_label.pack_forget()
-        self.merge_btn.configure(state='disabled', text="🎧 เริ่มรวมไฟล์เสียง")
+        self.merge_btn.configure(state='disabled', text="🎧 รวมไฟล์เสียง")
         messagebox.showinfo("ผลลัพธ์", message)
     
     # ========== ฟังก์ชันสำหรับโหมดลูปเสียง ==========
@@ -2160,7 +2354,7 @@ class AudioManagerGUI:
                     self.loop_files_listbox.insert(tk.END, filename)
     
     def import_merged_files(self):
-        """ดึงไฟล์ที่รวมแล้วจากโหมดรวมเสียงมาโหมดลูป"""
+        """ดึงไฟล์ที่รวมแล้วจากโหมดรวมเสียงมาโหมดลูป (ใช้เสียงที่รวมไว้โดยตรง ไม่เขียนไฟล์หรือถอดรหัสใหม่)"""
         if not self.merged_files:
             messagebox.showwarning(
                 "ไม่มีไฟล์ที่รวม", 
@@ -2169,31 +2363,25 @@ class AudioManagerGUI:
             return
         
         imported_count = 0
+        self.loop_inputs.set_budget(self.memory_budget.get())
         
         for merged_file in self.merged_files:
-            # สร้างไฟล์ชั่วคราวเพื่อเก็บข้อมูลเสียง
-            import tempfile
-            import os
+            # key ไม่ใช่ path จริง ชื่อไฟล์ temp_merged_ ทำให้ผลลัพธ์ใช้ชื่อโฟลเดอร์
+            key = f"merged://temp_merged_{merged_file['folder_name']}.wav"
+            if key in self.loop_sources:
+                continue
             
             try:
-                # สร้างไฟล์ชั่วคราว
-                temp_dir = tempfile.gettempdir()
-                temp_filename = f"temp_merged_{merged_file['folder_name']}.wav"
-                temp_path = os.path.join(temp_dir, temp_filename)
-                
-                # Export ไฟล์เสียงไปยังไฟล์ชั่วคราว
-                merged_file['audio'].export(temp_path, format="wav")
-                
-                # เพิ่มลงในรายการไฟล์ลูป
-                if temp_path not in self.loop_files:
-                    self.loop_files.append(temp_path)
-                    display_name = f"🎧 {merged_file['folder_name']}_merged.wav (จากโหมดรวมเสียง)"
-                    self.loop_files_listbox.insert(tk.END, display_name)
-                    imported_count += 1
-                    
-            except Exception as e:
+                self.loop_sources[key] = self.loop_inputs.add_shared(merged_file)
+            except OSError as e:
                 print(f"ไม่สามารถนำเข้าไฟล์ {merged_file['folder_name']}: {e}")
                 continue
+            
+            # เพิ่มลงในรายการไฟล์ลูป
+            self.loop_files.append(key)
+            display_name = f"🎧 {merged_file['folder_name']}_merged.wav (จากโหมดรวมเสียง)"
+            self.loop_files_listbox.insert(tk.END, display_name)
+            imported_count += 1
         
         if imported_count > 0:
             messagebox.showinfo(
@@ -2205,26 +2393,21 @@ class AudioManagerGUI:
     
     def clear_loop_files(self):
         """ล้างรายการไฟล์เสียง"""
-        # ล้างไฟล์ชั่วคราวที่สร้างจากโหมดรวมเสียง
-        import tempfile
-        import os
+        if self.exporting:
+            messagebox.showwarning("คำเตือน", "กำลังบันทึกไฟล์อยู่ กรุณารอหรือยกเลิกก่อน")
+            return
         
-        temp_dir = tempfile.gettempdir()
-        for file_path in self.loop_files:
-            if file_path.startswith(temp_dir) and "temp_merged_" in file_path:
-                try:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                except:
-                    pass  # ไม่แสดง error ถ้าลบไม่ได้
+        # ล้างไฟล์รวมที่นำเข้าจากโหมดรวมเสียง
+        self.loop_sources = {}
+        self.loop_inputs.clear()
         
         self.loop_files = []
         self.loop_files_listbox.delete(0, tk.END)
-        self.loop_preview_tree.delete(*self.loop_preview_tree.get_children())
+        self.loop_rows.clear()
         self.loop_btn.configure(state='disabled')
         self.download_loop_btn.configure(state='disabled')
         self.loop_preview_data = {}
-        self.looped_files = []
+        self.looped_files.clear()
     
     def generate_loop_preview(self):
         """สร้างตัวอย่างการลูป"""
@@ -2233,26 +2416,26 @@ class AudioManagerGUI:
             return
         
         # ล้างข้อมูลเก่า
-        self.loop_preview_tree.delete(*self.loop_preview_tree.get_children())
+        self.loop_rows.clear()
         self.loop_preview_data = {}
         
         loop_count = int(self.loop_count.get())
         
+        # อ่านระยะเวลาทุกไฟล์พร้อมกันจาก header (ไม่ต้องถอดรหัสเสียง)
+        # ไฟล์รวมที่นำเข้ามารู้ระยะเวลาอยู่แล้ว
+        durations = probe_durations([f for f in self.loop_files if f not in self.loop_sources])
+        for key, source in self.loop_sources.items():
+            durations[key] = result_duration(source)
+        
+        file_rows = []
         for file_path_str in self.loop_files:
             file_path = Path(file_path_str)
             filename = file_path.name
-            
-            # พยายามหาระยะเวลาไฟล์
-            duration = 0
-            try:
-                if PYDUB_AVAILABLE:
-                    audio = AudioSegment.from_file(file_path_str)
-                    duration = len(audio) / 1000  # แปลงเป็นวินาที
-            except:
-                duration = 0
+            duration = durations.get(file_path_str, 0)
             
             self.loop_preview_data[filename] = {
                 'path': file_path_str,
+                'source': self.loop_sources.get(file_path_str),
                 'duration': duration,
                 'loop_count': loop_count
             }
@@ -2261,28 +2444,17 @@ class AudioManagerGUI:
             total_duration = duration * loop_count
             total_duration_text = f"{int(total_duration//60):02d}:{int(total_duration%60):02d}" if total_duration > 0 else "N/A"
             
-            # เพิ่ม item หลัก
-            main_item = self.loop_preview_tree.insert(
-                '', 'end',
-                text=f"🎵 {filename}",
-                values=(duration_text, f"{loop_count}x"),
-                open=True
-            )
-            
-            # เพิ่ม sub items สำหรับแต่ละลูป
-            for i in range(loop_count):
-                self.loop_preview_tree.insert(
-                    main_item, 'end',
-                    text=f"  🔄 ลูปที่ {i+1}",
-                    values=(duration_text, ""),
+            # แถวหลัก แถวย่อยของแต่ละลูปและสรุปรวมแทรกเมื่อเปิด
+            file_rows.append((
+                f"🎵 {filename}",
+                (duration_text, f"{loop_count}x"),
+                lambda d=duration_text, t=total_duration_text: (
+                    [(f"  🔄 ลูปที่ {i+1}", (d, ""), None) for i in range(loop_count)] +
+                    [("  📊 รวม", (t, f"{loop_count}x"), None)]
                 )
-            
-            # เพิ่มสรุปรวม
-            self.loop_preview_tree.insert(
-                main_item, 'end',
-                text=f"  📊 รวม",
-                values=(total_duration_text, f"{loop_count}x"),
-            )
+            ))
+        
+        self.loop_rows.populate('', file_rows, open_children=True)
         
         # สรุปรวมทั้งหมด
         if self.loop_preview_data:
@@ -2327,84 +2499,50 @@ class AudioManagerGUI:
         thread.daemon = True
         thread.start()
     
-    def process_single_loop(self, file_info):
-        """ประมวลผลการลูปไฟล์เดียว สำหรับ parallel processing"""
-        filename, data = file_info
-        file_path = data['path']
-        loop_count = data['loop_count']
-        
-        try:
-            # โหลดไฟล์เสียง
-            audio = AudioSegment.from_file(file_path)
-            
-            # สร้างไฟล์ลูป
-            looped_audio = audio
-            crossfade_ms = int(self.loop_crossfade_duration.get()) * 1000
-            
-            for i in range(1, loop_count):
-                if crossfade_ms > 0 and len(looped_audio) > crossfade_ms and len(audio) > crossfade_ms:
-                    looped_audio = looped_audio.append(audio, crossfade=crossfade_ms)
-                else:
-                    looped_audio += audio
-            
-            # เตรียมชื่อไฟล์
-            output_format = self.loop_output_format.get()
-            file_stem = Path(filename).stem
-            
-            # แก้ไขชื่อไฟล์สำหรับไฟล์ temp_merged ให้ใช้แค่เลขท้าย
-            if file_stem.startswith('temp_merged_'):
-                display_name = file_stem.replace('temp_merged_', '')
-            else:
-                display_name = file_stem
-            
-            return {
-                'name': f"{display_name}.{output_format}",
-                'audio': looped_audio,
-                'original_name': filename
-            }
-        except Exception as e:
-            print(f"ไม่สามารถลูปไฟล์ {filename}: {e}")
-            return None
-
     def loop_audio_in_memory(self):
         """ลูปไฟล์เสียงเก็บใน memory แบบ parallel"""
         try:
             total_files = len(self.loop_preview_data)
-            self.looped_files = []
+            self.looped_files.clear()
+            self.looped_files.set_budget(self.memory_budget.get())
             
             # ใช้ parallel processing สำหรับการลูปไฟล์
-            max_workers = min(multiprocessing.cpu_count(), 4)  # จำกัดไม่เกิน 4 threads
+            backend, max_workers, work_dir = self.get_executor_settings()
+            crossfade_ms = int(self.loop_crossfade_duration.get()) * 1000
+            output_format = self.loop_output_format.get()
             
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # เตรียม tasks
-                file_items = list(self.loop_preview_data.items())
-                
-                # ส่ง tasks ไปประมวลผล
-                future_to_file = {
-                    executor.submit(self.process_single_loop, file_info): file_info[0] 
-                    for file_info in file_items
+            # เตรียม jobs
+            jobs = [
+                {
+                    'file_name': filename,
+                    'path': data['path'],
+                    'source': data['source'],  # ไฟล์รวมที่นำเข้ามา ใช้เสียงที่มีอยู่แล้ว
+                    'loop_count': data['loop_count'],
+                    'crossfade_ms': crossfade_ms,
+                    'output_format': output_format,
+                    'work_dir': work_dir
                 }
-                
-                looped_count = 0
-                for future in as_completed(future_to_file):
-                    filename = future_to_file[future]
-                    try:
-                        result = future.result()
-                        if result:
-                            self.looped_files.append(result)
-                            looped_count += 1
-                            
-                            # อัพเดทสถานะใน UI thread
-                            progress_text = f"ลูปเสร็จแล้ว {looped_count}/{total_files} ไฟล์"
-                            self.root.after(0, lambda text=progress_text: self.loop_status_label.configure(text=text))
-                    except Exception as e:
-                        print(f"ข้อผิดพลาดในการลูปไฟล์ {filename}: {e}")
+                for filename, data in self.loop_preview_data.items()
+            ]
+            
+            looped_count = 0
+            for job, result, error in run_jobs(run_loop_job, jobs, backend, max_workers):
+                if error:
+                    print(f"ข้อผิดพลาดในการลูปไฟล์ {job['file_name']}: {error}")
+                elif result:
+                    self.looped_files.add(result)
+                    looped_count += 1
+                    
+                    # อัพเดทสถานะใน UI thread
+                    progress_text = f"ลูปเสร็จแล้ว {looped_count}/{total_files} ไฟล์"
+                    self.ui.update('loop_status', lambda text=progress_text: self.loop_status_label.configure(text=text))
             
             success_msg = f"🎉 เสร็จสิ้น!\n\nลูปไฟล์เสียง {looped_count} ไฟล์แล้ว\nกด 'โหลดไฟล์ลูป' เพื่อบันทึกไฟล์"
-            self.root.after(0, lambda: self.finish_loop_only_with_message(success_msg))
+            self.ui.call(lambda: self.finish_loop_only_with_message(success_msg))
             
         except Exception as e:
-            self.root.after(0, lambda: self.finish_loop_only_with_message(f"เกิดข้อผิดพลาด: {str(e)}"))
+            message = f"เกิดข้อผิดพลาด: {e}"
+            self.ui.call(lambda m=message: self.finish_loop_only_with_message(m))
     
     def finish_loop_only_with_message(self, message):
         """เสร็จสิ้นการลูปไฟล์ (ยังไม่บันทึก)"""
@@ -2430,53 +2568,107 @@ class AudioManagerGUI:
         if not output_dir:
             return
         
-        try:
-            output_path = Path(output_dir)
-            saved_count = 0
-            
-            for file_data in self.looped_files:
-                output_format = self.loop_output_format.get()
-                bitrate = self.loop_bitrate.get()
-                bit_depth = int(self.loop_bit_depth.get())
-                
-                output_file = output_path / file_data['name']
-                
-                # ป้องกันชื่อไฟล์ซ้ำ
-                counter = 1
-                original_output = output_file
-                while output_file.exists():
-                    stem = original_output.stem
-                    suffix = original_output.suffix
-                    output_file = original_output.parent / f"{stem}_{counter}{suffix}"
-                    counter += 1
-                
-                # Export ตามรูปแบบที่เลือก
-                looped_audio = file_data['audio']
-                if output_format == "mp3":
-                    looped_audio.export(str(output_file), format="mp3", bitrate=bitrate)
-                elif output_format == "wav":
-                    looped_audio.export(str(output_file), format="wav", 
-                                      parameters=["-acodec", f"pcm_s{bit_depth}le"])
-                elif output_format == "flac":
-                    looped_audio.export(str(output_file), format="flac",
-                                      parameters=["-sample_fmt", f"s{bit_depth}"])
-                elif output_format == "m4a":
-                    looped_audio.export(str(output_file), format="mp4", bitrate=bitrate)
-                
+        self.start_export(
+            self.looped_files, output_dir,
+            self.loop_output_format.get(), self.loop_bitrate.get(), int(self.loop_bit_depth.get()),
+            self.loop_progress, self.loop_status_label, self.loop_btn,
+            self.download_loop_btn, self.download_looped_files
+        )
+    
+    # ========== บันทึกไฟล์ผลลัพธ์ ==========
+    
+    def start_export(self, store, output_dir, output_format, bitrate, bit_depth,
+                     progress, status_label, action_btn, download_btn, download_command):
+        """บันทึกผลลัพธ์ทั้งหมดแบบขนานในเธรดแยก (หน้าจอไม่ค้าง กดปุ่มโหลดซ้ำเพื่อยกเลิก)"""
+        output_path = Path(output_dir)
+        
+        # จองชื่อไฟล์ปลายทางล่วงหน้า ป้องกันชื่อซ้ำระหว่าง worker
+        reserved = set()
+        jobs = [
+            {
+                'name': result['name'],
+                'source': result,
+                'output_file': str(unique_path(output_path / result['name'], reserved)),
+                'output_format': output_format,
+                'bitrate': bitrate,
+                'bit_depth': bit_depth
+            }
+            for result in store
+        ]
+        
+        # ตัวเข้ารหัสทำงานใน ffmpeg จึงใช้ thread ได้เต็มทุก core
+        workers = self.max_workers.get()
+        max_workers = default_worker_count('process') if workers == "auto" else int(workers)
+        
+        self.exporting = True
+        self.export_cancel.clear()
+        download_text = download_btn.cget('text')
+        progress.pack(fill='x', pady=(20, 10))
+        status_label.pack(anchor='w')
+        progress.configure(mode='determinate', maximum=len(jobs), value=0)
+        status_label.configure(text=f"กำลังบันทึก 0/{len(jobs)} ไฟล์...")
+        action_btn.configure(state='disabled')
+        download_btn.configure(text="⏹ ยกเลิกการบันทึก", command=self.cancel_export)
+        
+        def restore():
+            self.exporting = False
+            progress.pack_forget()
+            status_label.pack_forget()
+            action_btn.configure(state='normal')
+            download_btn.configure(text=download_text, command=download_command)
+            download_btn.configure(state='normal' if store else 'disabled')
+        
+        thread = threading.Thread(target=self.export_results,
+                                  args=(store, jobs, max_workers, output_dir, progress, status_label, restore))
+        thread.daemon = True
+        thread.start()
+    
+    def cancel_export(self):
+        """ยกเลิกไฟล์ที่ยังไม่เริ่มบันทึก (ไฟล์ที่กำลังบันทึกอยู่จะทำต่อจนเสร็จ)"""
+        self.export_cancel.set()
+    
+    def export_results(self, store, jobs, max_workers, output_dir, progress, status_label, restore):
+        """ทำงานในเธรดแยก: ส่งผลลัพธ์เข้าตัวเข้ารหัสทีละไฟล์แบบขนาน"""
+        saved_count = 0
+        failed = []
+        cancelled = 0
+        total = len(jobs)
+        
+        for done, (job, result, error) in enumerate(
+                run_jobs(run_export_job, jobs, 'thread', max_workers, cancel=self.export_cancel), 1):
+            if result:
                 saved_count += 1
-            
-            # ล้างไฟล์ที่ลูปแล้วออกจาก memory
-            self.looped_files = []
-            self.download_loop_btn.configure(state='disabled')
-            
-            messagebox.showinfo(
-                "สำเร็จ", 
-                f"🎉 โหลดเสร็จสิ้น!\\n\\nบันทึก {saved_count} ไฟล์แล้ว\\nที่ตำแหน่ง: {output_dir}"
-            )
-            
-        except Exception as e:
-            messagebox.showerror("ข้อผิดพลาด", f"เกิดข้อผิดพลาดในการบันทึกไฟล์: {str(e)}")
-
+            elif isinstance(error, CancelledError):
+                cancelled += 1
+            else:
+                failed.append(job['name'])
+                print(f"ไม่สามารถบันทึกไฟล์ {job['name']}: {error}")
+            
+            progress_text = f"บันทึกแล้ว {saved_count}/{total} ไฟล์: {job['name']}"
+            self.ui.update('export_progress', lambda d=done, text=progress_text: (
+                progress.configure(value=d), status_label.configure(text=text)))
+        
+        def finish():
+            # ล้างผลลัพธ์เมื่อบันทึกครบ ถ้ายกเลิกหรือผิดพลาดเก็บไว้ให้โหลดใหม่ได้
+            if saved_count == total:
+                store.clear()
+            restore()
+            
+            if saved_count == total:
+                messagebox.showinfo(
+                    "สำเร็จ",
+                    f"🎉 โหลดเสร็จสิ้น!\n\nบันทึก {saved_count} ไฟล์แล้ว\nที่ตำแหน่ง: {output_dir}"
+                )
+            else:
+                message = f"บันทึก {saved_count}/{total} ไฟล์ที่ตำแหน่ง: {output_dir}"
+                if cancelled:
+                    message += f"\nยกเลิก {cancelled} ไฟล์"
+                if failed:
+                    message += f"\nผิดพลาด {len(failed)} ไฟล์: {', '.join(failed[:5])}"
+                messagebox.showwarning("บันทึกไม่ครบ", message)
+        
+        self.ui.call(finish)
+    
 def main():
     root = tk.Tk()
     app = AudioManagerGUI(root)
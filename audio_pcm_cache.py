@@ -0,0 +1,272 @@
+import os
+import mmap
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+try:
+    from pydub import AudioSegment
+    PYDUB_AVAILABLE = True
+except ImportError:
+    PYDUB_AVAILABLE = False
+from audio_decode import decode_file
+from audio_dsp import NUMPY_AVAILABLE, convert_channels, convert_sample_width
+
+# แคชเสียงที่ถอดรหัสแล้ว (PCM) ใช้ร่วมกันทั้งโปรเซส: รวมเสียง ลูปเสียง และ pipeline ใช้ไฟล์เดียวกันซ้ำ
+# ได้โดยไม่ต้องเรียก ffmpeg ใหม่
+# คีย์คือ path + ขนาดไฟล์ + mtime + รูปแบบเสียงที่ต้องการ ถ้าไฟล์เปลี่ยนแคชจะไม่ถูกใช้
+# เกินงบ memory จะย้ายรายการที่ไม่ได้ใช้นานที่สุดลงไฟล์ PCM บนดิสก์ (ถ้าเปิดไว้) แล้วอ่านกลับเป็น bytes
+# (งานที่อ่านอย่างเดียวขอแบบ mmap ได้ ไม่ต้องคัดลอกทั้งไฟล์)
+
+DEFAULT_CACHE_MB = 512
+DEFAULT_DISK_CACHE_MB = 0  # 0 = ไม่ใช้ดิสก์ ลบออกจากแคชเลย
+
+
+def audio_format(audio):
+    """รูปแบบเสียง (frame_rate, channels, sample_width) ใช้เป็นรูปแบบเป้าหมายของแคช"""
+    return (audio.frame_rate, audio.channels, audio.sample_width)
+
+
+def conform_audio(audio, target):
+    """แปลงเสียงให้อยู่ในรูปแบบเป้าหมาย (จำนวนช่องและ sample width ใช้ NumPy ถ้ามี)"""
+    frame_rate, channels, sample_width = target
+    if not NUMPY_AVAILABLE:
+        return audio.set_channels(channels).set_frame_rate(frame_rate).set_sample_width(sample_width)
+
+    if audio.channels != channels:
+        data = convert_channels(audio.raw_data, audio.sample_width, audio.channels, channels)
+        if data is None:
+            audio = audio.set_channels(channels)
+        else:
+            audio = audio._spawn(data, overrides={'channels': channels,
+                                                 'frame_width': channels * audio.sample_width})
+    audio = audio.set_frame_rate(frame_rate)
+    if audio.sample_width != sample_width:
+        data = convert_sample_width(audio.raw_data, audio.sample_width, sample_width)
+        audio = audio._spawn(data, overrides={'sample_width': sample_width,
+                                             'frame_width': audio.channels * sample_width})
+    return audio
+
+
+class DecodedAudioCache:
+    """แคช AudioSegment ที่ถอดรหัสแล้ว จำกัดขนาดเป็นไบต์ ลบรายการที่ไม่ได้ใช้นานที่สุดก่อน (LRU)"""
+    def __init__(self, memory_budget_mb=DEFAULT_CACHE_MB, disk_budget_mb=DEFAULT_DISK_CACHE_MB, disk_dir=None):
+        self.memory_budget = int(memory_budget_mb) * 1024 * 1024
+        self.disk_budget = int(disk_budget_mb) * 1024 * 1024
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._disk_dir = disk_dir
+        self._own_disk_dir = False
+        self._next_file = 0
+        self._memory = OrderedDict()  # {คีย์: AudioSegment}
+        self._disk = OrderedDict()  # {คีย์: ข้อมูลไฟล์ PCM}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(file_path, target=None):
+        """คีย์ของไฟล์ (None ถ้าอ่านข้อมูลไฟล์ไม่ได้)"""
+        try:
+            st = os.stat(str(file_path))
+        except OSError:
+            return None
+        return (os.path.abspath(str(file_path)), st.st_size, st.st_mtime_ns, target)
+
+    def get(self, key, count_miss=True, mapped=False):
+        """AudioSegment ที่แคชไว้ (None ถ้าไม่มี) mapped = อ่านรายการบนดิสก์ผ่าน mmap (ดู _load)"""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return audio
+            descriptor = self._disk.get(key)
+            if descriptor is not None:
+                audio = self._load(descriptor, mapped)
+                if audio is not None:
+                    self._disk.move_to_end(key)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return audio
+                self._drop_disk(key)
+            if count_miss:
+                self.misses += 1
+            return None
+
+    def put(self, key, audio):
+        with self._lock:
+            if key in self._memory or key in self._disk:
+                return
+            size = len(audio.raw_data)
+            if size > self.memory_budget:
+                self._spill(key, audio)
+                return
+            self._memory[key] = audio
+            self.memory_bytes += size
+            while self.memory_bytes > self.memory_budget:
+                old_key, old_audio = self._memory.popitem(last=False)
+                self.memory_bytes -= len(old_audio.raw_data)
+                self._spill(old_key, old_audio)
+
+    def decode(self, file_path, target=None, mapped=False):
+        """ถอดรหัสไฟล์ (หรือใช้จากแคช) ถ้ากำหนด target จะแปลงรูปแบบเสียงและแคชผลที่แปลงแล้วด้วย"""
+        if target is not None:
+            key = self.key(file_path, target)
+            # ไม่นับเป็น miss ตรงนี้ (นับตอนค้นไฟล์ต้นฉบับด้านล่างครั้งเดียว)
+            audio = self.get(key, count_miss=False, mapped=mapped) if key else None
+            if audio is not None:
+                return audio
+            audio = self.decode(file_path, mapped=mapped)
+            if audio_format(audio) == target:
+                return audio
+            audio = conform_audio(audio, target)
+            if key:
+                self.put(key, audio)
+            return audio
+
+        key = self.key(file_path)
+        audio = self.get(key, mapped=mapped) if key else None
+        if audio is None:
+            audio = decode_file(file_path)
+            if key:
+                self.put(key, audio)
+        return audio
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'entries': len(self._memory) + len(self._disk),
+                'memory_bytes': self.memory_bytes,
+                'disk_bytes': self.disk_bytes
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self.memory_bytes = 0
+            for key in list(self._disk):
+                self._drop_disk(key)
+            if self._own_disk_dir and self._disk_dir:
+                shutil.rmtree(self._disk_dir, ignore_errors=True)
+                self._disk_dir = None
+                self._own_disk_dir = False
+
+    def _spill(self, key, audio):
+        """ย้ายรายการลงดิสก์ (ถ้าเปิดไว้และไม่เกินงบ) ไม่เช่นนั้นลบทิ้ง"""
+        size = len(audio.raw_data)
+        if size == 0 or size > self.disk_budget:
+            return
+        while self._disk and self.disk_bytes + size > self.disk_budget:
+            self._drop_disk(next(iter(self._disk)))
+        if not self._disk_dir or not os.path.isdir(self._disk_dir):
+            self._disk_dir = tempfile.mkdtemp(prefix="mixpro_pcm_")
+            self._own_disk_dir = True
+        self._next_file += 1
+        path = os.path.join(self._disk_dir, f"{self._next_file}.pcm")
+        try:
+            with open(path, 'wb') as f:
+                f.write(audio.raw_data)
+        except OSError as e:
+            print(f"ไม่สามารถย้ายแคชเสียงลงดิสก์: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return
+        self._disk[key] = {
+            'path': path,
+            'frame_rate': audio.frame_rate,
+            'channels': audio.channels,
+            'sample_width': audio.sample_width,
+            'bytes': size
+        }
+        self.disk_bytes += size
+
+    def _load(self, descriptor, mapped=False):
+        """อ่านไฟล์ PCM กลับเป็น AudioSegment (None ถ้าอ่านไม่ได้)
+
+        ปกติอ่านเป็น bytes ใช้ได้เหมือน AudioSegment ทั่วไป
+        mapped=True เปิดด้วย mmap (ระบบโหลดเฉพาะหน้าที่อ่านจริง) ตัดช่วง/เขียนเข้า sink ได้
+        แต่ + / append / pickle ใช้ไม่ได้ ใช้เฉพาะงานที่อ่านอย่างเดียว (แบบเดียวกับ load_pcm)
+        """
+        try:
+            with open(descriptor['path'], 'rb') as f:
+                if mapped:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    data = f.read()
+        except (OSError, ValueError):
+            return None
+        return AudioSegment(
+            data=data,
+            sample_width=descriptor['sample_width'],
+            frame_rate=descriptor['frame_rate'],
+            channels=descriptor['channels']
+        )
+
+    def _drop_disk(self, key):
+        descriptor = self._disk.pop(key)
+        self.disk_bytes -= descriptor['bytes']
+        try:
+            # ข้อมูลที่ยัง mmap อยู่ใช้ต่อได้จนกว่าจะปิด (Windows ลบไม่ได้จนกว่าจะปิด ปล่อยไว้ให้ลบพร้อมโฟลเดอร์)
+            os.remove(descriptor['path'])
+        except OSError:
+            pass
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def configure_decoded_cache(memory_budget_mb=DEFAULT_CACHE_MB, disk_budget_mb=DEFAULT_DISK_CACHE_MB):
+    """ตั้งงบของแคชที่ใช้ร่วมกันทั้งโปรเซส (memory_budget_mb = 0 ปิดแคช)"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache:
+            _shared_cache.clear()
+        _shared_cache = DecodedAudioCache(memory_budget_mb, disk_budget_mb) if memory_budget_mb else False
+        return _shared_cache or None
+
+
+def get_decoded_cache():
+    """แคชเสียงที่ถอดรหัสแล้วที่ใช้ร่วมกันทั้งโปรเซส (None ถ้าปิดไว้)
+
+    worker ของโหมด process ไม่ใช้แคช (ไม่ให้ memory คูณตามจำนวนโปรเซส)
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            if multiprocessing.current_process().name == 'MainProcess':
+                _shared_cache = DecodedAudioCache()
+            else:
+                _shared_cache = False
+        return _shared_cache or None
+
+
+def _reset_after_fork():
+    # โปรเซสลูกที่ fork มาได้สำเนาแคชและ lock ของแม่ (lock อาจค้างถ้ามี thread อื่นถืออยู่ตอน fork)
+    global _shared_cache, _shared_cache_lock
+    _shared_cache_lock = threading.Lock()
+    _shared_cache = False
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def decode_audio(file_path, target=None, mapped=False):
+    """ถอดรหัสไฟล์เสียงผ่านแคชที่ใช้ร่วมกัน (target = รูปแบบเสียงที่ต้องการ ถ้ามี)
+
+    mapped=True ยอมรับเสียงจากแคชบนดิสก์แบบ mmap (อ่านอย่างเดียว: + / append / pickle ใช้ไม่ได้)
+    """
+    cache = get_decoded_cache()
+    if cache is not None:
+        return cache.decode(file_path, target, mapped)
+    audio = decode_file(file_path)
+    return conform_audio(audio, target) if target and audio_format(audio) != target else audio
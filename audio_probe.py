@@ -0,0 +1,499 @@
+import os
+import struct
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from audio_cache import get_metadata_cache
+try:
+    from pydub.utils import mediainfo
+    PYDUB_AVAILABLE = True
+except ImportError:
+    PYDUB_AVAILABLE = False
+
+# อ่านข้อมูลไฟล์เสียง (ระยะเวลา, sample rate, channels, codec) โดยไม่ต้องถอดรหัสทั้งไฟล์
+# อ่านจาก header ของไฟล์ก่อน (WAV, FLAC, MP3, MP4/M4A) ถ้าอ่านไม่ได้จึงใช้ ffprobe
+
+PROBE_WORKERS = 8
+
+
+def _info(duration, sample_rate, channels, codec):
+    return {
+        'duration': float(duration),
+        'sample_rate': int(sample_rate),
+        'channels': int(channels),
+        'codec': codec
+    }
+
+
+def probe_wav(f, file_size):
+    """อ่าน header ของ WAV (RIFF): ระยะเวลา = ขนาด data chunk / byte rate"""
+    header = f.read(12)
+    if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        return None
+
+    fmt = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, chunk_size = struct.unpack('<4sI', chunk)
+        if chunk_id == b'fmt ':
+            fmt = f.read(chunk_size)
+            if len(fmt) < 16:
+                return None
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)
+        elif chunk_id == b'data':
+            if fmt is None:
+                return None
+            audio_format, channels, sample_rate, byte_rate, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+            if audio_format == 0xFFFE and len(fmt) >= 26:
+                audio_format = struct.unpack('<H', fmt[24:26])[0]  # WAVE_FORMAT_EXTENSIBLE
+            if not byte_rate:
+                return None
+            # data chunk ที่เขียนไม่เสร็จ (หรือเกินขนาดไฟล์) ใช้ขนาดที่เหลือจริงแทน
+            data_size = min(chunk_size, file_size - f.tell())
+            if audio_format == 3:
+                codec = f"pcm_f{bits}le"
+            elif bits == 8:
+                codec = "pcm_u8"
+            else:
+                codec = f"pcm_s{bits}le"
+            return _info(data_size / byte_rate, sample_rate, channels, codec)
+        else:
+            f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+
+
+def _skip_id3v2(f):
+    """ข้าม ID3v2 tag ที่อยู่ต้นไฟล์ คืนค่าตำแหน่งเริ่มเสียง"""
+    f.seek(0)
+    header = f.read(10)
+    if len(header) == 10 and header[:3] == b'ID3':
+        size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        if header[5] & 0x10:
+            size += 10  # มี footer
+        f.seek(10 + size)
+        return 10 + size
+    f.seek(0)
+    return 0
+
+
+def _flac_streaminfo(f):
+    """ค่า sample rate / channels / bits / จำนวน sample ที่อัดรวมใน STREAMINFO (None ถ้าไม่ใช่ FLAC)"""
+    _skip_id3v2(f)
+    if f.read(4) != b'fLaC':
+        return None
+    block_header = f.read(4)
+    if len(block_header) < 4 or (block_header[0] & 0x7F) != 0:
+        return None
+    streaminfo = f.read(34)
+    if len(streaminfo) < 34:
+        return None
+    return int.from_bytes(streaminfo[10:18], 'big')
+
+
+def probe_flac(f, file_size):
+    """อ่าน STREAMINFO ของ FLAC: จำนวน sample ทั้งหมด / sample rate"""
+    packed = _flac_streaminfo(f)
+    if packed is None:
+        return None
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x07) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    if not sample_rate or not total_samples:
+        return None
+    return _info(total_samples / sample_rate, sample_rate, channels, "flac")
+
+
+_MP3_BITRATES = {
+    # (MPEG1?, layer): kbps ตาม bitrate index
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def _mp3_frame(data):
+    """header ของ frame แรกที่ถูกต้อง: (ตำแหน่ง, MPEG1?, channels, sample rate, bitrate, samples ต่อ frame)"""
+    pos = data.find(b'\xff')
+    while 0 <= pos <= len(data) - 4:
+        b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+        version_bits = (b1 >> 3) & 0x03
+        layer_bits = (b1 >> 1) & 0x03
+        bitrate_index = b2 >> 4
+        rate_index = (b2 >> 2) & 0x03
+        if ((b1 & 0xE0) == 0xE0 and version_bits != 1 and layer_bits != 0
+                and bitrate_index not in (0, 15) and rate_index != 3):
+            break
+        pos = data.find(b'\xff', pos + 1)
+    else:
+        return None
+
+    mpeg1 = version_bits == 3
+    layer = 4 - layer_bits
+    sample_rate = _MP3_SAMPLE_RATES[version_bits][rate_index]
+    bitrate = _MP3_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    channels = 1 if (b3 >> 6) == 3 else 2
+    if layer == 1:
+        samples_per_frame = 384
+    elif layer == 3 and not mpeg1:
+        samples_per_frame = 576
+    else:
+        samples_per_frame = 1152
+    return pos, mpeg1, channels, sample_rate, bitrate, samples_per_frame
+
+
+def _mp3_vbr_header(data, pos, mpeg1, channels):
+    """(ชนิด tag, ตำแหน่ง) ของ Xing/Info หรือ VBRI ใน frame แรก (None ถ้าไม่มี)"""
+    # Xing/Info อยู่หลัง side information
+    if mpeg1:
+        side_info = 17 if channels == 1 else 32
+    else:
+        side_info = 9 if channels == 1 else 17
+    xing = pos + 4 + side_info
+    if data[xing:xing + 4] in (b'Xing', b'Info'):
+        return data[xing:xing + 4], xing
+    vbri = pos + 4 + 32
+    if data[vbri:vbri + 4] == b'VBRI':
+        return b'VBRI', vbri
+    return None
+
+
+def probe_mp3(f, file_size):
+    """อ่าน frame แรกของ MP3: ใช้ Xing/Info หรือ VBRI ถ้ามี ไม่งั้นคำนวณจาก bitrate (CBR)"""
+    audio_start = _skip_id3v2(f)
+    data = f.read(64 * 1024)
+    frame = _mp3_frame(data)
+    if frame is None:
+        return None
+    pos, mpeg1, channels, sample_rate, bitrate, samples_per_frame = frame
+
+    tag = _mp3_vbr_header(data, pos, mpeg1, channels)
+    if tag and tag[0] in (b'Xing', b'Info') and len(data) >= tag[1] + 12:
+        flags = struct.unpack('>I', data[tag[1] + 4:tag[1] + 8])[0]
+        if flags & 0x01:
+            frames = struct.unpack('>I', data[tag[1] + 8:tag[1] + 12])[0]
+            return _info(frames * samples_per_frame / sample_rate, sample_rate, channels, "mp3")
+    if tag and tag[0] == b'VBRI' and len(data) >= tag[1] + 18:
+        frames = struct.unpack('>I', data[tag[1] + 14:tag[1] + 18])[0]
+        return _info(frames * samples_per_frame / sample_rate, sample_rate, channels, "mp3")
+
+    # CBR: ขนาดข้อมูลเสียง (ไม่รวม tag) / bitrate
+    audio_size = file_size - audio_start - pos
+    f.seek(max(file_size - 128, 0))
+    if f.read(3) == b'TAG':
+        audio_size -= 128
+    return _info(audio_size * 8 / bitrate, sample_rate, channels, "mp3")
+
+
+def _mp3_bitrate(f, file_size):
+    """bitrate (bit/s) ของ MP3 แบบ CBR จาก frame แรก (None ถ้าเป็น VBR หรืออ่านไม่ได้)"""
+    _skip_id3v2(f)
+    data = f.read(64 * 1024)
+    frame = _mp3_frame(data)
+    if frame is None:
+        return None
+    pos, mpeg1, channels, sample_rate, bitrate, samples_per_frame = frame
+    tag = _mp3_vbr_header(data, pos, mpeg1, channels)
+    if tag and tag[0] != b'Info':
+        return None  # Xing/VBRI = VBR (Info = CBR ที่ LAME เขียนไว้)
+    return bitrate
+
+
+def _mp4_boxes(f, start, end):
+    """วนอ่าน box ใน MP4 ระหว่างตำแหน่ง start-end คืนค่า (ชนิด, ตำแหน่งข้อมูล, ตำแหน่งสิ้นสุด)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        data_start = pos + 8
+        if size == 1:
+            large = f.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack('>Q', large)[0]
+            data_start = pos + 16
+        elif size == 0:
+            size = end - pos
+        if size < 8:
+            return
+        yield box_type, data_start, pos + size
+        pos += size
+
+
+def _mp4_find(f, start, end, path):
+    """หา box ตามลำดับชื่อ เช่น [b'moov', b'mvhd']"""
+    for box_type, data_start, box_end in _mp4_boxes(f, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return data_start, box_end
+            found = _mp4_find(f, data_start, box_end, path[1:])
+            if found:
+                return found
+    return None
+
+
+_MP4_AUDIO_CODECS = {b'mp4a': "aac", b'alac': "alac", b'ac-3': "ac3", b'ec-3': "eac3",
+                     b'Opus': "opus", b'fLaC': "flac"}
+
+
+def probe_mp4(f, file_size):
+    """อ่าน mvhd ของ MP4/M4A: duration / timescale (ข้าม mdat ด้วย seek ไม่ต้องอ่านข้อมูลเสียง)"""
+    mvhd = _mp4_find(f, 0, file_size, [b'moov', b'mvhd'])
+    if not mvhd:
+        return None
+    f.seek(mvhd[0])
+    version = f.read(4)[0]
+    if version == 1:
+        _, _, timescale, duration = struct.unpack('>QQIQ', f.read(28))
+    else:
+        _, _, timescale, duration = struct.unpack('>IIII', f.read(16))
+    if not timescale:
+        return None
+
+    # sample rate/channels จาก sample description ของ track เสียง
+    sample_rate = channels = 0
+    codec = "aac"
+    moov = _mp4_find(f, 0, file_size, [b'moov'])
+    for box_type, data_start, box_end in _mp4_boxes(f, moov[0], moov[1]):
+        if box_type != b'trak':
+            continue
+        stsd = _mp4_find(f, data_start, box_end, [b'mdia', b'minf', b'stbl', b'stsd'])
+        if not stsd:
+            continue
+        f.seek(stsd[0] + 8)
+        entry = f.read(36)
+        if len(entry) == 36 and entry[4:8] in _MP4_AUDIO_CODECS:
+            codec = _MP4_AUDIO_CODECS[entry[4:8]]
+            channels = struct.unpack('>H', entry[24:26])[0]
+            sample_rate = struct.unpack('>I', entry[32:36])[0] >> 16
+            break
+    return _info(duration / timescale, sample_rate, channels, codec)
+
+
+def _mp4_bitrate(f, file_size):
+    """avgBitrate (bit/s) ใน esds ของ track AAC (None ถ้าไม่มี)"""
+    moov = _mp4_find(f, 0, file_size, [b'moov'])
+    if not moov:
+        return None
+    for box_type, data_start, box_end in _mp4_boxes(f, moov[0], moov[1]):
+        if box_type != b'trak':
+            continue
+        stsd = _mp4_find(f, data_start, box_end, [b'mdia', b'minf', b'stbl', b'stsd'])
+        if not stsd:
+            continue
+        f.seek(stsd[0] + 8)
+        entry = f.read(36)
+        if len(entry) < 36 or entry[4:8] != b'mp4a':
+            continue
+        # sample entry แบบ QuickTime version 1/2 มีข้อมูลเพิ่มก่อน box ย่อย
+        extra = {0: 0, 1: 16, 2: 36}.get(struct.unpack('>H', entry[16:18])[0])
+        if extra is None:
+            return None
+        entry_start = stsd[0] + 8
+        esds = _mp4_find(f, entry_start + 36 + extra, entry_start + struct.unpack('>I', entry[:4])[0],
+                         [b'esds'])
+        if not esds:
+            return None
+        f.seek(esds[0])
+        return _esds_avg_bitrate(f.read(min(esds[1] - esds[0], 256)))
+    return None
+
+
+def _esds_descriptor(data, pos):
+    """(tag, ตำแหน่งข้อมูล) ของ descriptor ใน esds (ความยาวเข้ารหัส 7 บิตต่อไบต์)"""
+    tag = data[pos]
+    pos += 1
+    for _ in range(4):
+        pos += 1
+        if not data[pos - 1] & 0x80:
+            break
+    return tag, pos
+
+
+def _esds_avg_bitrate(data):
+    tag, pos = _esds_descriptor(data, 4)  # ข้าม version/flags
+    if tag != 0x03:
+        return None
+    flags = data[pos + 2]
+    pos += 3
+    if flags & 0x80:
+        pos += 2
+    if flags & 0x40:
+        pos += 1 + data[pos]
+    if flags & 0x20:
+        pos += 2
+    tag, pos = _esds_descriptor(data, pos)
+    if tag != 0x04:
+        return None
+    # objectType(1) streamType(1) bufferSize(3) maxBitrate(4) avgBitrate(4)
+    return struct.unpack('>I', data[pos + 9:pos + 13])[0] or None
+
+
+_HEADER_PROBES = {
+    '.wav': probe_wav,
+    '.flac': probe_flac,
+    '.mp3': probe_mp3,
+    '.m4a': probe_mp4,
+    '.mp4': probe_mp4,
+    '.aac': None,  # ADTS ไม่มี header บอกความยาว ใช้ ffprobe
+}
+
+
+def probe_header(file_path):
+    """อ่านข้อมูลจาก header ของไฟล์ (None ถ้าไม่รองรับหรือ header เสีย)"""
+    probe = _HEADER_PROBES.get(Path(file_path).suffix.lower())
+    if probe is None:
+        return None
+    try:
+        file_size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            return probe(f, file_size)
+    except (OSError, struct.error, IndexError, ValueError, ZeroDivisionError, KeyError):
+        return None
+
+
+def probe_ffprobe(file_path):
+    """อ่านข้อมูลไฟล์ด้วย ffprobe (None ถ้าอ่านไม่ได้)"""
+    if not PYDUB_AVAILABLE:
+        return None
+    try:
+        info = mediainfo(str(file_path))
+    except Exception:
+        return None
+    if not info or not info.get('duration'):
+        return None
+    try:
+        return {
+            'duration': float(info['duration']),
+            'sample_rate': int(info.get('sample_rate') or 0),
+            'channels': int(info.get('channels') or 0),
+            'codec': info.get('codec_name')
+        }
+    except (TypeError, ValueError):
+        return None
+
+
+def probe_file(file_path):
+    """อ่านข้อมูลไฟล์: header ก่อน แล้วค่อย ffprobe"""
+    return probe_header(file_path) or probe_ffprobe(file_path)
+
+
+def file_info(file_path, cache=None):
+    """ข้อมูลไฟล์เสียง ใช้แคชบนดิสก์ก่อน ถ้าไม่มีจึง probe"""
+    cache = cache or get_metadata_cache()
+    if cache is None:
+        return probe_file(file_path)
+    return cache.lookup(file_path, probe_file)
+
+
+def file_duration(file_path, cache=None):
+    """ระยะเวลาไฟล์เป็นวินาที (0 ถ้าอ่านไม่ได้)"""
+    info = file_info(file_path, cache)
+    return info['duration'] if info and info.get('duration') else 0
+
+
+def probe_durations(file_paths, max_workers=PROBE_WORKERS):
+    """อ่านระยะเวลาหลายไฟล์พร้อมกัน คืนค่า {path: วินาที} ตามลำดับเดิม"""
+    file_paths = list(file_paths)
+    if len(file_paths) <= 1:
+        return {file_path: file_duration(file_path) for file_path in file_paths}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(file_paths, executor.map(file_duration, file_paths)))
+
+
+# codec ที่ถอดรหัสเป็น 16 บิต (ค่าเดียวกับที่ pydub/audio_decode ได้จาก ffmpeg)
+LOSSY_CODECS = {'mp3', 'aac', 'vorbis', 'opus', 'wmav1', 'wmav2', 'ac3', 'eac3'}
+
+
+def flac_bits(file_path):
+    """bit depth ของ FLAC จาก STREAMINFO (None ถ้าอ่านไม่ได้)
+
+    แคช metadata ไม่ได้เก็บ bit depth แต่ STREAMINFO อยู่ในไม่กี่สิบไบต์แรกของไฟล์
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            packed = _flac_streaminfo(f)
+    except OSError:
+        return None
+    if packed is None:
+        return None
+    return ((packed >> 36) & 0x1F) + 1
+
+
+_BITRATE_PROBES = {'.mp3': _mp3_bitrate, '.m4a': _mp4_bitrate, '.mp4': _mp4_bitrate}
+
+
+def stream_bitrate(file_path):
+    """bitrate คงที่ (bit/s) ของ MP3/M4A จาก header (None ถ้าเป็น VBR หรืออ่านไม่ได้)"""
+    probe = _BITRATE_PROBES.get(Path(file_path).suffix.lower())
+    if probe is None:
+        return None
+    try:
+        file_size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            return probe(f, file_size)
+    except (OSError, struct.error, IndexError, ValueError, KeyError):
+        return None
+
+
+def decoded_sample_width(file_path, info):
+    """sample width (ไบต์) ของ AudioSegment หลังถอดรหัส (None ถ้าบอกไม่ได้)
+
+    AudioSegment เก็บ 24 บิตเป็น 32 บิต จึงได้ 1, 2 หรือ 4 เท่านั้น
+    """
+    codec = info.get('codec') or ''
+    bits = None
+    if codec in LOSSY_CODECS:
+        return 2
+    if codec == 'pcm_u8':
+        bits = 8
+    elif codec.startswith('pcm_s') and codec[5:-2].isdigit():
+        bits = int(codec[5:-2])
+    elif codec == 'flac':
+        bits = flac_bits(file_path)
+    if not bits:
+        return None
+    return 1 if bits <= 8 else 2 if bits <= 16 else 4
+
+
+def decoded_format(file_path, cache=None):
+    """รูปแบบเสียงหลังถอดรหัส (frame_rate, channels, sample_width) จาก header/แคช (None ถ้าบอกไม่ได้)"""
+    info = file_info(file_path, cache)
+    if not info or not info.get('sample_rate') or not info.get('channels'):
+        return None
+    sample_width = decoded_sample_width(file_path, info)
+    if sample_width is None:
+        return None
+    return (info['sample_rate'], info['channels'], sample_width)
+
+
+def probe_formats(file_paths, max_workers=PROBE_WORKERS):
+    """อ่านรูปแบบเสียงหลายไฟล์พร้อมกัน คืนค่า {path: (frame_rate, channels, sample_width) หรือ None}"""
+    file_paths = list(file_paths)
+    if len(file_paths) <= 1:
+        return {file_path: decoded_format(file_path) for file_path in file_paths}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(file_paths, executor.map(decoded_format, file_paths)))
+
+
+def choose_target_format(formats, frame_rate=None, channels=None, sample_width=None):
+    """เลือกรูปแบบเสียงเป้าหมายของโฟลเดอร์จากรูปแบบของทุกไฟล์
+
+    ใช้ค่าสูงสุดของแต่ละส่วน (ไม่ลดคุณภาพไฟล์ใด) ส่วนที่ผู้ใช้กำหนดใช้ค่านั้นแทน
+    คืนค่า None ถ้าไม่รู้รูปแบบของไฟล์ใดเลยและผู้ใช้กำหนดไม่ครบ
+    """
+    known = [fmt for fmt in formats if fmt]
+    if known:
+        frame_rate = frame_rate or max(fmt[0] for fmt in known)
+        channels = channels or max(fmt[1] for fmt in known)
+        sample_width = sample_width or max(fmt[2] for fmt in known)
+    if not (frame_rate and channels and sample_width):
+        return None
+    return (int(frame_rate), int(channels), int(sample_width))
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+from audio_engine import FileSink, start_sink
+from audio_jobs import pcm_path, discard_results
+
+# ที่พักผลลัพธ์ระหว่าง "รวม/ลูปตอนนี้ โหลดทีหลัง"
+# เก็บผลลัพธ์ไว้ใน memory จนเกินงบที่กำหนด แล้วย้ายผลลัพธ์เก่าลงดิสก์เป็นไฟล์ PCM (ไม่เสียคุณภาพ)
+
+DEFAULT_MEMORY_BUDGET_MB = 2048
+
+
+class StagingStore:
+    """รายการผลลัพธ์ (dict จาก run_merge_job / run_loop_job) ที่คุมขนาด memory รวมไม่ให้เกินงบ"""
+    def __init__(self, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, work_dir=None):
+        self.memory_budget = int(memory_budget_mb) * 1024 * 1024
+        self.memory_bytes = 0
+        self.spilled = 0
+        self._work_dir = work_dir
+        self._own_work_dir = False
+        self._results = []
+
+    @property
+    def work_dir(self):
+        """โฟลเดอร์เก็บไฟล์ PCM ที่ย้ายลงดิสก์ (สร้างเมื่อใช้ครั้งแรก)"""
+        if not self._work_dir or not os.path.isdir(self._work_dir):
+            self._work_dir = tempfile.mkdtemp(prefix="mixpro_stage_")
+            self._own_work_dir = True
+        return self._work_dir
+
+    def set_budget(self, memory_budget_mb):
+        self.memory_budget = int(memory_budget_mb) * 1024 * 1024
+        self._spill()
+
+    def add(self, result):
+        """เพิ่มผลลัพธ์ ถ้า memory เกินงบจะย้ายผลลัพธ์ที่เก่าที่สุดลงดิสก์"""
+        self._results.append(result)
+        if 'audio' in result:
+            self.memory_bytes += len(result['audio'].raw_data)
+            self._spill()
+
+    def add_shared(self, result):
+        """เพิ่มผลลัพธ์ที่ store อื่นเป็นเจ้าของ โดยใช้ข้อมูลเสียงชุดเดียวกัน
+
+        เสียงใน memory ใช้ object เดิม ไฟล์ PCM ใช้ hard link (ไม่คัดลอกข้อมูล)
+        แต่ละ store จึงลบผลลัพธ์ของตัวเองได้อิสระ
+        """
+        shared = dict(result)
+        if 'pcm' in result:
+            descriptor = dict(result['pcm'])
+            descriptor['path'] = pcm_path(self.work_dir, result['name'])
+            try:
+                os.link(result['pcm']['path'], descriptor['path'])
+            except OSError:
+                # คนละ filesystem หรือระบบไม่รองรับ hard link
+                shutil.copyfile(result['pcm']['path'], descriptor['path'])
+            shared['pcm'] = descriptor
+        self.add(shared)
+        return shared
+
+    def _spill(self):
+        for result in self._results:
+            if self.memory_bytes <= self.memory_budget:
+                break
+            audio = result.get('audio')
+            if audio is None:
+                continue
+            sink = FileSink(pcm_path(self.work_dir, result['name']))
+            try:
+                start_sink(sink, audio)
+                sink.write(audio.raw_data)
+                result['pcm'] = sink.close(audio)
+            except OSError as e:
+                sink.abort()
+                print(f"ไม่สามารถย้ายผลลัพธ์ {result['name']} ลงดิสก์: {e}")
+                return
+            del result['audio']
+            self.memory_bytes -= len(audio.raw_data)
+            self.spilled += 1
+
+    def clear(self):
+        """ลบผลลัพธ์ทั้งหมด รวมถึงไฟล์ PCM บนดิสก์"""
+        discard_results(self._results)
+        self._results = []
+        self.memory_bytes = 0
+        self.spilled = 0
+        if self._own_work_dir and self._work_dir:
+            shutil.rmtree(self._work_dir, ignore_errors=True)
+            self._work_dir = None
+            self._own_work_dir = False
+
+    def __iter__(self):
+        return iter(list(self._results))
+
+    def __len__(self):
+        return len(self._results)
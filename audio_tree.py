@@ -0,0 +1,162 @@
+from itertools import islice
+
+# แทรกแถวใน ttk.Treeview เฉพาะส่วนที่ผู้ใช้เห็น
+# ลูกของ node จะถูกสร้างเมื่อเปิด node ครั้งแรก และแทรกทีละหน้า (แถว "แสดงเพิ่ม" โหลดหน้าถัดไป)
+# ตัวอย่างที่มีหลายหมื่นไฟล์จึงแสดงผลชั้นบนสุดได้ทันที
+
+PAGE_SIZE = 500  # จำนวนแถวที่แทรกต่อครั้ง
+AUTO_OPEN_ROWS = 2000  # เปิด node อัตโนมัติได้จนกว่าจะแทรกลูกครบจำนวนนี้ (ที่เหลือให้ผู้ใช้กดเปิดเอง)
+LOADING_TEXT = "  ⏳ กำลังโหลด..."
+
+
+class LazyTree:
+    """ตัวช่วยเติมแถวของ ttk.Treeview แบบ lazy
+
+    แถว (row) คือ tuple (text, values, children)
+    children เป็น None (ไม่มีลูก) หรือฟังก์ชันที่คืน list ของแถวลูก (เรียกเมื่อเปิด node)
+    แถวที่แทรกแล้วจำตำแหน่งไว้ทั้งสองทาง (item ↔ (parent, ลำดับในรายการ)) ไม่ต้องค้นจากข้อความ
+    """
+    def __init__(self, tree, page_size=PAGE_SIZE, auto_open_rows=AUTO_OPEN_ROWS):
+        self.tree = tree
+        self.page_size = page_size
+        self.auto_open_rows = auto_open_rows
+        self._auto_open_left = auto_open_rows
+        self._loaders = {}  # {item: ฟังก์ชันสร้างแถวลูก} node ที่ยังไม่เคยเปิด
+        self._more = {}  # {แถว "แสดงเพิ่ม": (parent, rows, ตำแหน่งถัดไป, open_children)}
+        self._row_items = {}  # {parent: [item ตามลำดับในรายการ]} เฉพาะแถวที่แทรกแล้ว
+        self._row_index = {}  # {item: (parent, ลำดับในรายการ)}
+        tree.bind('<<TreeviewOpen>>', self._on_open, add='+')
+        tree.bind('<<TreeviewSelect>>', self._on_select, add='+')
+
+    def clear(self):
+        """ลบทุกแถว"""
+        self.tree.delete(*self.tree.get_children())
+        self._loaders.clear()
+        self._more.clear()
+        self._row_items.clear()
+        self._row_index.clear()
+        self._auto_open_left = self.auto_open_rows
+
+    def insert(self, parent, text, values, children=None, open=False, index='end'):
+        """แทรกหนึ่งแถว ลูกจะถูกสร้างเมื่อเปิด (open=True เปิดทันที)"""
+        item = self.tree.insert(parent, index, text=text, values=values, open=False)
+        if children is not None:
+            self._loaders[item] = children
+            # แถวชั่วคราวให้ Treeview แสดงปุ่มเปิด
+            self.tree.insert(item, 'end', text=LOADING_TEXT)
+            if open:
+                self.open(item)
+        return item
+
+    def populate(self, parent, rows, open_children=False):
+        """แทรกแถวหน้าแรกใต้ parent ที่เหลือแทรกเมื่อผู้ใช้กดแถว "แสดงเพิ่ม"
+
+        open_children=True เปิดแถวที่มีลูกให้อัตโนมัติ (ภายในจำนวน AUTO_OPEN_ROWS)
+        """
+        self._insert_page(parent, rows, 0, 'end', open_children)
+
+    def open(self, item):
+        self._load(item)
+        self.tree.item(item, open=True)
+
+    def toggle(self, item):
+        if self.tree.item(item, 'open'):
+            self.tree.item(item, open=False)
+        else:
+            self.open(item)
+
+    def reload(self, item, children):
+        """เปลี่ยนลูกของ item (เช่น หลังจัดลำดับใหม่) ถ้าเปิดอยู่จะแทรกใหม่ทันที"""
+        self._forget_children(item)
+        self.tree.delete(*self.tree.get_children(item))
+        self._loaders[item] = children
+        if self.tree.item(item, 'open'):
+            self._load(item)
+        else:
+            self.tree.insert(item, 'end', text=LOADING_TEXT)
+
+    def delete(self, item):
+        self._forget_children(item)
+        self._loaders.pop(item, None)
+        position = self._row_index.pop(item, None)
+        if position is not None:
+            # แถวหลังจากนี้เลื่อนขึ้นหนึ่งตำแหน่ง
+            parent, index = position
+            items = self._row_items[parent]
+            del items[index]
+            for i in range(index, len(items)):
+                self._row_index[items[i]] = (parent, i)
+        self.tree.delete(item)
+
+    def row_position(self, item):
+        """(parent, ลำดับในรายการ) ของแถว (None ถ้าไม่ใช่แถวจาก rows)"""
+        return self._row_index.get(item)
+
+    def swap_adjacent(self, parent, index):
+        """สลับแถวลำดับ index กับ index + 1 ใน tree โดยย้ายแถวเดิม (ไม่สร้างใหม่)
+
+        คืนค่า False ถ้าแถวใดยังไม่ถูกแทรก (ยังไม่เปิด node หรืออยู่หลังแถว "แสดงเพิ่ม")
+        """
+        items = self._row_items.get(parent)
+        if items is None or index < 0 or index + 1 >= len(items):
+            return False
+        first, second = items[index], items[index + 1]
+        self.tree.move(second, parent, self.tree.index(first))
+        items[index], items[index + 1] = second, first
+        self._row_index[second] = (parent, index)
+        self._row_index[first] = (parent, index + 1)
+        return True
+
+    def is_more_row(self, item):
+        return item in self._more
+
+    def load_more(self, more_item):
+        """แทรกหน้าถัดไปแทนที่แถว "แสดงเพิ่ม" """
+        parent, rows, start, open_children = self._more.pop(more_item)
+        index = self.tree.index(more_item)
+        self.tree.delete(more_item)
+        self._insert_page(parent, rows, start, index, open_children)
+
+    def _insert_page(self, parent, rows, start, index, open_children):
+        end = min(start + self.page_size, len(rows))
+        position = index
+        items = self._row_items.setdefault(parent, [])
+        for text, values, children in islice(rows, start, end):
+            open_item = open_children and children is not None and self._auto_open_left > 0
+            item = self.insert(parent, text, values, children, open_item, position)
+            self._row_index[item] = (parent, len(items))
+            items.append(item)
+            if position != 'end':
+                position += 1
+
+        remaining = len(rows) - end
+        if remaining > 0:
+            more_item = self.tree.insert(parent, position, text=f"  ⋯ แสดงเพิ่ม ({remaining} รายการ)")
+            self._more[more_item] = (parent, rows, end, open_children)
+
+    def _load(self, item):
+        loader = self._loaders.pop(item, None)
+        if loader is None:
+            return
+        self.tree.delete(*self.tree.get_children(item))
+        rows = loader()
+        self._auto_open_left -= min(len(rows), self.page_size)
+        self._insert_page(item, rows, 0, 'end', False)
+
+    def _forget_children(self, item):
+        for child in self.tree.get_children(item):
+            self._forget_children(child)
+            self._loaders.pop(child, None)
+            self._more.pop(child, None)
+            self._row_index.pop(child, None)
+        self._row_items.pop(item, None)
+
+    def _on_open(self, event):
+        item = self.tree.focus()
+        if item:
+            self._load(item)
+
+    def _on_select(self, event):
+        for item in self.tree.selection():
+            if item in self._more:
+                self.load_more(item)
@@ -0,0 +1,304 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import threading
+from audio_core import scan_audio_files
+try:
+    import ctypes
+    import ctypes.util
+    _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    _libc.inotify_init1
+    INOTIFY_AVAILABLE = sys.platform.startswith('linux')
+except (ImportError, OSError, AttributeError):
+    INOTIFY_AVAILABLE = False
+
+# เฝ้าดูโฟลเดอร์ที่เลือกไว้ แจ้งเฉพาะไฟล์เสียงที่เพิ่ม/ลบ/เปลี่ยนชื่อ/เขียนเสร็จ
+# โดยไม่ต้องสแกนทุกโฟลเดอร์ใหม่
+# Linux ใช้ inotify (ได้เหตุการณ์จาก kernel ทันที) ระบบอื่นตรวจ mtime ของโฟลเดอร์เป็นระยะ
+# ทั้งสองแบบ เมื่อโฟลเดอร์เปลี่ยนจะอ่านรายชื่อไฟล์ของโฟลเดอร์นั้นโฟลเดอร์เดียวแล้วเทียบกับรายการเดิม
+
+WATCH_BACKENDS = ('auto', 'inotify', 'poll')
+POLL_INTERVAL = 1.0  # วินาที ระหว่างการตรวจโฟลเดอร์ในโหมด poll
+SETTLE_DELAY = 0.3  # วินาที รอให้เหตุการณ์ต่อเนื่อง (เช่น คัดลอกหลายไฟล์) จบก่อนอ่านโฟลเดอร์
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (_IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE |
+               _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR)
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _scan(folder):
+    try:
+        return set(scan_audio_files(folder))
+    except OSError:
+        return set()  # โฟลเดอร์ถูกลบหรืออ่านไม่ได้ ถือว่าไม่มีไฟล์
+
+
+def _folder_mtime(folder):
+    try:
+        return os.stat(folder).st_mtime_ns
+    except OSError:
+        return None
+
+
+class FolderWatcher:
+    """เฝ้าดูไฟล์เสียงในหลายโฟลเดอร์ (ไม่รวมโฟลเดอร์ย่อย)
+
+    เรียก callback(folder, added, removed, changed) จาก thread ของ watcher
+    added/removed/changed เป็นรายชื่อไฟล์ (changed = ไฟล์เดิมที่ถูกเขียนใหม่ ควรอ่านระยะเวลาใหม่)
+    """
+    def __init__(self, callback, backend='auto', interval=POLL_INTERVAL):
+        if backend not in WATCH_BACKENDS:
+            raise ValueError(f"ไม่รู้จัก watch backend: {backend}")
+        if backend == 'auto':
+            backend = 'inotify' if INOTIFY_AVAILABLE else 'poll'
+        if backend == 'inotify' and not INOTIFY_AVAILABLE:
+            raise ValueError("ระบบนี้ไม่รองรับ inotify")
+        self.backend = backend
+        self.callback = callback
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._files = {}  # {โฟลเดอร์: set ชื่อไฟล์ที่รู้แล้ว}
+        self._dirty = {}  # {โฟลเดอร์: เวลาเหตุการณ์ล่าสุด} รออ่านโฟลเดอร์ใหม่
+        self._hints = {}  # {โฟลเดอร์: set ชื่อไฟล์ที่ถูกเขียน}
+        self._mtimes = {}  # โหมด poll: mtime ล่าสุดของโฟลเดอร์
+        self._settling = {}  # โหมด poll: {(โฟลเดอร์, ชื่อไฟล์): ขนาด} ไฟล์ใหม่ที่อาจยังเขียนไม่เสร็จ
+        self._fd = None
+        self._wd_folders = {}
+        self._folder_wds = {}
+
+    def watch(self, folders):
+        """กำหนดโฟลเดอร์ที่จะเฝ้าดู folders = {path: ชื่อไฟล์ที่รู้อยู่แล้ว (None = ยังไม่รู้)}
+
+        โฟลเดอร์ทั้งหมดจะถูกเทียบกับรายการที่ให้มาหนึ่งครั้งทันที
+        เพื่อจับไฟล์ที่เพิ่ม/ลบไประหว่างสแกนครั้งก่อนกับตอนเริ่มเฝ้าดู
+        """
+        folders = {str(folder): set(names or ()) for folder, names in folders.items()}
+        with self._lock:
+            for folder in list(self._files):
+                if folder not in folders:
+                    self._forget(folder)
+            now = time.monotonic() - SETTLE_DELAY
+            for folder, names in folders.items():
+                self._files[folder] = names
+                self._dirty[folder] = now
+                if self.backend == 'inotify':
+                    self._add_watch(folder)
+                else:
+                    self._mtimes[folder] = _folder_mtime(folder)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if self.backend == 'inotify':
+            self._open_inotify()
+        self._stop.clear()
+        target = self._run_inotify if self.backend == 'inotify' else self._run_poll
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """หยุดเฝ้าดูทุกโฟลเดอร์"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        with self._lock:
+            for folder in list(self._files):
+                self._forget(folder)
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    @property
+    def folders(self):
+        with self._lock:
+            return list(self._files)
+
+    def _forget(self, folder):
+        self._files.pop(folder, None)
+        self._dirty.pop(folder, None)
+        self._hints.pop(folder, None)
+        self._mtimes.pop(folder, None)
+        for key in [key for key in self._settling if key[0] == folder]:
+            del self._settling[key]
+        wd = self._folder_wds.pop(folder, None)
+        if wd is not None:
+            self._wd_folders.pop(wd, None)
+            if self._fd is not None:
+                _libc.inotify_rm_watch(self._fd, wd)
+
+    def _mark(self, folder, name=None):
+        self._dirty[folder] = time.monotonic()
+        if name is not None:
+            self._hints.setdefault(folder, set()).add(name)
+
+    def _take_settled(self, delay):
+        """โฟลเดอร์ที่ไม่มีเหตุการณ์ใหม่นานเกิน delay"""
+        now = time.monotonic()
+        with self._lock:
+            ready = [folder for folder, last in self._dirty.items() if now - last >= delay]
+            for folder in ready:
+                del self._dirty[folder]
+            return [(folder, self._hints.pop(folder, set())) for folder in ready]
+
+    def _refresh(self, folder, hints):
+        """อ่านโฟลเดอร์ใหม่ เทียบกับรายการเดิม แล้วเรียก callback ถ้ามีการเปลี่ยนแปลง"""
+        current = _scan(folder)
+        with self._lock:
+            if folder not in self._files:
+                return  # เลิกเฝ้าดูไปแล้ว
+            known = self._files[folder]
+            self._files[folder] = current
+        added = current - known
+        removed = known - current
+        changed = hints & known & current
+        if self.backend == 'poll':
+            sizes = {}
+            for name in added:
+                try:
+                    sizes[(folder, name)] = os.stat(os.path.join(folder, name)).st_size
+                except OSError:
+                    pass
+            with self._lock:
+                self._settling.update(sizes)
+        if added or removed or changed:
+            try:
+                self.callback(folder, sorted(added), sorted(removed), sorted(changed))
+            except Exception as e:
+                print(f"ข้อผิดพลาดในการอัพเดทโฟลเดอร์ {folder}: {e}")
+
+    def _flush(self, delay):
+        for folder, hints in self._take_settled(delay):
+            self._refresh(folder, hints)
+
+    # ---- inotify ----
+
+    def _open_inotify(self):
+        if self._fd is not None:
+            return
+        fd = _libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        with self._lock:
+            self._fd = fd
+            for folder in self._files:
+                self._add_watch(folder)
+
+    def _add_watch(self, folder):
+        if self._fd is None or folder in self._folder_wds:
+            return
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(folder), _WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error != errno.ENOENT:
+                # เช่น เกินจำนวน watch ของระบบ (fs.inotify.max_user_watches)
+                print(f"ไม่สามารถเฝ้าดูโฟลเดอร์ {folder}: {os.strerror(error)}")
+            return
+        self._wd_folders[wd] = folder
+        self._folder_wds[folder] = wd
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return
+            raise
+        offset = 0
+        with self._lock:
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+
+                if mask & _IN_Q_OVERFLOW:
+                    # kernel ทิ้งเหตุการณ์ไปบางส่วน อ่านทุกโฟลเดอร์ใหม่
+                    for folder in self._files:
+                        self._mark(folder)
+                    continue
+                folder = self._wd_folders.get(wd)
+                if folder is None:
+                    continue
+                if mask & _IN_IGNORED:
+                    # โฟลเดอร์ถูกลบ/ย้าย kernel เลิกเฝ้าดูให้เอง
+                    self._wd_folders.pop(wd, None)
+                    self._folder_wds.pop(folder, None)
+                    self._mark(folder)
+                elif mask & (_IN_DELETE_SELF | _IN_MOVE_SELF):
+                    self._mark(folder)
+                elif mask & _IN_CLOSE_WRITE:
+                    self._mark(folder, name)
+                else:
+                    self._mark(folder)
+
+    def _rewatch_missing(self):
+        """เฝ้าดูโฟลเดอร์ที่ถูกลบแล้วสร้างใหม่อีกครั้ง"""
+        with self._lock:
+            for folder in self._files:
+                if folder not in self._folder_wds and os.path.isdir(folder):
+                    self._add_watch(folder)
+                    if folder in self._folder_wds:
+                        self._mark(folder)
+
+    def _run_inotify(self):
+        while not self._stop.is_set():
+            self._rewatch_missing()
+            with self._lock:
+                waiting = bool(self._dirty)
+            try:
+                ready, _, _ = select.select([self._fd], [], [], SETTLE_DELAY if waiting else 0.5)
+                if ready:
+                    self._read_events()
+            except (OSError, ValueError, TypeError):
+                if self._stop.is_set():
+                    break  # fd ถูกปิดระหว่างหยุด
+                raise
+            self._flush(SETTLE_DELAY)
+
+    # ---- poll ----
+
+    def _poll_once(self):
+        with self._lock:
+            for folder in self._files:
+                mtime = _folder_mtime(folder)
+                if mtime != self._mtimes.get(folder):
+                    self._mtimes[folder] = mtime
+                    self._mark(folder)
+            # mtime ของโฟลเดอร์ไม่เปลี่ยนเมื่อเขียนทับไฟล์เดิม ตรวจขนาดไฟล์ใหม่จนกว่าจะนิ่ง
+            for key, size in list(self._settling.items()):
+                folder, name = key
+                try:
+                    current = os.stat(os.path.join(folder, name)).st_size
+                except OSError:
+                    del self._settling[key]
+                    continue
+                if current != size:
+                    self._settling[key] = current
+                    self._mark(folder, name)
+                else:
+                    del self._settling[key]
+
+    def _run_poll(self):
+        self._flush(0)
+        while not self._stop.wait(self.interval):
+            self._poll_once()
+            self._flush(0)